@@ -1,10 +1,9 @@
 from flask import Flask, render_template, request, redirect, url_for, session, jsonify
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
 from dotenv import load_dotenv
 import os
 import psycopg2
 from psycopg2 import pool
+from psycopg2.extras import execute_values
 import bcrypt
 import json
 from urllib.parse import urlparse
@@ -16,9 +15,38 @@ from flask_limiter.util import get_remote_address
 
 # Import custom modules
 from config import config
+from spotify_client import make_spotify
 from middleware import require_login, require_admin
-from validators import validate_password, validate_username, sanitize_input, validate_trade_params
+from validators import (validate_password, validate_username, sanitize_input, validate_trade_params,
+                        validate_conditional_order_params, validate_backtest_params)
 from db_utils import get_db_connection, get_db_cursor
+from valuations import (apply_trade, apply_ticks, rebuild_valuations,
+                        backfill_current_popularity, remove_artist_positions)
+from leaderboard import (refresh_leaderboard, update_user_rank, get_user_rank,
+                         get_leaderboard_page)
+from trade_history import (record_daily_closes, backfill_daily_closes,
+                           get_trade_history_page)
+from portfolio_replay import replay_user, checkpoint_if_due
+from portfolio_analytics import get_portfolio_analytics
+from backtest import load_price_matrix, publish_price_matrix, run_backtest
+from price_snapshot import get_snapshot, publish_snapshot
+from search import find_artists, find_users
+from autocomplete import autocomplete, DEFAULT_LIMIT as AUTOCOMPLETE_LIMIT
+from artist_listing import get_artist_page, PAGE_SIZE as ARTIST_PAGE_SIZE
+from genre_facets import refresh_genre_facets, get_genre_facets, parse_genre_filter
+from movers import refresh_movers, get_movers, PERIODS as MOVER_PERIODS
+from spotify_search import search_artists, search_stats, SEARCH_STATUS_FORCELIST
+from refresh_scheduler import fetch_artists, update_artist_metadata, refresh_stale, REFRESH_BUDGET
+from artist_enrichment import (fetch_artist_bundle, save_artist_bundle, submit_enrichment,
+                               retry_pending_enrichment)
+from market_index import (rebuild_market_index, record_index_points, list_indices,
+                          get_index_chart, MARKET_INDEX, GENRE_PREFIX)
+from update_popularity import run_update
+from update_runs import completed_within
+from job_scheduler import start_scheduler, job_status
+from seed_pipeline import parse_artist_ids
+from artist_import import (create_import, run_import, get_import, list_imports, submit_import,
+                           fail_stale_imports, MAX_IMPORT_IDS)
 
 # Load environment variables
 load_dotenv()
@@ -59,20 +87,25 @@ if not app.debug:
 client_id = app.config['SPOTIFY_CLIENT_ID']
 client_secret = app.config['SPOTIFY_CLIENT_SECRET']
 
-# Set up Spotipy
-sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-    client_id=client_id,
-    client_secret=client_secret
-))
+# Set up Spotipy (SPOTIFY_API_BASE points it at a local stand-in)
+sp = make_spotify(client_id, client_secret)
+# Request-path searches fail fast into the circuit breaker instead of
+# sleeping through spotipy's retries. 429 is left out of the status list
+# so it surfaces as an HTTP error carrying its Retry-After header
+search_sp = make_spotify(client_id, client_secret, retries=0, status_retries=0, requests_timeout=5,
+                         status_forcelist=SEARCH_STATUS_FORCELIST)
 
-# Set up PostgreSQL connection pool with proper configuration
+# Set up PostgreSQL connection pool with proper configuration. Request
+# threads share it with scheduler, enrichment and import threads, so it
+# must be the thread-safe pool, sized for both
+pool_max = app.config['DB_POOL_MAX'] + app.config['DB_POOL_BACKGROUND']
 database_url = app.config['DATABASE_URL']
 if database_url:
     # Parse the DATABASE_URL (Railway provides this)
     result = urlparse(database_url)
-    db_pool = psycopg2.pool.SimpleConnectionPool(
+    db_pool = psycopg2.pool.ThreadedConnectionPool(
         app.config['DB_POOL_MIN'],
-        app.config['DB_POOL_MAX'],
+        pool_max,
         dbname=result.path[1:],
         user=result.username,
         password=result.password,
@@ -82,9 +115,9 @@ if database_url:
     )
 else:
     # Local development
-    db_pool = psycopg2.pool.SimpleConnectionPool(
+    db_pool = psycopg2.pool.ThreadedConnectionPool(
         app.config['DB_POOL_MIN'],
-        app.config['DB_POOL_MAX'],
+        pool_max,
         dbname="anticip_db",
         user="stephencoan",
         password="",
@@ -141,7 +174,8 @@ try:
             top_tracks JSONB DEFAULT '[]',
             recent_albums JSONB DEFAULT '[]',
             external_urls JSONB DEFAULT '{}',
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            payload_version SMALLINT NOT NULL DEFAULT 1
         );
         CREATE TABLE IF NOT EXISTS transactions (
             id SERIAL PRIMARY KEY,
@@ -177,6 +211,119 @@ try:
             points_reserve NUMERIC(12, 2),
             recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
+        CREATE TABLE IF NOT EXISTS conditional_orders (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id),
+            artist_id INTEGER REFERENCES artists(id),
+            order_type VARCHAR(11) CHECK (order_type IN ('stop_loss', 'take_profit')),
+            shares INTEGER NOT NULL CHECK (shares > 0),
+            trigger_popularity INTEGER NOT NULL,
+            privacy VARCHAR(10) DEFAULT 'private' CHECK (privacy IN ('public', 'followers', 'private')),
+            status VARCHAR(10) DEFAULT 'pending' CHECK (status IN ('pending', 'executed', 'cancelled')),
+            executed_shares INTEGER,
+            executed_popularity INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            executed_at TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS user_valuations (
+            user_id INTEGER PRIMARY KEY REFERENCES users(id),
+            invested_value NUMERIC(14, 2) DEFAULT 0,
+            cost_basis NUMERIC(14, 2) DEFAULT 0,
+            position_count INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            net_worth NUMERIC(14, 2) NOT NULL,
+            rank INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS artist_daily_close (
+            spotify_id VARCHAR(255) NOT NULL,
+            day DATE NOT NULL,
+            popularity INTEGER NOT NULL,
+            PRIMARY KEY (spotify_id, day)
+        );
+        CREATE TABLE IF NOT EXISTS portfolio_checkpoints (
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            as_of TIMESTAMP NOT NULL,
+            cash NUMERIC(14, 2) NOT NULL,
+            artist_ids INTEGER[] NOT NULL DEFAULT '{}',
+            shares INTEGER[] NOT NULL DEFAULT '{}',
+            PRIMARY KEY (user_id, as_of)
+        );
+        CREATE TABLE IF NOT EXISTS genre_facets (
+            genre TEXT PRIMARY KEY,
+            artist_count INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS artist_movers (
+            spotify_id VARCHAR(255) PRIMARY KEY REFERENCES artists(spotify_id) ON DELETE CASCADE,
+            popularity INTEGER NOT NULL,
+            delta_1d INTEGER,
+            delta_7d INTEGER,
+            delta_30d INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS market_index_state (
+            index_key VARCHAR(255) PRIMARY KEY,
+            popularity_sum BIGINT NOT NULL DEFAULT 0,
+            artist_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS market_index_history (
+            index_key VARCHAR(255) NOT NULL,
+            recorded_at TIMESTAMP NOT NULL,
+            value NUMERIC(7, 3) NOT NULL,
+            artist_count INTEGER NOT NULL,
+            PRIMARY KEY (index_key, recorded_at)
+        );
+        CREATE TABLE IF NOT EXISTS catalog_state (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            generation BIGINT NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS update_runs (
+            id SERIAL PRIMARY KEY,
+            status VARCHAR(20) NOT NULL DEFAULT 'running'
+                CHECK (status IN ('running', 'fetched', 'complete', 'abandoned')),
+            shard_index INTEGER NOT NULL DEFAULT 0,
+            shard_count INTEGER NOT NULL DEFAULT 1,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            heartbeat_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            artist_count INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 1
+        );
+        CREATE TABLE IF NOT EXISTS scheduled_jobs (
+            name VARCHAR(100) PRIMARY KEY,
+            last_started_at TIMESTAMP,
+            last_finished_at TIMESTAMP,
+            last_status VARCHAR(20),
+            last_error TEXT,
+            runs INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS artist_imports (
+            id SERIAL PRIMARY KEY,
+            created_by INTEGER REFERENCES users(id) ON DELETE SET NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued'
+                CHECK (status IN ('queued', 'running', 'complete', 'failed')),
+            total INTEGER NOT NULL,
+            processed INTEGER NOT NULL DEFAULT 0,
+            skipped INTEGER NOT NULL DEFAULT 0,
+            inserted INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS update_run_artists (
+            run_id INTEGER REFERENCES update_runs(id) ON DELETE CASCADE,
+            spotify_id VARCHAR(255) NOT NULL,
+            popularity INTEGER,
+            checkpointed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_id, spotify_id)
+        );
     """)
     
     # Add missing columns if they don't exist (for database migration)
@@ -231,6 +378,109 @@ try:
             app.logger.info("Adding missing caption column to transactions table...")
             cursor.execute("ALTER TABLE transactions ADD COLUMN caption TEXT")
         
+        # Check if current_popularity column exists in artists table
+        cursor.execute("""
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name='artists' AND column_name='current_popularity'
+        """)
+        if not cursor.fetchone():
+            app.logger.info("Adding missing current_popularity column to artists table...")
+            cursor.execute("ALTER TABLE artists ADD COLUMN current_popularity INTEGER")
+            cursor.execute("ALTER TABLE artists ADD COLUMN quoted_at TIMESTAMP")
+        
+        # Deferred adds are stamped until their first quote (see artist_enrichment.py)
+        cursor.execute("""
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name='artists' AND column_name='enrichment_pending_at'
+        """)
+        if not cursor.fetchone():
+            app.logger.info("Adding missing enrichment_pending_at column to artists table...")
+            cursor.execute("ALTER TABLE artists ADD COLUMN enrichment_pending_at TIMESTAMP")
+        
+        # Rows from before the compact track/album projection stay at version 1
+        # until spotify_projection.compact_payloads rewrites them
+        cursor.execute("""
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name='spotify_data' AND column_name='payload_version'
+        """)
+        if not cursor.fetchone():
+            app.logger.info("Adding missing payload_version column to spotify_data table...")
+            cursor.execute("ALTER TABLE spotify_data ADD COLUMN payload_version SMALLINT NOT NULL DEFAULT 1")
+        
+        # Popularity rows written by update_popularity.py record their run (see update_runs.py)
+        cursor.execute("""
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name='artist_history' AND column_name='run_id'
+        """)
+        if not cursor.fetchone():
+            app.logger.info("Adding missing run_id column to artist_history table...")
+            cursor.execute("ALTER TABLE artist_history ADD COLUMN run_id INTEGER")
+        
+        # Quote artists and seed valuation summaries for pre-existing data
+        backfill_current_popularity(cursor)
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM user_valuations)")
+        if not cursor.fetchone()[0]:
+            app.logger.info("Seeding user valuation summaries...")
+            rebuild_valuations(cursor)
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM artist_daily_close)")
+        if not cursor.fetchone()[0]:
+            app.logger.info("Backfilling artist daily closes...")
+            backfill_daily_closes(cursor)
+        
+        # Trade history sorts and paginates on total_amount
+        cursor.execute("""
+            UPDATE transactions SET total_amount = shares * popularity_per_share
+            WHERE total_amount IS NULL
+        """)
+        
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM leaderboard)")
+        if not cursor.fetchone()[0]:
+            app.logger.info("Ranking leaderboard...")
+            refresh_leaderboard(cursor)
+        
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM genre_facets)")
+        if not cursor.fetchone()[0]:
+            app.logger.info("Counting genre facets...")
+            refresh_genre_facets(cursor)
+        
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM artist_movers)")
+        if not cursor.fetchone()[0]:
+            app.logger.info("Computing top movers...")
+            refresh_movers(cursor)
+        
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM market_index_state)")
+        if not cursor.fetchone()[0]:
+            app.logger.info("Building market index...")
+            rebuild_market_index(cursor)
+            record_index_points(cursor)
+        
+        # Bump the catalog generation whenever artists are added, removed or
+        # renamed so workers know to rebuild their autocomplete index
+        cursor.execute("INSERT INTO catalog_state DEFAULT VALUES ON CONFLICT DO NOTHING")
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION bump_catalog_generation() RETURNS trigger AS $$
+            BEGIN
+                UPDATE catalog_state SET generation = generation + 1;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_trigger WHERE tgname = 'artists_catalog_generation'
+                ) THEN
+                    CREATE TRIGGER artists_catalog_generation
+                        AFTER INSERT OR DELETE OR UPDATE OF name, image_url ON artists
+                        FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_generation();
+                END IF;
+            END $$;
+        """)
+        
         # Add database constraints for data integrity
         app.logger.info("Adding database constraints...")
         cursor.execute("""
@@ -270,6 +520,8 @@ try:
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_artist_history_spotify_time 
                 ON artist_history(spotify_id, recorded_at DESC);
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_artist_history_run
+                ON artist_history(run_id, spotify_id) WHERE run_id IS NOT NULL;
             CREATE INDEX IF NOT EXISTS idx_transactions_user_time 
                 ON transactions(user_id, created_at DESC);
             CREATE INDEX IF NOT EXISTS idx_bets_user_artist 
@@ -282,6 +534,33 @@ try:
                 ON transaction_likes(transaction_id, user_id);
             CREATE INDEX IF NOT EXISTS idx_transaction_comments_lookup
                 ON transaction_comments(transaction_id, created_at);
+            CREATE INDEX IF NOT EXISTS idx_conditional_orders_pending
+                ON conditional_orders(artist_id, trigger_popularity) WHERE status = 'pending';
+            CREATE INDEX IF NOT EXISTS idx_conditional_orders_user
+                ON conditional_orders(user_id, artist_id, status);
+            CREATE INDEX IF NOT EXISTS idx_leaderboard_rank
+                ON leaderboard(rank, user_id);
+            CREATE INDEX IF NOT EXISTS idx_leaderboard_net_worth
+                ON leaderboard(net_worth);
+            CREATE INDEX IF NOT EXISTS idx_transactions_user_shares
+                ON transactions(user_id, shares, id);
+            CREATE INDEX IF NOT EXISTS idx_transactions_user_amount
+                ON transactions(user_id, total_amount, id);
+            CREATE INDEX IF NOT EXISTS idx_artist_daily_close_day
+                ON artist_daily_close(day);
+            CREATE INDEX IF NOT EXISTS idx_artists_listing_name
+                ON artists(name, id) WHERE current_popularity IS NOT NULL;
+            CREATE INDEX IF NOT EXISTS idx_artists_listing_popularity
+                ON artists(current_popularity, id) WHERE current_popularity IS NOT NULL;
+            CREATE INDEX IF NOT EXISTS idx_spotify_data_genres
+                ON spotify_data USING gin (genres);
+            CREATE INDEX IF NOT EXISTS idx_genre_facets_count
+                ON genre_facets(artist_count DESC, genre);
+            CREATE INDEX IF NOT EXISTS idx_artist_movers_1d ON artist_movers(delta_1d, spotify_id);
+            CREATE INDEX IF NOT EXISTS idx_artist_movers_7d ON artist_movers(delta_7d, spotify_id);
+            CREATE INDEX IF NOT EXISTS idx_artist_movers_30d ON artist_movers(delta_30d, spotify_id);
+            CREATE INDEX IF NOT EXISTS idx_market_index_history_recorded
+                ON market_index_history(recorded_at);
         """)
             
     except Exception as migration_error:
@@ -363,6 +642,28 @@ def health_check():
         }), 503
 
 
+@app.route('/api/admin/spotify_search_stats')
+@require_admin
+def spotify_search_stats():
+    """Hit/miss counters and circuit breaker state of the Spotify search cache"""
+    return search_stats()
+
+
+@app.route('/api/admin/scheduled_jobs')
+@require_admin
+def scheduled_jobs():
+    """Last run of each in-process scheduled job"""
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        return {'enabled': app.config['SCHEDULER_ENABLED'], 'jobs': job_status(cursor)}
+    except Exception as e:
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
+
 # Routes
 @app.route('/')
 def home():
@@ -374,33 +675,38 @@ def home():
 @app.route('/artists')
 @require_login
 def list_artists():
-    search_query = request.args.get('search', '').lower()
-    order = request.args.get('order', 'alphabetical')
+    search_query = request.args.get('search', '').strip()
+    # Searches keep their similarity ranking unless another order is picked
+    order = request.args.get('order', 'relevance' if search_query else 'alphabetical')
     direction = request.args.get('direction', 'asc')
+    genres = parse_genre_filter(request.args.getlist('genre'))
     conn = db_pool.getconn()
     try:
         cursor = conn.cursor()
-        # Get only the latest popularity for each artist
-        query = """
-            SELECT a.spotify_id, a.name, ah.popularity, ah.recorded_at, a.image_url
-            FROM artists a
-            JOIN LATERAL (
-                SELECT * FROM artist_history ah2
-                WHERE ah2.spotify_id = a.spotify_id
-                ORDER BY ah2.recorded_at DESC
-                LIMIT 1
-            ) ah ON true
-            WHERE a.name ILIKE %s
-        """
-        cursor.execute(query, (f'%{search_query}%',))
-        records = cursor.fetchall()
-        # Sort records based on order and direction
-        reverse = direction == 'desc'
-        if order == 'alphabetical':
-            records.sort(key=lambda x: x[1], reverse=reverse)  # x[1] is name
-        elif order == 'popularity':
-            records.sort(key=lambda x: x[2] if x[2] is not None else 0, reverse=reverse)  # x[2] is popularity
-        return render_template('artists.html', records=records, search_query=search_query, order=order, direction=direction)
+        next_cursor = None
+        if search_query:
+            # Search results are already capped, so they are sorted here
+            artists = find_artists(cursor, search_query, genres=genres)
+            quotes = get_snapshot(cursor).quotes([row[0] for row in artists])
+            records = [(spotify_id, name, quotes[spotify_id][0], quotes[spotify_id][1], image_url)
+                       for spotify_id, name, image_url in artists if spotify_id in quotes]
+            reverse = direction == 'desc'
+            if order == 'alphabetical':
+                records.sort(key=lambda x: x[1], reverse=reverse)  # x[1] is name
+            elif order == 'popularity':
+                records.sort(key=lambda x: x[2], reverse=reverse)  # x[2] is popularity
+        else:
+            try:
+                page = get_artist_page(cursor, order, direction, request.args.get('cursor'),
+                                       limit=request.args.get('limit', ARTIST_PAGE_SIZE, type=int),
+                                       genres=genres)
+            except ValueError as e:
+                return str(e), 400
+            records = page['artists']
+            next_cursor = page['next_cursor']
+        return render_template('artists.html', records=records, search_query=search_query, order=order,
+                               direction=direction, next_cursor=next_cursor,
+                               genres=genres, genre_facets=get_genre_facets(cursor))
     except Exception as e:
         conn.rollback()
         return f"Database error: {str(e)}", 500
@@ -408,6 +714,23 @@ def list_artists():
         cursor.close()
         db_pool.putconn(conn)
 
+@app.route('/api/artists/autocomplete')
+@require_login
+@limiter.limit("120 per minute")
+def artist_autocomplete_api():
+    """Most popular catalog artists whose name (or a later word) starts with q"""
+    query = request.args.get('q', '')
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        results = autocomplete(cursor, query, request.args.get('limit', AUTOCOMPLETE_LIMIT, type=int))
+        return {'query': query, 'results': results}
+    except Exception as e:
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
 # New route for artist detail view
 @app.route('/artist/<spotify_id>')
 @require_login
@@ -426,7 +749,11 @@ def artist_detail(spotify_id):
         
         # Fetch additional Spotify data from local storage
         try:
-            cursor.execute("SELECT followers, popularity, genres, top_tracks, recent_albums, external_urls FROM spotify_data WHERE spotify_id = %s", (spotify_id,))
+            cursor.execute("""
+                SELECT followers, popularity, genres, jsonb_path_query_array(top_tracks, '$[0 to 4]'),
+                       recent_albums, external_urls
+                FROM spotify_data WHERE spotify_id = %s
+            """, (spotify_id,))
             spotify_row = cursor.fetchone()
             if spotify_row:
                 spotify_info = {
@@ -467,10 +794,21 @@ def artist_detail(spotify_id):
             shares = int(holdings[0])
             avg_popularity = float(holdings[1])
             holdings = (shares, avg_popularity)
-        # Get current popularity
-        cursor.execute("SELECT popularity FROM artist_history WHERE spotify_id = %s ORDER BY recorded_at DESC LIMIT 1", (spotify_id,))
-        popularity_row = cursor.fetchone()
-        current_popularity = float(popularity_row[0]) if popularity_row else None
+        # Get current popularity (the trade form prices against it)
+        quote = get_snapshot(cursor).popularity_of(spotify_id)
+        current_popularity = float(quote) if quote is not None else None
+        # Get user's pending stop-loss / take-profit orders
+        cursor.execute("""
+            SELECT id, order_type, shares, trigger_popularity, created_at
+            FROM conditional_orders
+            WHERE user_id = %s AND artist_id = %s AND status = 'pending'
+            ORDER BY created_at
+        """, (user_id, artist_id))
+        conditional_orders = [
+            {'id': row[0], 'order_type': row[1], 'shares': row[2],
+             'trigger_popularity': row[3], 'created_at': row[4]}
+            for row in cursor.fetchall()
+        ]
         # For artist detail, just pass order to template for dropdown (no sorting needed)
         return render_template('artist_detail.html', 
                              artist=(name, image_url), 
@@ -479,7 +817,8 @@ def artist_detail(spotify_id):
                              holdings=holdings, 
                              current_popularity=current_popularity, 
                              order=order,
-                             spotify_info=spotify_info)
+                             spotify_info=spotify_info,
+                             conditional_orders=conditional_orders)
     except Exception as e:
         conn.rollback()
         return f"Database error: {str(e)}", 500
@@ -493,86 +832,146 @@ def add_artist():
     if request.method == 'POST':
         artist_name = request.form['artist_name']
         try:
-            results = sp.search(q=artist_name, type='artist', limit=5)
-            artists = results['artists']['items']
+            artists = search_artists(search_sp, artist_name, limit=5)
             return render_template('add_artist.html', artists=artists, search_query=artist_name)
         except Exception as e:
             return render_template('add_artist.html', error=str(e))
     # If GET, just show the form
     return render_template('add_artist.html')
 
+def enrich_artist(spotify_id, name):
+    """Background job for deferred adds: fetch Spotify data, then quote the artist"""
+    try:
+        bundle = fetch_artist_bundle(sp, spotify_id)
+    except Exception as spotify_error:
+        app.logger.error(f"Error fetching Spotify data for {spotify_id}: {str(spotify_error)}")
+        bundle = None
+    
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        save_artist_bundle(cursor, spotify_id, bundle)
+        conn.commit()
+        app.logger.info(f"Enriched new artist: {name} ({spotify_id})")
+        publish_snapshot(cursor)
+    except Exception as e:
+        conn.rollback()
+        app.logger.error(f"Error enriching artist {spotify_id}: {str(e)}", exc_info=True)
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
+def import_artists_job(import_id, spotify_ids):
+    """Background job for bulk imports; progress is tracked in artist_imports"""
+    conn = db_pool.getconn()
+    try:
+        stats = run_import(sp, conn, import_id, spotify_ids)
+        app.logger.info(f"Artist import #{import_id} added {stats['inserted']} artists")
+        cursor = conn.cursor()
+        try:
+            publish_snapshot(cursor)
+        finally:
+            cursor.close()
+    except Exception as e:
+        app.logger.error(f"Error in artist import #{import_id}: {str(e)}", exc_info=True)
+    finally:
+        db_pool.putconn(conn)
+
+@app.route('/api/admin/artist_imports', methods=['GET', 'POST'])
+@require_admin
+def artist_imports():
+    """List recent bulk imports, or start one from pasted IDs or an uploaded file"""
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        if request.method == 'GET':
+            fail_stale_imports(cursor)
+            conn.commit()
+            return {'imports': list_imports(cursor)}
+        
+        lines = request.form.get('ids', '').splitlines()
+        upload = request.files.get('ids_file')
+        if upload:
+            lines += upload.read().decode('utf-8', errors='replace').splitlines()
+        spotify_ids = parse_artist_ids(lines)
+        if not spotify_ids:
+            return {'error': 'No Spotify artist IDs found'}, 400
+        if len(spotify_ids) > MAX_IMPORT_IDS:
+            return {'error': f'Imports are limited to {MAX_IMPORT_IDS:,} IDs'}, 400
+        
+        import_id = create_import(cursor, spotify_ids, session['user_id'])
+        conn.commit()
+        submit_import(import_artists_job, import_id, spotify_ids)
+        return {'import': get_import(cursor, import_id)}, 202
+    except Exception as e:
+        conn.rollback()
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
+@app.route('/api/admin/artist_imports/<int:import_id>')
+@require_admin
+def artist_import_progress(import_id):
+    """Progress of one bulk import"""
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        fail_stale_imports(cursor)
+        conn.commit()
+        progress = get_import(cursor, import_id)
+        if progress is None:
+            return {'error': 'Import not found'}, 404
+        return {'import': progress}
+    except Exception as e:
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
 @app.route('/confirm_add_artist', methods=['POST'])
 @require_login
 def confirm_add_artist():
     spotify_id = request.form['spotify_id']
     name = request.form['name']
     image_url = request.form.get('image_url')
+    deferred = app.config['DEFER_ARTIST_ENRICHMENT']
+    
+    # Fetch complete artist data from Spotify before touching the database
+    bundle = None
+    if not deferred:
+        try:
+            bundle = fetch_artist_bundle(sp, spotify_id)
+        except Exception as spotify_error:
+            # If Spotify fetch fails, log but don't fail the whole operation
+            app.logger.error(f"Error fetching Spotify data for {spotify_id}: {str(spotify_error)}")
     
     conn = db_pool.getconn()
     try:
         cursor = conn.cursor()
         
-        # Insert artist into database
+        # Insert artist into database; deferred adds stay marked pending until quoted
         cursor.execute("""
-            INSERT INTO artists (spotify_id, name, image_url) 
-            VALUES (%s, %s, %s) 
+            INSERT INTO artists (spotify_id, name, image_url, enrichment_pending_at) 
+            VALUES (%s, %s, %s, CASE WHEN %s THEN NOW() END) 
             ON CONFLICT (spotify_id) DO UPDATE 
             SET name = EXCLUDED.name, image_url = EXCLUDED.image_url
-        """, (spotify_id, name, image_url))
+        """, (spotify_id, name, image_url, deferred))
         
-        # Fetch complete artist data from Spotify
-        try:
-            # Get full artist details
-            artist_data = sp.artist(spotify_id)
-            
-            # Get top tracks from Spotify
-            top_tracks = sp.artist_top_tracks(spotify_id, country='US')
-            
-            # Get artist albums
-            albums = sp.artist_albums(spotify_id, album_type='album', limit=5)
-            
-            # Insert initial popularity history
-            popularity = artist_data.get('popularity', 0)
-            cursor.execute("""
-                INSERT INTO artist_history (spotify_id, popularity) 
-                VALUES (%s, %s)
-            """, (spotify_id, popularity))
-            
-            # Insert complete Spotify data (genres, followers, tracks, albums, etc.)
-            cursor.execute("""
-                INSERT INTO spotify_data 
-                (spotify_id, followers, popularity, genres, top_tracks, recent_albums, external_urls, last_updated)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
-                ON CONFLICT (spotify_id) DO UPDATE SET
-                    followers = EXCLUDED.followers,
-                    popularity = EXCLUDED.popularity,
-                    genres = EXCLUDED.genres,
-                    top_tracks = EXCLUDED.top_tracks,
-                    recent_albums = EXCLUDED.recent_albums,
-                    external_urls = EXCLUDED.external_urls,
-                    last_updated = NOW()
-            """, (
-                spotify_id,
-                artist_data.get('followers', {}).get('total', 0),
-                artist_data.get('popularity', 0),
-                artist_data.get('genres', []),
-                json.dumps(top_tracks.get('tracks', [])[:10]),  # Top 10 tracks
-                json.dumps(albums.get('items', [])[:5]),  # 5 most recent albums
-                json.dumps(artist_data.get('external_urls', {}))
-            ))
-            
-            app.logger.info(f"Added new artist: {name} ({spotify_id}) with complete Spotify data")
-            
-        except Exception as spotify_error:
-            # If Spotify fetch fails, log but don't fail the whole operation
-            app.logger.error(f"Error fetching Spotify data for {spotify_id}: {str(spotify_error)}")
-            # Still insert basic popularity history even if extended data fails
-            cursor.execute("""
-                INSERT INTO artist_history (spotify_id, popularity) 
-                VALUES (%s, %s)
-            """, (spotify_id, 0))
+        if deferred:
+            conn.commit()
+            submit_enrichment(enrich_artist, spotify_id, name)
+            return redirect(url_for('list_artists'))
         
+        # Quote the artist (at 0 if Spotify failed) and store its Spotify data
+        save_artist_bundle(cursor, spotify_id, bundle)
         conn.commit()
+        if bundle:
+            app.logger.info(f"Added new artist: {name} ({spotify_id}) with complete Spotify data")
+        try:
+            publish_snapshot(cursor)
+        except Exception as e:
+            app.logger.error(f"Error publishing price snapshot: {e}")
         return redirect(url_for('list_artists'))
         
     except Exception as e:
@@ -617,16 +1016,28 @@ def delete_artist(spotify_id):
         # 2. Delete transactions
         cursor.execute("DELETE FROM transactions WHERE artist_id = %s", (artist_id,))
         
-        # 3. Delete user bets
+        # 3. Delete user bets and their conditional orders
+        cursor.execute("DELETE FROM conditional_orders WHERE artist_id = %s", (artist_id,))
+        remove_artist_positions(cursor, artist_id)
         cursor.execute("DELETE FROM bets WHERE artist_id = %s", (artist_id,))
         
         # 4. Delete price history
         cursor.execute("DELETE FROM artist_history WHERE spotify_id = %s", (spotify_id,))
+        cursor.execute("DELETE FROM artist_daily_close WHERE spotify_id = %s", (spotify_id,))
         
         # 5. Finally delete the artist
         cursor.execute("DELETE FROM artists WHERE spotify_id = %s", (spotify_id,))
         
+        # Holders lost the position's value
+        refresh_leaderboard(cursor)
+        refresh_genre_facets(cursor)
+        rebuild_market_index(cursor)
+        
         conn.commit()
+        try:
+            publish_snapshot(cursor)
+        except Exception as e:
+            app.logger.error(f"Error publishing price snapshot: {e}")
         return redirect(url_for('list_artists'))
         
     except Exception as e:
@@ -699,6 +1110,7 @@ def register():
             result = cursor.fetchone()
             user_id = result[0]
             created_at = result[1]
+            update_user_rank(cursor, user_id)
             conn.commit()
             
             session.permanent = True
@@ -738,53 +1150,35 @@ def refresh_data():
         cursor.execute("SELECT spotify_id FROM artists")
         artist_ids = [row[0] for row in cursor.fetchall()]
         
-        updated_count = 0
-        for spotify_id in artist_ids:
-            try:
-                # Get artist details from Spotify
-                artist_data = sp.artist(spotify_id)
-                
-                # Get top tracks from Spotify
-                top_tracks = sp.artist_top_tracks(spotify_id, country='US')
-                
-                # Get artist albums
-                albums = sp.artist_albums(spotify_id, album_type='album', limit=5)
-                
-                # Update popularity history
-                popularity = artist_data['popularity']
-                cursor.execute("INSERT INTO artist_history (spotify_id, popularity) VALUES (%s, %s)",
-                               (spotify_id, popularity))
-                
-                # Update/insert spotify data
-                cursor.execute("""
-                    INSERT INTO spotify_data (spotify_id, followers, popularity, genres, top_tracks, recent_albums, external_urls, last_updated)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
-                    ON CONFLICT (spotify_id) DO UPDATE SET
-                        followers = EXCLUDED.followers,
-                        popularity = EXCLUDED.popularity,
-                        genres = EXCLUDED.genres,
-                        top_tracks = EXCLUDED.top_tracks,
-                        recent_albums = EXCLUDED.recent_albums,
-                        external_urls = EXCLUDED.external_urls,
-                        last_updated = NOW()
-                """, (
-                    spotify_id,
-                    artist_data.get('followers', {}).get('total', 0),
-                    artist_data.get('popularity', 0),
-                    artist_data.get('genres', []),
-                    json.dumps(top_tracks.get('tracks', [])[:10]),  # Convert to JSON string
-                    json.dumps(albums.get('items', [])[:5]),  # Convert to JSON string
-                    json.dumps(artist_data.get('external_urls', {}))  # Convert to JSON string
-                ))
-                
-                updated_count += 1
-                
-            except Exception as e:
-                print(f"Error refreshing {spotify_id}: {e}")
-        
+        # Popularity for everyone, 50 artists per Spotify call
+        artists, failed = fetch_artists(sp, artist_ids)
+        ticks = [(spotify_id, artist['popularity']) for spotify_id, artist in artists.items()]
+        execute_values(cursor, "INSERT INTO artist_history (spotify_id, popularity) VALUES %s", ticks)
+        update_artist_metadata(cursor, artists)
+        updated_count = len(ticks)
+        
+        # Top tracks and albums only for the most overdue artists, within budget
+        refreshed = refresh_stale(sp, cursor, REFRESH_BUDGET, artists)
+        print(f"Refreshed tracks/albums for {refreshed['refreshed']} of {refreshed['due']} due artists "
+              f"({refreshed['calls']} calls), {len(failed)} artists failed")
+        
+        # Move quotes and revalue holdings in one pass
+        apply_ticks(cursor, ticks)
+        record_daily_closes(cursor, ticks)
+        refresh_leaderboard(cursor)
+        refresh_genre_facets(cursor)
+        refresh_movers(cursor)
+        record_index_points(cursor)
         conn.commit()
         print(f"Successfully updated {updated_count} artists")
         
+        # Republish the quote snapshot and the backtest price matrix with today's closes
+        try:
+            publish_snapshot(cursor)
+            publish_price_matrix(cursor)
+        except Exception as e:
+            app.logger.error(f"Error publishing price snapshot/matrix: {e}")
+        
         # Record portfolio history for all users after data refresh
         record_portfolio_history()
         
@@ -816,9 +1210,9 @@ def buy_artist(spotify_id):
         # START ATOMIC TRANSACTION WITH ROW LOCKING
         cursor.execute("BEGIN")
         
-        # Get artist with lock
+        # Get artist and its current popularity with lock
         cursor.execute(
-            "SELECT id FROM artists WHERE spotify_id = %s FOR UPDATE", 
+            "SELECT id, current_popularity FROM artists WHERE spotify_id = %s FOR UPDATE", 
             (spotify_id,)
         )
         artist_row = cursor.fetchone()
@@ -826,18 +1220,10 @@ def buy_artist(spotify_id):
             conn.rollback()
             return "Artist not found", 404
         artist_id = artist_row[0]
-        
-        # Get current popularity
-        cursor.execute(
-            "SELECT popularity FROM artist_history WHERE spotify_id = %s "
-            "ORDER BY recorded_at DESC LIMIT 1", 
-            (spotify_id,)
-        )
-        popularity_row = cursor.fetchone()
-        if not popularity_row:
+        if artist_row[1] is None:
             conn.rollback()
             return "No popularity data", 400
-        popularity = float(popularity_row[0])
+        popularity = float(artist_row[1])
         total_cost = shares * popularity
         
         # Check and update balance with lock
@@ -882,6 +1268,9 @@ def buy_artist(spotify_id):
                 (user_id, artist_id, shares, popularity)
             )
         
+        # Update valuation summary by delta
+        apply_trade(cursor, user_id, total_cost, total_cost, 0 if bet else 1)
+        
         # Record transaction
         cursor.execute("""
             INSERT INTO transactions 
@@ -890,6 +1279,8 @@ def buy_artist(spotify_id):
             VALUES (%s, %s, 'buy', %s, %s, %s, %s, %s)
         """, (user_id, artist_id, shares, popularity, total_cost, caption, privacy))
         
+        update_user_rank(cursor, user_id)
+        
         # COMMIT ATOMIC TRANSACTION
         conn.commit()
         app.logger.info(f"User {user_id} bought {shares} shares of artist {artist_id} for ${total_cost}")
@@ -923,9 +1314,9 @@ def sell_artist(spotify_id):
         # START ATOMIC TRANSACTION WITH ROW LOCKING
         cursor.execute("BEGIN")
         
-        # Get artist with lock
+        # Get artist and its current popularity with lock
         cursor.execute(
-            "SELECT id FROM artists WHERE spotify_id = %s FOR UPDATE",
+            "SELECT id, current_popularity FROM artists WHERE spotify_id = %s FOR UPDATE",
             (spotify_id,)
         )
         artist_row = cursor.fetchone()
@@ -933,15 +1324,7 @@ def sell_artist(spotify_id):
             conn.rollback()
             return "Artist not found", 404
         artist_id = artist_row[0]
-        
-        # Get current popularity
-        cursor.execute(
-            "SELECT popularity FROM artist_history WHERE spotify_id = %s "
-            "ORDER BY recorded_at DESC LIMIT 1",
-            (spotify_id,)
-        )
-        popularity_row = cursor.fetchone()
-        popularity = float(popularity_row[0]) if popularity_row else 0.0
+        popularity = float(artist_row[1]) if artist_row[1] is not None else 0.0
         total_value = shares * popularity
         
         # Check holdings with lock
@@ -967,6 +1350,10 @@ def sell_artist(spotify_id):
         else:
             cursor.execute("DELETE FROM bets WHERE id = %s", (bet_id,))
         
+        # Update valuation summary by delta
+        apply_trade(cursor, user_id, -total_value, -(shares * float(avg_popularity)),
+                    -1 if new_shares == 0 else 0)
+        
         # Add balance
         cursor.execute(
             "UPDATE users SET balance = balance + %s WHERE id = %s",
@@ -981,6 +1368,8 @@ def sell_artist(spotify_id):
             VALUES (%s, %s, 'sell', %s, %s, %s, %s, %s)
         """, (user_id, artist_id, shares, popularity, total_value, caption, privacy))
         
+        update_user_rank(cursor, user_id)
+        
         # COMMIT ATOMIC TRANSACTION
         conn.commit()
         app.logger.info(f"User {user_id} sold {shares} shares of artist {artist_id} for ${total_value}")
@@ -994,6 +1383,80 @@ def sell_artist(spotify_id):
         cursor.close()
         db_pool.putconn(conn)
 
+@app.route('/conditional_order/<spotify_id>', methods=['POST'])
+@require_login
+def create_conditional_order(spotify_id):
+    """Place a stop-loss or take-profit order on an existing position"""
+    user_id = session['user_id']
+    order_type = request.form.get('order_type', '')
+    shares = int(request.form.get('shares', 0))
+    trigger_popularity = int(request.form.get('trigger_popularity', 0))
+    privacy = request.form.get('privacy', 'private')
+    
+    # Validate inputs
+    is_valid, error_msg = validate_conditional_order_params(order_type, shares, trigger_popularity, privacy)
+    if not is_valid:
+        return error_msg, 400
+    
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT a.id, b.shares
+            FROM artists a
+            LEFT JOIN bets b ON b.artist_id = a.id AND b.user_id = %s
+            WHERE a.spotify_id = %s
+        """, (user_id, spotify_id))
+        row = cursor.fetchone()
+        if not row:
+            return "Artist not found", 404
+        artist_id, held_shares = row
+        if not held_shares or held_shares < shares:
+            return "Not enough shares to protect", 400
+        
+        cursor.execute("""
+            INSERT INTO conditional_orders
+            (user_id, artist_id, order_type, shares, trigger_popularity, privacy)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (user_id, artist_id, order_type, shares, trigger_popularity, privacy))
+        conn.commit()
+        app.logger.info(f"User {user_id} placed {order_type} for {shares} shares of artist {artist_id} at {trigger_popularity}")
+        return redirect(url_for('artist_detail', spotify_id=spotify_id))
+    except Exception as e:
+        conn.rollback()
+        app.logger.error(f"Conditional order error: {str(e)}", exc_info=True)
+        return "Order failed. Please try again.", 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
+@app.route('/cancel_conditional_order/<int:order_id>', methods=['POST'])
+@require_login
+def cancel_conditional_order(order_id):
+    """Cancel one of the current user's pending conditional orders"""
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE conditional_orders o
+            SET status = 'cancelled', executed_at = NOW()
+            FROM artists a
+            WHERE o.id = %s AND o.user_id = %s AND o.status = 'pending'
+              AND a.id = o.artist_id
+            RETURNING a.spotify_id
+        """, (order_id, session['user_id']))
+        row = cursor.fetchone()
+        conn.commit()
+        if not row:
+            return "Order not found", 404
+        return redirect(url_for('artist_detail', spotify_id=row[0]))
+    except Exception as e:
+        conn.rollback()
+        return f"Database error: {str(e)}", 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
 @app.route('/portfolio')
 @app.route('/user/<int:user_id>/portfolio')
 def portfolio(user_id=None):
@@ -1015,55 +1478,54 @@ def portfolio(user_id=None):
     try:
         cursor = conn.cursor()
         
-        # Get the user's username and basic info
-        cursor.execute("SELECT username FROM users WHERE id = %s", (user_id,))
+        # Get the user's username, balance and valuation summary
+        cursor.execute("""
+            SELECT u.username, u.balance,
+                   COALESCE(v.invested_value, 0), COALESCE(v.cost_basis, 0)
+            FROM users u
+            LEFT JOIN user_valuations v ON v.user_id = u.id
+            WHERE u.id = %s
+        """, (user_id,))
         user_result = cursor.fetchone()
         if not user_result:
             return "User not found", 404
         username = user_result[0]
-        # Get user's balance
-        cursor.execute("SELECT balance FROM users WHERE id = %s", (user_id,))
-        balance_result = cursor.fetchone()
-        if not balance_result or balance_result[0] is None:
+        if user_result[1] is None:
             return "User balance not found", 404
-        actual_balance = float(balance_result[0])
+        actual_balance = float(user_result[1])
+        current_value = float(user_result[2])
+        total_invested = float(user_result[3])
         
         # For display purposes, only show balance for own portfolio
         balance = actual_balance if is_own_portfolio else 0.0
         
         # Get all user's holdings with current popularity
         cursor.execute("""
-            WITH latest_popularity AS (
-                SELECT DISTINCT ON (spotify_id) spotify_id, popularity
-                FROM artist_history
-                ORDER BY spotify_id, recorded_at DESC
-            )
             SELECT 
                 a.name,
                 b.shares,
                 b.avg_popularity,
-                lp.popularity as current_popularity,
+                a.current_popularity,
                 a.spotify_id
             FROM bets b
             JOIN artists a ON b.artist_id = a.id
-            JOIN latest_popularity lp ON a.spotify_id = lp.spotify_id
-            WHERE b.user_id = %s
+            WHERE b.user_id = %s AND a.current_popularity IS NOT NULL
         """, (user_id,))
         
         raw_holdings = cursor.fetchall()
+        quotes = get_snapshot(cursor).quotes([h[4] for h in raw_holdings])
         
         # Process holdings data into objects for template
         holdings = []
-        total_invested = 0
-        current_value = 0
         
         if raw_holdings:
             for h in raw_holdings:
                 name = h[0]
                 shares = float(h[1]) if h[1] is not None else 0
                 avg_popularity = float(h[2]) if h[2] is not None else 0
-                current_popularity = float(h[3]) if h[3] is not None else 0
                 spotify_id = h[4]
+                quote = quotes[spotify_id][0] if spotify_id in quotes else h[3]
+                current_popularity = float(quote) if quote is not None else 0
                 
                 # Calculate values for this holding
                 value = shares * current_popularity
@@ -1077,7 +1539,10 @@ def portfolio(user_id=None):
                 image_url = image_result[0] if image_result else None
                 
                 # Get local Spotify data
-                cursor.execute("SELECT followers, popularity, genres, top_tracks FROM spotify_data WHERE spotify_id = %s", (spotify_id,))
+                cursor.execute("""
+                    SELECT followers, popularity, genres, jsonb_path_query_array(top_tracks, '$[0 to 2]')
+                    FROM spotify_data WHERE spotify_id = %s
+                """, (spotify_id,))
                 spotify_row = cursor.fetchone()
                 if spotify_row:
                     # JSONB fields are already parsed by psycopg2, no need for json.loads()
@@ -1086,7 +1551,7 @@ def portfolio(user_id=None):
                         'followers': spotify_row[0] or 0,
                         'popularity': spotify_row[1] or 0,
                         'genres': spotify_row[2] or [],  # TEXT[] array is already a list
-                        'top_tracks': top_tracks_data[:3]  # Top 3 for portfolio
+                        'top_tracks': top_tracks_data  # Top 3 for portfolio, sliced in SQL
                     }
                 else:
                     spotify_info = {
@@ -1110,10 +1575,6 @@ def portfolio(user_id=None):
                     'spotify_info': spotify_info
                 }
                 holdings.append(holding)
-                
-                # Add to totals
-                total_invested += cost
-                current_value += value
             
             # Apply sorting
             if order == 'alphabetical':
@@ -1128,83 +1589,24 @@ def portfolio(user_id=None):
             elif order == 'percent_gain':
                 holdings.sort(key=lambda x: x['percent_gain'], reverse=(direction == 'desc'))
             
-            gain = current_value - total_invested
-            net_worth = actual_balance + current_value  # Always calculate total net worth
-            
             # Calculate percent of holdings that are profitable
             profitable_holdings = sum(1 for h in holdings if h['gain'] > 0)
             percent_winning = (profitable_holdings / len(holdings) * 100)
         else:
-            total_invested = 0.0
-            current_value = 0.0
-            gain = 0.0
-            net_worth = actual_balance  # Always include balance in total
             percent_winning = 0.0
         
-        # Get trade history data (completed trades)
-        trade_history = []
+        # Totals come from the incrementally maintained valuation summary
+        gain = current_value - total_invested
+        net_worth = actual_balance + current_value  # Always calculate total net worth
+        
+        # First page of trade history; sorting and paging happen in SQL
         history_order = request.args.get('history_order', 'date')
         history_direction = request.args.get('history_direction', 'desc')
-        
-        if is_own_portfolio or not is_own_portfolio:  # Show trade history for all profiles
-            # Query for all transactions (both buy and sell)
-            cursor.execute("""
-                SELECT 
-                    a.name as artist_name,
-                    a.image_url,
-                    a.spotify_id,
-                    t.transaction_type,
-                    t.shares,
-                    t.popularity_per_share,
-                    COALESCE(t.total_amount, t.shares * t.popularity_per_share) as total_amount,
-                    t.created_at,
-                    ah.popularity
-                FROM transactions t
-                JOIN artists a ON t.artist_id = a.id
-                LEFT JOIN artist_history ah ON a.spotify_id = ah.spotify_id 
-                    AND DATE(ah.recorded_at) = DATE(t.created_at)
-                WHERE t.user_id = %s
-                ORDER BY 
-                    CASE WHEN %s = 'date' THEN t.created_at END DESC,
-                    CASE WHEN %s = 'artist' THEN a.name END ASC,
-                    CASE WHEN %s = 'shares' THEN t.shares END DESC,
-                    CASE WHEN %s = 'total_amount' THEN COALESCE(t.total_amount, t.shares * t.popularity_per_share) END DESC
-            """, (user_id, history_order, history_order, history_order, history_order))
-            
-            trade_data = cursor.fetchall()
-            
-            for trade in trade_data:
-                created_at = trade[7]
-                trade_obj = {
-                    'artist_name': trade[0],
-                    'image_url': trade[1],
-                    'spotify_id': trade[2],
-                    'transaction_type': trade[3],  # 'buy' or 'sell'
-                    'shares': int(trade[4]) if trade[4] else 0,
-                    'popularity_per_share': float(trade[5]) if trade[5] else 0.0,
-                    'total_amount': float(trade[6]) if trade[6] else 0.0,
-                    'created_at': created_at,
-                    'popularity': int(trade[8]) if trade[8] else 0,
-                    # Add fields that the template might expect, with safe date handling
-                    'buy_popularity': int(trade[8]) if trade[8] else 0,
-                    'sell_popularity': int(trade[8]) if trade[8] else 0,
-                    'total_gain': 0.0,  # Individual transactions don't have gain
-                    'percent_gain': 0.0,
-                    'buy_date': created_at if trade[3] == 'buy' and created_at else created_at,
-                    'sell_date': created_at if trade[3] == 'sell' and created_at else created_at
-                }
-                trade_history.append(trade_obj)
-            
-            # Apply direction sorting if not default
-            if history_direction == 'asc':
-                if history_order == 'date':
-                    trade_history.sort(key=lambda x: x['created_at'])
-                elif history_order == 'artist':
-                    trade_history.sort(key=lambda x: x['artist_name'])
-                elif history_order == 'shares':
-                    trade_history.sort(key=lambda x: x['shares'])
-                elif history_order == 'total_amount':
-                    trade_history.sort(key=lambda x: x['total_amount'])
+        try:
+            history_page = get_trade_history_page(cursor, user_id, history_order, history_direction,
+                                                  request.args.get('history_cursor'))
+        except ValueError as e:
+            return str(e), 400
         
         return render_template('portfolio.html',
                             holdings=holdings,
@@ -1219,7 +1621,8 @@ def portfolio(user_id=None):
                             username=username,
                             user_id=user_id,
                             is_own_portfolio=is_own_portfolio,
-                            trade_history=trade_history)
+                            trade_history=history_page['trades'],
+                            history_next_cursor=history_page['next_cursor'])
     except Exception as e:
         return f"Database error: {str(e)}", 500
     finally:
@@ -1227,6 +1630,65 @@ def portfolio(user_id=None):
         db_pool.putconn(conn)
 
 # Social Features Routes
+@app.route('/leaderboard')
+@require_login
+def leaderboard():
+    scope = request.args.get('scope', 'global')
+    following_of = session['user_id'] if scope == 'following' else None
+    
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        page = get_leaderboard_page(cursor, request.args.get('cursor'), following_of=following_of)
+        my_rank = get_user_rank(cursor, session['user_id'])
+        return render_template('leaderboard.html', entries=page['entries'],
+                               next_cursor=page['next_cursor'], my_rank=my_rank, scope=scope)
+    except ValueError as e:
+        return str(e), 400
+    except Exception as e:
+        return f"Database error: {str(e)}", 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
+@app.route('/api/leaderboard')
+@require_login
+def get_leaderboard_api():
+    """Keyset-paginated leaderboard (scope=global|following)"""
+    scope = request.args.get('scope', 'global')
+    following_of = session['user_id'] if scope == 'following' else None
+    
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        return get_leaderboard_page(cursor, request.args.get('cursor'),
+                                    limit=request.args.get('limit', 50, type=int),
+                                    following_of=following_of)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except Exception as e:
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
+@app.route('/api/leaderboard/me')
+@require_login
+def get_my_rank_api():
+    """Current user's leaderboard rank"""
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        my_rank = get_user_rank(cursor, session['user_id'])
+        if not my_rank:
+            return {'error': 'Not ranked yet'}, 404
+        return my_rank
+    except Exception as e:
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
 @app.route('/all_users')
 def all_users():
     if 'user_id' not in session:
@@ -1318,20 +1780,7 @@ def search_users():
     try:
         cursor = conn.cursor()
         # Search for users and get their follow status
-        cursor.execute("""
-            SELECT u.id, u.username,
-                CASE
-                    WHEN f.status IS NULL THEN 'none'
-                    WHEN f.status = 'pending' THEN 'pending'
-                    WHEN f.status = 'accepted' THEN 'following'
-                END as follow_status
-            FROM users u
-            LEFT JOIN follows f ON f.followed_id = u.id AND f.follower_id = %s
-            WHERE u.id != %s AND u.username ILIKE %s
-            ORDER BY u.username
-        """, (session['user_id'], session['user_id'], f'%{query}%'))
-        users = [{'id': id, 'username': username, 'follow_status': status} 
-                for id, username, status in cursor.fetchall()]
+        users = find_users(cursor, session['user_id'], query)
         return render_template('search_users.html', users=users, query=query)
     except Exception as e:
         return f"Database error: {str(e)}", 500
@@ -1469,6 +1918,61 @@ def settings():
         cursor.close()
         db_pool.putconn(conn)
 
+@app.route('/api/movers')
+@require_login
+def get_movers_api():
+    """Biggest gainers and losers over 1d, 7d or 30d"""
+    period = request.args.get('period', '1d')
+    if period not in MOVER_PERIODS:
+        return {'error': f"period must be one of {', '.join(MOVER_PERIODS)}"}, 400
+    limit = request.args.get('limit', 10, type=int)
+    
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        return {
+            'period': period,
+            'gainers': get_movers(cursor, period, 'gainers', limit),
+            'losers': get_movers(cursor, period, 'losers', limit),
+        }
+    except Exception as e:
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
+@app.route('/api/market_index')
+@require_login
+def get_market_index_api():
+    """Market index (or a genre sub-index) history for charting"""
+    index = request.args.get('index', MARKET_INDEX).strip()
+    index_key = index if index == MARKET_INDEX else GENRE_PREFIX + index
+    time_range = request.args.get('range', '1month')
+
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        return get_index_chart(cursor, index_key, time_range)
+    except Exception as e:
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
+@app.route('/api/market_indices')
+@require_login
+def get_market_indices_api():
+    """Current value of the market index and the largest genre indices"""
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        return {'indices': list_indices(cursor)}
+    except Exception as e:
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
 @app.route('/feed')
 def feed():
     if 'user_id' not in session:
@@ -1556,7 +2060,16 @@ def feed():
         
         transactions = cursor.fetchall()
         
-        return render_template('feed.html', transactions=transactions, view_mode=view_mode)
+        movers_period = request.args.get('movers', '1d')
+        if movers_period not in MOVER_PERIODS:
+            movers_period = '1d'
+        movers = {
+            'gainers': get_movers(cursor, movers_period, 'gainers', 5),
+            'losers': get_movers(cursor, movers_period, 'losers', 5),
+        }
+        
+        return render_template('feed.html', transactions=transactions, view_mode=view_mode,
+                               movers=movers, movers_period=movers_period)
     except Exception as e:
         return f"Database error: {str(e)}", 500
     finally:
@@ -1750,72 +2263,27 @@ def get_portfolio_history(user_id):
         cursor.close()
         db_pool.putconn(conn)
 
+def insert_portfolio_history(cursor):
+    """Snapshot every user from the valuation summaries in one statement"""
+    cursor.execute("""
+        INSERT INTO portfolio_history (user_id, total_points, points_invested, points_reserve)
+        SELECT u.id,
+               COALESCE(u.balance, 0) + COALESCE(v.invested_value, 0),
+               COALESCE(v.invested_value, 0),
+               COALESCE(u.balance, 0)
+        FROM users u
+        LEFT JOIN user_valuations v ON v.user_id = u.id
+    """)
+    return cursor.rowcount
+
 def record_portfolio_history():
     """Record current portfolio values for all users"""
     conn = db_pool.getconn()
     try:
         cursor = conn.cursor()
-        
-        # Get all users
-        cursor.execute("SELECT id FROM users")
-        user_ids = [row[0] for row in cursor.fetchall()]
-        print(f"📊 Recording portfolio history for {len(user_ids)} users")
-        
-        for user_id in user_ids:
-            try:
-                # Calculate current portfolio values for this user
-                
-                # Get user's balance
-                cursor.execute("SELECT balance FROM users WHERE id = %s", (user_id,))
-                balance_result = cursor.fetchone()
-                balance = float(balance_result[0]) if balance_result and balance_result[0] is not None else 0.0
-                
-                # Get user's holdings with current popularity
-                cursor.execute("""
-                    WITH latest_popularity AS (
-                        SELECT DISTINCT ON (spotify_id) spotify_id, popularity
-                        FROM artist_history
-                        ORDER BY spotify_id, recorded_at DESC
-                    )
-                    SELECT 
-                        b.shares,
-                        b.avg_popularity,
-                        lp.popularity as current_popularity
-                    FROM bets b
-                    JOIN artists a ON b.artist_id = a.id
-                    JOIN latest_popularity lp ON a.spotify_id = lp.spotify_id
-                    WHERE b.user_id = %s
-                """, (user_id,))
-                
-                holdings = cursor.fetchall()
-                
-                # Calculate portfolio totals
-                total_invested = 0.0
-                current_value = 0.0
-                
-                for holding in holdings:
-                    shares = float(holding[0]) if holding[0] is not None else 0
-                    avg_popularity = float(holding[1]) if holding[1] is not None else 0
-                    current_popularity = float(holding[2]) if holding[2] is not None else 0
-                    
-                    total_invested += shares * avg_popularity
-                    current_value += shares * current_popularity
-                
-                total_points = balance + current_value
-                
-                print(f"  User {user_id}: Balance={balance}, Invested={current_value}, Total={total_points}")
-                
-                # Record the portfolio snapshot
-                cursor.execute("""
-                    INSERT INTO portfolio_history (user_id, total_points, points_invested, points_reserve)
-                    VALUES (%s, %s, %s, %s)
-                """, (user_id, total_points, current_value, balance))
-                
-            except Exception as e:
-                print(f"Error recording portfolio history for user {user_id}: {e}")
-        
+        recorded = insert_portfolio_history(cursor)
         conn.commit()
-        print(f"✅ Recorded portfolio history for {len(user_ids)} users")
+        print(f"✅ Recorded portfolio history for {recorded} users")
         
     except Exception as e:
         print(f"Error in record_portfolio_history: {e}")
@@ -1833,6 +2301,122 @@ def test_portfolio_history():
     record_portfolio_history()
     return "Portfolio history recorded successfully! <a href='/portfolio'>View Portfolio</a>"
 
+@app.route('/api/trade_history/<int:user_id>')
+@require_login
+def get_trade_history_api(user_id):
+    """Keyset-paginated trade history (order, direction, cursor, limit)"""
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        page = get_trade_history_page(cursor, user_id,
+                                      request.args.get('order', 'date'),
+                                      request.args.get('direction', 'desc'),
+                                      request.args.get('cursor'),
+                                      request.args.get('limit', 50, type=int))
+        for trade in page['trades']:
+            trade['created_at'] = trade['created_at'].isoformat() if trade['created_at'] else None
+        return page
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except Exception as e:
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
+@app.route('/api/portfolio_at/<int:user_id>')
+@require_login
+def get_portfolio_at_api(user_id):
+    """Reconstruct a user's portfolio at ?at=<ISO timestamp> from the ledger"""
+    # Balances and positions are private, as on /portfolio
+    if user_id != session['user_id'] and not session.get('is_admin', False):
+        return {'error': 'Forbidden'}, 403
+
+    try:
+        at = datetime.fromisoformat(request.args['at']) if 'at' in request.args else datetime.now()
+    except ValueError:
+        return {'error': 'Invalid timestamp'}, 400
+    
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        state = replay_user(cursor, user_id, at)
+        if state is None:
+            return {'error': 'User did not exist at that time'}, 404
+        return {
+            'at': state['at'].isoformat(),
+            'cash': round(state['cash'], 2),
+            'invested': round(state['invested'], 2),
+            'total': round(state['total'], 2),
+            'positions': [{'artist_id': artist_id, 'shares': shares}
+                          for artist_id, shares in sorted(state['positions'].items())],
+        }
+    except Exception as e:
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
+@app.route('/api/portfolio_analytics/<int:user_id>')
+@require_login
+def get_portfolio_analytics_api(user_id):
+    """Risk/return metrics for a user's portfolio over ?range="""
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        return get_portfolio_analytics(cursor, user_id, request.args.get('range', '1month'))
+    except Exception as e:
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
+@app.route('/api/backtest')
+@require_login
+@limiter.limit("10 per minute")
+def run_backtest_api():
+    """Backtest a rebalancing strategy and return its equity curve"""
+    strategy = request.args.get('strategy', 'risers')
+    count = request.args.get('count', 10, type=int)
+    lookback = request.args.get('lookback', 7, type=int)
+    rebalance_every = request.args.get('rebalance', 7, type=int)
+    days = request.args.get('days', 365, type=int)
+    initial_points = request.args.get('points', 10000, type=int)
+    
+    is_valid, error_msg = validate_backtest_params(strategy, count, lookback, rebalance_every, days, initial_points)
+    if not is_valid:
+        return {'error': error_msg}, 400
+    
+    conn = db_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        result = run_backtest(load_price_matrix(cursor), strategy, count, lookback,
+                              rebalance_every, days, initial_points)
+        
+        # Format data for Chart.js with time scale
+        return {
+            'datasets': [{
+                'label': f"{strategy.capitalize()} (top {count}, every {rebalance_every}d)",
+                'data': [{'x': day, 'y': value} for day, value in zip(result['dates'], result['equity'])],
+                'borderColor': '#10b981',
+                'backgroundColor': 'rgba(16, 185, 129, 0.1)',
+                'tension': 0.2,
+                'fill': True
+            }],
+            'total_return': result['total_return'],
+            'max_drawdown': result['max_drawdown'],
+            'trades': result['trades'],
+            'holdings': [{'spotify_id': spotify_id, 'name': name, 'shares': shares}
+                         for spotify_id, name, shares in result['holdings']],
+        }
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except Exception as e:
+        return {'error': str(e)}, 500
+    finally:
+        cursor.close()
+        db_pool.putconn(conn)
+
 @app.route('/api/artist_history/<spotify_id>')
 def get_artist_history_api(spotify_id):
     """Get artist price history data for charting with time range filtering"""
@@ -1914,6 +2498,65 @@ def get_artist_history_api(spotify_id):
         cursor.close()
         db_pool.putconn(conn)
 
+# Scheduled jobs (SCHEDULER_ENABLED); each runs on one worker across all replicas
+def scheduled_popularity_update(conn):
+    """Popularity tick, as update_popularity.py, then republish the quote snapshot and price matrix"""
+    cursor = conn.cursor()
+    try:
+        # A cron-driven update_popularity.py already ticked this interval
+        if completed_within(cursor, app.config['SCHEDULER_POPULARITY_MINUTES'] * 60):
+            conn.rollback()
+            print("⏭️  Skipping scheduled popularity update: a run completed this interval")
+            return
+        conn.rollback()
+        if run_update(sp, conn):
+            raise RuntimeError("Popularity update failed; its run stays open for the next attempt")
+        publish_snapshot(cursor)
+        publish_price_matrix(cursor)
+    finally:
+        cursor.close()
+
+
+def scheduled_snapshots(conn):
+    """Portfolio history point for every user, plus a replay checkpoint when due"""
+    cursor = conn.cursor()
+    try:
+        recorded = insert_portfolio_history(cursor)
+        conn.commit()
+        print(f"✅ Recorded portfolio history for {recorded} users")
+        checkpointed = checkpoint_if_due(cursor)
+        conn.commit()
+        if checkpointed:
+            print(f"📌 Checkpointed {checkpointed} portfolios")
+    finally:
+        cursor.close()
+
+
+def scheduled_rollups(conn):
+    """Retry lost deferred adds and refresh the leaderboard, movers and genre facets"""
+    cursor = conn.cursor()
+    try:
+        enriched = retry_pending_enrichment(sp, conn)
+        if enriched:
+            print(f"➕ Enriched {enriched} pending artists")
+            publish_snapshot(cursor)
+        refresh_leaderboard(cursor)
+        refresh_movers(cursor)
+        refresh_genre_facets(cursor)
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+if app.config['SCHEDULER_ENABLED']:
+    scheduler = start_scheduler(db_pool, [
+        ('popularity', app.config['SCHEDULER_POPULARITY_MINUTES'], scheduled_popularity_update),
+        ('snapshots', app.config['SCHEDULER_SNAPSHOT_MINUTES'], scheduled_snapshots),
+        ('rollups', app.config['SCHEDULER_ROLLUP_MINUTES'], scheduled_rollups),
+    ])
+    app.logger.info("In-process scheduler started")
+
+
 def main():
     # Initialize Spotify API client and database connection
     app.run(debug=True, port=5004)
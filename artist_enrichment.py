@@ -0,0 +1,268 @@
+"""
+Spotify enrichment for newly added artists
+
+Adding an artist needs three Spotify calls (artist, top tracks, albums).
+fetch_artist_bundle issues them concurrently on a shared thread pool,
+so an add costs the slowest call rather than the sum, and it runs
+before any connection is taken from the pool; save_artist_bundle then
+writes everything in the caller's single short transaction.
+
+With DEFER_ARTIST_ENRICHMENT the request only inserts the artist row,
+stamped with enrichment_pending_at, and submit_enrichment runs fetch +
+save on a background thread; the artist shows up in the catalog once
+its first quote is written, which clears the stamp. Jobs lost to a
+worker restart or failure are picked up by retry_pending_enrichment
+from the scheduled rollups and the popularity update; a transient
+Spotify error leaves them pending for the next retry.
+
+The scheduled track/album refresh (refresh_scheduler.py) reuses
+fetch_bundles and upsert_spotify_data for many artists at once, on a
+separate batch pool.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2.extras import execute_values
+
+from valuations import apply_ticks
+from trade_history import record_daily_closes
+from genre_facets import refresh_genre_facets
+from market_index import lock_genres, apply_genre_changes
+from spotify_projection import project_tracks, project_albums, PROJECTION_VERSION
+
+
+TOP_TRACKS = 10
+RECENT_ALBUMS = 5
+
+# A deferred add still unquoted after this long is assumed lost and retried
+RETRY_PENDING_MINUTES = 10
+
+# Three calls per add; sized for a few concurrent adds per worker
+_calls = ThreadPoolExecutor(max_workers=12, thread_name_prefix='spotify-call')
+
+# Batch refreshes queue hundreds of calls; they get their own pool so
+# interactive adds never wait behind them
+_batch_calls = ThreadPoolExecutor(max_workers=12, thread_name_prefix='spotify-batch')
+
+# Deferred jobs wait on _calls, so they get their own pool to avoid starving it
+_jobs = ThreadPoolExecutor(max_workers=2, thread_name_prefix='artist-enrich')
+
+
+def fetch_bundles(sp, spotify_ids, artists=None, batch=False):
+    """
+    Fetch top tracks and albums (and the artist, unless given) for many
+    artists, all calls in flight on the shared pool at once.
+
+    Args:
+        sp: spotipy client
+        spotify_ids: Artists to fetch
+        artists: Optional spotify_id -> artist object already fetched
+        batch: Use the batch pool instead of the interactive one
+
+    Returns:
+        dict: spotify_id -> bundle dict (artist, top_tracks, albums), or
+            the exception that failed that artist's fetch
+    """
+    artists = artists or {}
+    pool = _batch_calls if batch else _calls
+    pending = {}
+    for spotify_id in spotify_ids:
+        pending[spotify_id] = {
+            'top_tracks': pool.submit(sp.artist_top_tracks, spotify_id, country='US'),
+            'albums': pool.submit(sp.artist_albums, spotify_id, album_type='album', limit=RECENT_ALBUMS),
+        }
+        if spotify_id not in artists:
+            pending[spotify_id]['artist'] = pool.submit(sp.artist, spotify_id)
+
+    bundles = {}
+    for spotify_id, futures in pending.items():
+        try:
+            bundle = {key: future.result() for key, future in futures.items()}
+            bundle.setdefault('artist', artists.get(spotify_id))
+            bundles[spotify_id] = bundle
+        except Exception as e:
+            bundles[spotify_id] = e
+    return bundles
+
+
+def fetch_artist_bundle(sp, spotify_id):
+    """
+    Fetch an artist, its top tracks and its albums concurrently.
+
+    Returns:
+        dict: artist, top_tracks and albums responses
+
+    Raises:
+        Exception: The first Spotify error, if any call fails
+    """
+    bundle = fetch_bundles(sp, [spotify_id])[spotify_id]
+    if isinstance(bundle, Exception):
+        raise bundle
+    return bundle
+
+
+def upsert_spotify_data(cursor, bundles):
+    """
+    Store artists' Spotify data, projecting tracks and albums to the
+    compact payload and stamping last_updated. Quoted artists whose
+    genres changed are moved between genre indices.
+
+    Args:
+        cursor: Database cursor
+        bundles: Iterable of (spotify_id, bundle) pairs
+
+    Returns:
+        list: spotify_ids whose genres changed
+    """
+    rows = []
+    for spotify_id, bundle in bundles:
+        artist_data = bundle['artist'] or {}
+        rows.append((
+            spotify_id,
+            artist_data.get('followers', {}).get('total', 0),
+            artist_data.get('popularity', 0),
+            artist_data.get('genres', []),
+            json.dumps(project_tracks(bundle['top_tracks'].get('tracks'), TOP_TRACKS)),
+            json.dumps(project_albums(bundle['albums'].get('items'), RECENT_ALBUMS)),
+            json.dumps(artist_data.get('external_urls', {})),
+        ))
+    if not rows:
+        return []
+    old_genres = lock_genres(cursor, [row[0] for row in rows])
+    changes = [(row[0], old_genres.get(row[0]), row[3]) for row in rows
+               if set(old_genres.get(row[0]) or ()) != set(row[3])]
+    execute_values(cursor, f"""
+        INSERT INTO spotify_data
+        (spotify_id, followers, popularity, genres, top_tracks, recent_albums, external_urls,
+         last_updated, payload_version)
+        VALUES %s
+        ON CONFLICT (spotify_id) DO UPDATE SET
+            followers = EXCLUDED.followers,
+            popularity = EXCLUDED.popularity,
+            genres = EXCLUDED.genres,
+            top_tracks = EXCLUDED.top_tracks,
+            recent_albums = EXCLUDED.recent_albums,
+            external_urls = EXCLUDED.external_urls,
+            last_updated = NOW(),
+            payload_version = EXCLUDED.payload_version
+    """, rows, template=f"(%s, %s, %s, %s::text[], %s::jsonb, %s::jsonb, %s::jsonb, NOW(), {PROJECTION_VERSION})")
+    apply_genre_changes(cursor, changes)
+    return [spotify_id for spotify_id, _, _ in changes]
+
+
+def save_artist_bundles(cursor, bundles):
+    """
+    Write added artists' first quotes and Spotify data.
+
+    A missing bundle (Spotify failed) still quotes the artist at 0 so
+    it is tradable. Clears the artists' enrichment_pending_at and
+    refreshes genre facets; the first tick adds the artists to their
+    market indices. Must run inside the caller's transaction, after the
+    artists rows exist.
+
+    Args:
+        cursor: Database cursor
+        bundles: Iterable of (spotify_id, bundle or None) pairs
+
+    Returns:
+        dict: spotify_id -> initial popularity
+    """
+    bundles = list(bundles)
+    if not bundles:
+        return {}
+    ticks = [(spotify_id, (bundle['artist'] if bundle else {}).get('popularity', 0))
+             for spotify_id, bundle in bundles]
+    execute_values(cursor, """
+        INSERT INTO artist_history (spotify_id, popularity)
+        VALUES %s
+    """, ticks)
+
+    # Spotify data first, so the tick files the artists under their genres
+    upsert_spotify_data(cursor, [(spotify_id, bundle) for spotify_id, bundle in bundles if bundle])
+
+    apply_ticks(cursor, ticks)
+    record_daily_closes(cursor, ticks)
+    cursor.execute("""
+        UPDATE artists SET enrichment_pending_at = NULL
+        WHERE spotify_id = ANY(%s) AND enrichment_pending_at IS NOT NULL
+    """, ([spotify_id for spotify_id, _ in ticks],))
+    refresh_genre_facets(cursor)
+    return dict(ticks)
+
+
+def save_artist_bundle(cursor, spotify_id, bundle):
+    """
+    Write an added artist's first quote and Spotify data.
+
+    See save_artist_bundles.
+
+    Returns:
+        int: The artist's initial popularity
+    """
+    return save_artist_bundles(cursor, [(spotify_id, bundle)])[spotify_id]
+
+
+def _permanent_failure(error):
+    """Whether Spotify rejected the artist itself (bad or unknown id), not a transient error"""
+    return getattr(error, 'http_status', None) in (400, 404)
+
+
+def retry_pending_enrichment(sp, conn, limit=50):
+    """
+    Enrich deferred adds whose background job never finished.
+
+    Artists stamped more than RETRY_PENDING_MINUTES ago are claimed by
+    re-stamping them and committing (skipping rows another retry is
+    claiming), then fetched outside any transaction and quoted like a
+    synchronous add. Artists whose fetch failed transiently stay pending
+    for the next retry; ids Spotify rejects are quoted at 0.
+
+    Args:
+        sp: spotipy client
+        conn: Database connection (committed here)
+        limit: Maximum artists to retry
+
+    Returns:
+        int: Number of artists enriched
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE artists SET enrichment_pending_at = NOW()
+            WHERE id IN (
+                SELECT id FROM artists
+                WHERE enrichment_pending_at < NOW() - make_interval(mins => %s)
+                ORDER BY enrichment_pending_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING spotify_id
+        """, (RETRY_PENDING_MINUTES, limit))
+        spotify_ids = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+        if not spotify_ids:
+            return 0
+
+        bundles = fetch_bundles(sp, spotify_ids, batch=True)
+        saved = []
+        for spotify_id, bundle in bundles.items():
+            if not isinstance(bundle, Exception):
+                saved.append((spotify_id, bundle))
+            elif _permanent_failure(bundle):
+                print(f"Spotify rejected pending artist {spotify_id}, quoting at 0: {bundle}")
+                saved.append((spotify_id, None))
+            else:
+                print(f"Error fetching Spotify data for {spotify_id}, will retry: {bundle}")
+        save_artist_bundles(cursor, saved)
+        conn.commit()
+        return len(saved)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def submit_enrichment(job, *args):
+    """Run job(*args) on the background enrichment pool"""
+    return _jobs.submit(job, *args)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Admin bulk import of artists by Spotify ID
+
+Adding artists one at a time costs three Spotify calls and a
+transaction each. An import takes thousands of IDs (pasted, uploaded or
+from a file), drops the ones already in the catalog against a set of
+known IDs loaded once at the start, and runs the rest through the seed
+pipeline's stages: 50 IDs per sp.artists call, concurrently under a
+rate limit, and COPY-based bulk loads of IMPORT_CHUNK artists at a time.
+
+Progress lives in artist_imports, updated after every chunk, so any
+web worker can report it while the job runs on another. Web imports run
+on their own executor, one at a time per gunicorn worker (several
+workers can each run one), so they never hold up deferred single-artist
+adds. An import lost to a worker restart stops updating its row;
+fail_stale_imports marks it failed so pollers stop, and an import
+marked failed that later reaches the executor stops at its first
+progress update (ImportAbandoned) instead of reviving the row. Tracks and
+albums are left to the staleness-driven refresh, which picks imported
+artists up first.
+
+Usage:
+    python artist_import.py ids.txt          # IDs, URIs or URLs, one per line
+    python artist_import.py - < ids.txt
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from genre_facets import refresh_genre_facets
+from market_index import rebuild_market_index
+from seed_pipeline import collect_artists, bulk_load, load_known_ids, parse_artist_ids, REQUESTS_PER_SECOND
+
+MAX_IMPORT_IDS = 50000
+IMPORT_CHUNK = 1000
+
+# A chunk takes seconds, so a running import this quiet has lost its worker;
+# queued imports may legitimately wait behind another import for a while
+STALE_RUNNING_MINUTES = 10
+STALE_QUEUED_MINUTES = 60
+
+_imports = ThreadPoolExecutor(max_workers=1, thread_name_prefix='artist-import')
+
+IMPORT_COLUMNS = "id, status, total, processed, skipped, inserted, failed, error, created_at, finished_at"
+
+
+def create_import(cursor, spotify_ids, user_id=None):
+    """
+    Record a new import of the given IDs.
+
+    Returns:
+        int: The import's id
+    """
+    cursor.execute("""
+        INSERT INTO artist_imports (created_by, total)
+        VALUES (%s, %s)
+        RETURNING id
+    """, (user_id, len(spotify_ids)))
+    return cursor.fetchone()[0]
+
+
+class ImportAbandoned(Exception):
+    """The import was marked failed or finished elsewhere (e.g. by fail_stale_imports)"""
+
+
+def _update_progress(cursor, import_id, stats, status='running', error=None):
+    """Report progress; raises ImportAbandoned if the import is no longer open"""
+    cursor.execute("""
+        UPDATE artist_imports
+        SET status = %s, processed = %s, skipped = %s, inserted = %s, failed = %s, error = %s,
+            updated_at = NOW(),
+            finished_at = CASE WHEN %s IN ('complete', 'failed') THEN NOW() END
+        WHERE id = %s AND status NOT IN ('failed', 'complete')
+    """, (status, stats['processed'], stats['skipped'], stats['inserted'], stats['failed'], error,
+          status, import_id))
+    if cursor.rowcount == 0:
+        raise ImportAbandoned(f"Import #{import_id} is no longer queued or running")
+
+
+def run_import(sp, conn, import_id, spotify_ids, rate=REQUESTS_PER_SECOND, chunk_size=IMPORT_CHUNK):
+    """
+    Import artists by ID, committing and reporting progress per chunk.
+
+    Args:
+        sp: spotipy client
+        conn: Database connection (committed per chunk)
+        import_id: artist_imports row to report progress on
+        spotify_ids: IDs to import, duplicates and known IDs included
+        rate: Spotify calls per second
+        chunk_size: IDs fetched and loaded per chunk
+
+    Returns:
+        dict: processed, skipped (known or duplicate), inserted and
+            failed (not found on Spotify) counts
+
+    Raises:
+        ImportAbandoned: If the import was marked failed in the meantime
+    """
+    cursor = conn.cursor()
+    stats = {'processed': 0, 'skipped': 0, 'inserted': 0, 'failed': 0}
+    try:
+        known = load_known_ids(cursor)
+        unique = list(dict.fromkeys(spotify_ids))
+        pending = [spotify_id for spotify_id in unique if spotify_id not in known]
+        stats['skipped'] = stats['processed'] = len(spotify_ids) - len(pending)
+        _update_progress(cursor, import_id, stats)
+        conn.commit()
+
+        for i in range(0, len(pending), chunk_size):
+            chunk = pending[i:i + chunk_size]
+            artists, collected = collect_artists(sp, spotify_ids=chunk, rate=rate)
+            stats['inserted'] += bulk_load(cursor, artists.values())
+            stats['failed'] += collected['failed']
+            stats['processed'] += len(chunk)
+            _update_progress(cursor, import_id, stats)
+            conn.commit()
+            print(f"📦 Import #{import_id}: {stats['processed']:,}/{len(spotify_ids):,} IDs processed, "
+                  f"{stats['inserted']:,} added")
+
+        if stats['inserted']:
+            refresh_genre_facets(cursor)
+            rebuild_market_index(cursor)
+        _update_progress(cursor, import_id, stats, 'complete')
+        conn.commit()
+        return stats
+    except ImportAbandoned:
+        # Chunks committed so far stay, so their artists still join the
+        # facets and indices; the row keeps the status it was given
+        conn.rollback()
+        if stats['inserted']:
+            refresh_genre_facets(cursor)
+            rebuild_market_index(cursor)
+            conn.commit()
+        raise
+    except Exception as e:
+        conn.rollback()
+        try:
+            _update_progress(cursor, import_id, stats, 'failed', str(e)[:500])
+        except ImportAbandoned:
+            pass
+        conn.commit()
+        raise
+    finally:
+        cursor.close()
+
+
+def submit_import(job, *args):
+    """Run job(*args) on the import executor"""
+    return _imports.submit(job, *args)
+
+
+def fail_stale_imports(cursor):
+    """
+    Mark imports whose worker stopped reporting progress as failed.
+
+    Returns:
+        int: Number of imports marked failed
+    """
+    cursor.execute("""
+        UPDATE artist_imports
+        SET status = 'failed', error = 'Import stopped reporting progress (worker restarted?)',
+            updated_at = NOW(), finished_at = NOW()
+        WHERE (status = 'running' AND updated_at < NOW() - make_interval(mins => %s))
+           OR (status = 'queued' AND updated_at < NOW() - make_interval(mins => %s))
+    """, (STALE_RUNNING_MINUTES, STALE_QUEUED_MINUTES))
+    return cursor.rowcount
+
+
+def _import_row(row):
+    import_id, status, total, processed, skipped, inserted, failed, error, created_at, finished_at = row
+    return {'id': import_id, 'status': status, 'total': total, 'processed': processed,
+            'skipped': skipped, 'inserted': inserted, 'failed': failed, 'error': error,
+            'progress': round(processed / total, 3) if total else 1.0,
+            'created_at': created_at.isoformat() if created_at else None,
+            'finished_at': finished_at.isoformat() if finished_at else None}
+
+
+def get_import(cursor, import_id):
+    """Progress of one import, or None"""
+    cursor.execute(f"SELECT {IMPORT_COLUMNS} FROM artist_imports WHERE id = %s", (import_id,))
+    row = cursor.fetchone()
+    return _import_row(row) if row else None
+
+
+def list_imports(cursor, limit=20):
+    """Most recent imports, newest first"""
+    cursor.execute(f"SELECT {IMPORT_COLUMNS} FROM artist_imports ORDER BY id DESC LIMIT %s", (limit,))
+    return [_import_row(row) for row in cursor.fetchall()]
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import sys
+    import psycopg2
+    from dotenv import load_dotenv
+    from spotify_client import make_spotify
+
+    parser = argparse.ArgumentParser(description="Bulk import artists from a file of Spotify IDs")
+    parser.add_argument('ids_file', help="File of artist IDs, URIs or URLs ('-' for stdin)")
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, help="Spotify calls per second")
+    args = parser.parse_args()
+
+    if args.ids_file == '-':
+        spotify_ids = parse_artist_ids(sys.stdin)
+    else:
+        with open(args.ids_file) as f:
+            spotify_ids = parse_artist_ids(f)
+    if len(spotify_ids) > MAX_IMPORT_IDS:
+        sys.exit(f"❌ {len(spotify_ids):,} IDs given; imports are limited to {MAX_IMPORT_IDS:,}")
+
+    load_dotenv()
+    sp = make_spotify(os.getenv("SPOTIFY_CLIENT_ID"), os.getenv("SPOTIFY_CLIENT_SECRET"))
+    database_url = os.getenv("DATABASE_URL", "postgresql://localhost/anticip_db")
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+    conn = psycopg2.connect(database_url)
+    cursor = conn.cursor()
+    try:
+        import_id = create_import(cursor, spotify_ids)
+        conn.commit()
+        print(f"📥 Import #{import_id}: {len(spotify_ids):,} IDs")
+        stats = run_import(sp, conn, import_id, spotify_ids, rate=args.rate)
+        print(f"✅ Added {stats['inserted']:,} artists, skipped {stats['skipped']:,} known or duplicate IDs, "
+              f"{stats['failed']:,} not found on Spotify")
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,75 @@
+"""
+Paginated artist catalog listing
+
+The /artists page is sorted and paginated in SQL on the quoted
+popularity stored on artists, with keyset cursors on (sort column, id)
+so every page is an index range scan regardless of catalog size.
+"""
+from genre_facets import genre_filter_sql
+from pagination import encode_cursor, decode_cursor
+
+
+PAGE_SIZE = 60
+MAX_PAGE_SIZE = 200
+
+# sort key -> (SQL column, cursor value converter)
+SORT_KEYS = {
+    'alphabetical': ('a.name', str),
+    'popularity': ('a.current_popularity', int),
+}
+
+SORT_DIRECTIONS = ('asc', 'desc')
+
+
+def get_artist_page(cursor, order='alphabetical', direction='asc', cursor_token=None,
+                    limit=PAGE_SIZE, genres=None):
+    """
+    Fetch one keyset-paginated page of quoted artists.
+
+    Args:
+        cursor: Database cursor
+        order: One of SORT_KEYS (unknown keys fall back to alphabetical)
+        direction: 'asc' or 'desc'
+        cursor_token: next_cursor from the previous page, or None
+        limit: Page size (capped at MAX_PAGE_SIZE)
+        genres: Only list artists tagged with all of these genres
+
+    Returns:
+        dict: artists as (spotify_id, name, popularity, quoted_at,
+            image_url) tuples and next_cursor (None on the last page)
+
+    Raises:
+        ValueError: If cursor_token is malformed
+    """
+    if order not in SORT_KEYS:
+        order = 'alphabetical'
+    if direction not in SORT_DIRECTIONS:
+        direction = 'asc'
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    column, converter = SORT_KEYS[order]
+    after = decode_cursor(cursor_token, (converter, int))
+
+    filters = ""
+    params = []
+    if genres:
+        filters += f" AND {genre_filter_sql('a.spotify_id')}"
+        params.append(list(genres))
+    if after:
+        comparison = '>' if direction == 'asc' else '<'
+        filters += f" AND ({column}, a.id) {comparison} (%s, %s)"
+        params.extend(after)
+
+    cursor.execute(f"""
+        SELECT a.spotify_id, a.name, a.current_popularity, a.quoted_at, a.image_url, a.id
+        FROM artists a
+        WHERE a.current_popularity IS NOT NULL AND a.name IS NOT NULL{filters}
+        ORDER BY {column} {direction}, a.id {direction}
+        LIMIT %s
+    """, params + [limit + 1])
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor((last[1] if order == 'alphabetical' else last[2], last[5]))
+    return {'artists': [row[:5] for row in rows[:limit]], 'next_cursor': next_cursor}
@@ -0,0 +1,181 @@
+"""
+In-memory artist autocomplete
+
+Each worker keeps a sorted array of normalized name keys (the full name
+plus every suffix starting at a word, so "swi" finds "Taylor Swift") and
+answers a prefix with two bisects and a top-k by popularity over the
+matching range. Nothing touches the database per keystroke: the index
+is rebuilt only when catalog_state.generation moves (checked at most
+every GENERATION_CHECK_INTERVAL seconds) or a new price snapshot is
+mapped.
+"""
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from price_snapshot import get_snapshot
+
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+# Seconds between a worker's catalog generation checks
+GENERATION_CHECK_INTERVAL = 5
+
+# Prefixes matching more keys than this have their top-k memoized per build
+MEMO_RANGE = 2000
+
+_index = None
+_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.split())
+
+
+def _name_keys(name):
+    """Full normalized name plus the suffix starting at each later word"""
+    words = normalize(name).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+class AutocompleteIndex:
+    """Sorted prefix index over the artist catalog"""
+
+    def __init__(self, generation, snapshot_version, artists, popularity):
+        """
+        Args:
+            generation: catalog_state.generation the catalog was read at
+            snapshot_version: Version of the price snapshot popularity came from
+            artists: List of (spotify_id, name, image_url) tuples
+            popularity: Popularity per artist (-1 when unquoted)
+        """
+        self.generation = generation
+        self.artists = artists
+        entries = sorted((key, i) for i, artist in enumerate(artists) for key in _name_keys(artist[1]))
+        self.keys = [key for key, _ in entries]
+        self.owners = np.array([i for _, i in entries], dtype=np.int64)
+        self.reprice(snapshot_version, popularity)
+
+    def reprice(self, snapshot_version, popularity):
+        """Swap in new popularity without re-sorting the keys"""
+        self.snapshot_version = snapshot_version
+        self.artist_popularity = np.asarray(popularity, dtype=np.int16)
+        self.popularity = self.artist_popularity[self.owners]
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.artists)
+
+    def _top(self, lo, hi, limit):
+        """Artist positions in [lo, hi) with the highest popularity, deduplicated"""
+        candidates = np.arange(lo, hi)
+        # Over-fetch a little: one artist can own several keys in a range
+        keep = limit * 4
+        if len(candidates) > keep:
+            candidates = lo + np.argpartition(-self.popularity[lo:hi], keep - 1)[:keep]
+        candidates = candidates[np.lexsort((candidates, -self.popularity[candidates]))]
+        owners = []
+        for owner in self.owners[candidates].tolist():
+            if owner not in owners:
+                owners.append(owner)
+                if len(owners) == limit:
+                    break
+        return owners
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Most popular artists with a name key starting with query.
+
+        Returns:
+            list: dicts with spotify_id, name, image_url and popularity
+                (None when unquoted)
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_right(self.keys, prefix + '\U0010ffff', lo)
+        if hi - lo > MEMO_RANGE:
+            owners = self._memo.get((prefix, limit))
+            if owners is None:
+                owners = self._memo[(prefix, limit)] = self._top(lo, hi, limit)
+        else:
+            owners = self._top(lo, hi, limit) if hi > lo else []
+
+        results = []
+        for i in owners:
+            spotify_id, name, image_url = self.artists[i]
+            popularity = int(self.artist_popularity[i])
+            results.append({
+                'spotify_id': spotify_id,
+                'name': name,
+                'image_url': image_url,
+                'popularity': popularity if popularity >= 0 else None,
+            })
+        return results
+
+
+def catalog_generation(cursor):
+    """Current catalog generation (bumped by a trigger on artists)"""
+    cursor.execute("SELECT generation FROM catalog_state")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def _popularity(artists, snapshot):
+    if snapshot is None:
+        return np.full(len(artists), -1, dtype=np.int16)
+    return snapshot.popularity_array([row[0] for row in artists])
+
+
+def build_index(cursor, generation, snapshot):
+    """Read the catalog and build a fresh index"""
+    cursor.execute("SELECT spotify_id, name, image_url FROM artists WHERE name IS NOT NULL")
+    artists = cursor.fetchall()
+    return AutocompleteIndex(generation, snapshot.version if snapshot is not None else None,
+                             artists, _popularity(artists, snapshot))
+
+
+def get_index(cursor):
+    """
+    This worker's autocomplete index, rebuilt when the catalog or the
+    price snapshot has changed.
+
+    The cursor is only used when the generation is due for a check or
+    the index needs rebuilding.
+
+    Returns:
+        AutocompleteIndex: Current index
+    """
+    global _index, _checked_at
+    with _index_lock:
+        snapshot = get_snapshot()
+        now = time.monotonic()
+        snapshot_version = snapshot.version if snapshot is not None else None
+        due = _index is None or now - _checked_at >= GENERATION_CHECK_INTERVAL
+        if not due and _index.snapshot_version == snapshot_version:
+            return _index
+
+        generation = catalog_generation(cursor)
+        _checked_at = now
+        snapshot = get_snapshot(cursor)
+        if _index is None or _index.generation != generation:
+            _index = build_index(cursor, generation, snapshot)
+        elif _index.snapshot_version != (snapshot.version if snapshot is not None else None):
+            # Only quotes moved: keep the sorted keys
+            _index.reprice(snapshot.version, _popularity(_index.artists, snapshot))
+        return _index
+
+
+def autocomplete(cursor, query, limit=DEFAULT_LIMIT):
+    """Top artists by popularity for a typed prefix"""
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    return get_index(cursor).search(query, limit)
@@ -0,0 +1,331 @@
+"""
+Strategy backtesting over artist popularity history
+
+Daily closes are loaded into a dense (day x artist) float32 matrix,
+carried forward over missing days, and cached as a memory-mapped .npy
+file. The scheduled popularity update and /refresh_data republish it
+after ingesting; a request that finds it stale rebuilds it under an
+advisory lock, and other processes keep serving the published file
+meanwhile (waiting only when there is none yet). Strategies are
+declared as dicts (see DEFAULT_STRATEGY) and run against that matrix
+with fills at the recorded popularity.
+
+Usage:
+    python backtest.py refresh
+    python backtest.py run --strategy risers --count 10 --lookback 7 --rebalance 7 --days 365
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+
+
+CACHE_DIR = os.getenv('BACKTEST_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'anticip_backtest'))
+META_FILE = 'price_matrix.json'
+
+# Rebuild even without a new day so today's intraday close is picked up
+MAX_MATRIX_AGE = 3600
+
+MATRIX_LOCK_ID = 4242005
+
+STRATEGIES = ('risers', 'fallers', 'popular')
+
+DEFAULT_STRATEGY = {
+    'strategy': 'risers',
+    'count': 10,
+    'lookback': 7,
+    'rebalance_every': 7,
+    'days': 365,
+    'initial_points': 10000,
+}
+
+PriceMatrix = namedtuple('PriceMatrix', 'version start spotify_ids names prices')
+
+_loaded = None
+_loaded_lock = threading.Lock()
+
+
+def build_price_matrix(cursor):
+    """
+    Load daily closes into a dense day x artist matrix.
+
+    Returns:
+        tuple: (prices float32 array with NaN before an artist's first
+            close, first day, spotify_ids, names)
+    """
+    cursor.execute("SELECT spotify_id, name FROM artists ORDER BY id")
+    artists = cursor.fetchall()
+    spotify_ids = [row[0] for row in artists]
+    names = [row[1] for row in artists]
+    column = {spotify_id: i for i, spotify_id in enumerate(spotify_ids)}
+
+    cursor.execute("SELECT spotify_id, day, popularity FROM artist_daily_close")
+    rows = [(column[spotify_id], day, popularity) for spotify_id, day, popularity in cursor.fetchall()
+            if spotify_id in column]
+    if not rows:
+        return np.empty((0, len(spotify_ids)), dtype=np.float32), date.today(), spotify_ids, names
+
+    columns, days, popularity = zip(*rows)
+    start = min(days)
+    day_index = np.array([(day - start).days for day in days])
+    prices = np.full((day_index.max() + 1, len(spotify_ids)), np.nan, dtype=np.float32)
+    prices[day_index, np.array(columns)] = popularity
+
+    # Carry each artist's last close forward over days without a tick
+    observed = np.where(np.isnan(prices), 0, np.arange(len(prices))[:, None])
+    np.maximum.accumulate(observed, axis=0, out=observed)
+    prices = prices[observed, np.arange(prices.shape[1])]
+    return prices, start, spotify_ids, names
+
+
+def publish_price_matrix(cursor, cache_dir=CACHE_DIR):
+    """
+    Rebuild the cached matrix and swap it in atomically.
+
+    The matrix goes to a versioned .npy file first; the metadata file that
+    points readers at it is replaced last, so readers never see a partial
+    matrix.
+
+    Returns:
+        dict: Metadata of the published matrix
+    """
+    prices, start, spotify_ids, names = build_price_matrix(cursor)
+    os.makedirs(cache_dir, exist_ok=True)
+    version = f"{time.time_ns()}"
+    matrix_file = f"price_matrix.{version}.npy"
+
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.npy')
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, prices)
+    os.replace(tmp_path, os.path.join(cache_dir, matrix_file))
+
+    meta = {
+        'version': version,
+        'matrix_file': matrix_file,
+        'start': start.isoformat(),
+        'built_through': (start + timedelta(days=len(prices) - 1)).isoformat(),
+        'built_at': time.time(),
+        'spotify_ids': spotify_ids,
+        'names': names,
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(cache_dir, META_FILE))
+
+    # Unlinking is safe for workers still mapping an old matrix
+    for name in os.listdir(cache_dir):
+        if name.startswith('price_matrix.') and name.endswith('.npy') and name != matrix_file:
+            os.remove(os.path.join(cache_dir, name))
+    return meta
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_stale(meta, latest_day):
+    return (meta is None
+            or time.time() - meta['built_at'] > MAX_MATRIX_AGE
+            or (latest_day and latest_day.isoformat() > meta['built_through']))
+
+
+def _republish(cursor, cache_dir, latest_day, wait):
+    """
+    Rebuild the matrix under the advisory lock unless another process
+    is already doing so (or, after waiting, has just done so).
+
+    Returns:
+        dict: Metadata of the matrix to map (None if nothing is published)
+    """
+    if wait:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MATRIX_LOCK_ID,))
+    else:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (MATRIX_LOCK_ID,))
+        if not cursor.fetchone()[0]:
+            return _read_meta(cache_dir)
+    try:
+        meta = _read_meta(cache_dir)
+        if _is_stale(meta, latest_day):
+            meta = publish_price_matrix(cursor, cache_dir)
+        return meta
+    except Exception:
+        # Clear an aborted transaction so the unlock below can run
+        cursor.connection.rollback()
+        raise
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (MATRIX_LOCK_ID,))
+
+
+def load_price_matrix(cursor, cache_dir=CACHE_DIR):
+    """
+    Map the cached price matrix, rebuilding it when stale.
+
+    The matrix is stale when artist_daily_close has a newer day than it
+    was built through, or it is older than MAX_MATRIX_AGE. Only the
+    process holding the advisory lock rebuilds; the others map the
+    published matrix as is.
+
+    Returns:
+        PriceMatrix: Memory-mapped prices plus artist lookup
+    """
+    global _loaded
+    meta = _read_meta(cache_dir)
+    cursor.execute("SELECT MAX(day) FROM artist_daily_close")
+    latest_day = cursor.fetchone()[0]
+
+    with _loaded_lock:
+        if _is_stale(meta, latest_day):
+            meta = _republish(cursor, cache_dir, latest_day, wait=meta is None)
+        if _loaded is None or _loaded.version != meta['version']:
+            try:
+                prices = np.load(os.path.join(cache_dir, meta['matrix_file']), mmap_mode='r')
+            except FileNotFoundError:
+                # Another process swapped in a newer matrix in between
+                meta = _read_meta(cache_dir) or _republish(cursor, cache_dir, latest_day, wait=True)
+                prices = np.load(os.path.join(cache_dir, meta['matrix_file']), mmap_mode='r')
+            _loaded = PriceMatrix(meta['version'], date.fromisoformat(meta['start']),
+                                  meta['spotify_ids'], meta['names'], prices)
+        return _loaded
+
+
+def _scores(prices, day, strategy, lookback):
+    """Rank artists for a rebalance day; higher is better, -inf is ineligible"""
+    today = prices[day]
+    past = prices[day - lookback]
+    if strategy == 'popular':
+        scores = today.astype(np.float64)
+    else:
+        change = (today - past).astype(np.float64)
+        scores = change if strategy == 'risers' else -change
+    eligible = ~np.isnan(today) & ~np.isnan(past) & (today > 0)
+    return np.where(eligible, scores, -np.inf)
+
+
+def run_backtest(matrix, strategy='risers', count=10, lookback=7, rebalance_every=7,
+                 days=365, initial_points=10000):
+    """
+    Run a rebalancing strategy over the price matrix.
+
+    On each rebalance day the whole book is sold and the top `count`
+    artists by the strategy score are bought with equal points, in whole
+    shares at that day's popularity. Leftover points stay in cash.
+
+    Args:
+        matrix: PriceMatrix from load_price_matrix()
+        strategy: 'risers' (largest gain over lookback), 'fallers'
+            (largest drop) or 'popular' (highest popularity)
+        count: Artists held after each rebalance
+        lookback: Days used to score risers/fallers
+        rebalance_every: Days between rebalances
+        days: Length of the test window ending at the latest close
+        initial_points: Starting cash
+
+    Returns:
+        dict: dates, equity, total_return, max_drawdown, trades and final
+            holdings as (spotify_id, name, shares)
+    """
+    prices = matrix.prices
+    n_days = len(prices)
+    first = max(lookback, n_days - days)
+    if first >= n_days:
+        raise ValueError("Not enough price history for this backtest window")
+
+    cash = float(initial_points)
+    holdings = np.zeros(prices.shape[1])
+    equity = np.empty(n_days - first)
+    trades = 0
+
+    for rebalance_day in range(first, n_days, rebalance_every):
+        until = min(rebalance_day + rebalance_every, n_days)
+        today = np.nan_to_num(prices[rebalance_day])
+
+        # Liquidate at today's popularity
+        held = np.flatnonzero(holdings)
+        cash += float(holdings[held] @ today[held])
+        trades += len(held)
+        holdings[held] = 0
+
+        scores = _scores(prices, rebalance_day, strategy, lookback)
+        k = min(count, int(np.isfinite(scores).sum()))
+        if k > 0:
+            picks = np.argpartition(-scores, k - 1)[:k]
+            shares = np.floor((cash / k) / today[picks])
+            holdings[picks] = shares
+            cash -= float(shares @ today[picks])
+            trades += int((shares > 0).sum())
+
+        held = np.flatnonzero(holdings)
+        window = np.nan_to_num(prices[rebalance_day:until, held])
+        equity[rebalance_day - first:until - first] = cash + window @ holdings[held]
+
+    peaks = np.maximum.accumulate(equity)
+    held = np.flatnonzero(holdings)
+    return {
+        'dates': [(matrix.start + timedelta(days=day)).isoformat() for day in range(first, n_days)],
+        'equity': equity.round(2).tolist(),
+        'total_return': float(equity[-1] / initial_points - 1),
+        'max_drawdown': float((equity / peaks - 1).min()),
+        'trades': trades,
+        'holdings': [(matrix.spotify_ids[i], matrix.names[i], int(holdings[i])) for i in held.tolist()],
+    }
+
+
+def run_strategy(matrix, spec):
+    """Run a declarative strategy dict, filling gaps from DEFAULT_STRATEGY"""
+    params = dict(DEFAULT_STRATEGY, **spec)
+    return run_backtest(matrix, params['strategy'], params['count'], params['lookback'],
+                        params['rebalance_every'], params['days'], params['initial_points'])
+
+
+if __name__ == '__main__':
+    import argparse
+    import psycopg2
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Backtest trading strategies over artist history")
+    parser.add_argument('command', choices=['refresh', 'run'])
+    parser.add_argument('--strategy', choices=STRATEGIES, default=DEFAULT_STRATEGY['strategy'])
+    parser.add_argument('--count', type=int, default=DEFAULT_STRATEGY['count'])
+    parser.add_argument('--lookback', type=int, default=DEFAULT_STRATEGY['lookback'])
+    parser.add_argument('--rebalance', type=int, default=DEFAULT_STRATEGY['rebalance_every'])
+    parser.add_argument('--days', type=int, default=DEFAULT_STRATEGY['days'])
+    parser.add_argument('--points', type=int, default=DEFAULT_STRATEGY['initial_points'])
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL", "postgresql://localhost/anticip_db")
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+    conn = psycopg2.connect(database_url)
+    cursor = conn.cursor()
+    try:
+        if args.command == 'refresh':
+            meta = publish_price_matrix(cursor)
+            print(f"✅ Published price matrix through {meta['built_through']} "
+                  f"({len(meta['spotify_ids'])} artists) to {CACHE_DIR}")
+        else:
+            result = run_strategy(load_price_matrix(cursor), {
+                'strategy': args.strategy,
+                'count': args.count,
+                'lookback': args.lookback,
+                'rebalance_every': args.rebalance,
+                'days': args.days,
+                'initial_points': args.points,
+            })
+            print(f"📈 {args.strategy}: {result['total_return'] * 100:+.1f}% over {len(result['dates'])} days, "
+                  f"max drawdown {result['max_drawdown'] * 100:.1f}%, {result['trades']} trades")
+            for spotify_id, name, shares in result['holdings']:
+                print(f"   {name} ({spotify_id}): {shares} shares")
+    finally:
+        cursor.close()
+        conn.close()
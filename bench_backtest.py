@@ -0,0 +1,51 @@
+"""
+Benchmark the backtest engine on a synthetic multi-year history
+
+Usage: python bench_backtest.py [years] [artists]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+import numpy as np
+
+from backtest import PriceMatrix, STRATEGIES, run_strategy
+
+
+def synthetic_matrix(days, artists, seed=42):
+    """Bounded random-walk popularity with staggered listing dates"""
+    rng = np.random.default_rng(seed)
+    steps = rng.integers(-3, 4, size=(days, artists))
+    prices = np.clip(rng.integers(20, 80, size=artists) + np.cumsum(steps, axis=0), 0, 100).astype(np.float32)
+    listed = rng.integers(0, days // 2, size=artists)
+    prices[np.arange(days)[:, None] < listed] = np.nan
+    return prices
+
+
+if __name__ == '__main__':
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    artists = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    days = years * 365
+
+    prices = synthetic_matrix(days, artists)
+    print(f"📊 {days:,} days x {artists:,} artists ({prices.nbytes / 1e6:.0f} MB)")
+
+    path = os.path.join(tempfile.mkdtemp(), 'prices.npy')
+    start = time.perf_counter()
+    np.save(path, prices)
+    save_time = time.perf_counter() - start
+    start = time.perf_counter()
+    mapped = np.load(path, mmap_mode='r')
+    print(f"💾 save {save_time * 1000:.0f} ms, mmap open {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    matrix = PriceMatrix('bench', date(2020, 1, 1), [f"artist{i}" for i in range(artists)],
+                         [f"Artist {i}" for i in range(artists)], mapped)
+    for strategy in STRATEGIES:
+        for rebalance_every in (1, 7):
+            start = time.perf_counter()
+            result = run_strategy(matrix, {'strategy': strategy, 'rebalance_every': rebalance_every, 'days': days})
+            elapsed = time.perf_counter() - start
+            print(f"⚡ {strategy:8s} rebalance every {rebalance_every}d: {elapsed * 1000:7.1f} ms "
+                  f"({result['total_return'] * 100:+.1f}%, {result['trades']} trades)")
@@ -0,0 +1,125 @@
+"""
+Benchmark Spotify ingestion against the local fake API
+
+Runs the call patterns of our ingestion paths against fake_spotify.py
+with simulated latency, rate limiting and failures:
+    per-artist   sp.artist per artist (update_popularity.py)
+    batched      sp.artists, 50 ids per call
+    enrichment   artist + top tracks + albums per artist (confirm_add_artist, refresh_data)
+    rate-limited per-artist calls under a requests/second cap (429 + Retry-After)
+    flaky        per-artist calls with random 5xx and missing artists
+
+With BENCH_DATABASE_URL set to a scratch database the app has been
+started against, it also inserts the synthetic catalog into artists and
+times a full update_popularity.py run end to end.
+
+Usage: python bench_ingest.py [artists] [latency_ms] [sample]
+"""
+import os
+import subprocess
+import sys
+import time
+
+from fake_spotify import FakeSpotify, SyntheticCatalog, start_server
+from spotify_client import make_spotify
+
+
+def run_calls(label, fake, calls, sample):
+    """Time calls(sp, ids) for a sample of catalog ids and print throughput and errors"""
+    server, api_base = start_server(fake)
+    os.environ['SPOTIFY_API_BASE'] = api_base
+    sp = make_spotify()
+    ids = [fake.catalog.artist_id(i) for i in range(sample)]
+    start = time.perf_counter()
+    artists, failed = calls(sp, ids)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    throttled = sum(n for key, n in fake.stats.items() if key.endswith(' 429'))
+    requests = sum(fake.stats.values())
+    print(f"⚡ {label:13s} {artists:6,} artists in {elapsed:7.2f} s "
+          f"({artists / elapsed:8.1f}/s, {requests:6,} requests, {throttled:4} throttled, {failed:4} failed)")
+
+
+def per_artist(sp, ids):
+    failed = 0
+    for spotify_id in ids:
+        try:
+            sp.artist(spotify_id)
+        except Exception:
+            failed += 1
+    return len(ids), failed
+
+
+def batched(sp, ids):
+    failed = 0
+    for i in range(0, len(ids), 50):
+        try:
+            failed += sum(artist is None for artist in sp.artists(ids[i:i + 50])['artists'])
+        except Exception:
+            failed += len(ids[i:i + 50])
+    return len(ids), failed
+
+
+def enrichment(sp, ids):
+    failed = 0
+    for spotify_id in ids:
+        try:
+            sp.artist(spotify_id)
+            sp.artist_top_tracks(spotify_id, country='US')
+            sp.artist_albums(spotify_id, album_type='album', limit=5)
+        except Exception:
+            failed += 1
+    return len(ids), failed
+
+
+def bench_update_popularity(database_url, catalog, fake):
+    """Seed the synthetic catalog into a scratch database and time update_popularity.py"""
+    import psycopg2
+    from psycopg2.extras import execute_values
+
+    conn = psycopg2.connect(database_url)
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    execute_values(cursor, """
+        INSERT INTO artists (spotify_id, name, image_url) VALUES %s
+        ON CONFLICT (spotify_id) DO NOTHING
+    """, [(catalog.artist_id(i), catalog.name(i), None) for i in range(catalog.size)], page_size=5000)
+    conn.commit()
+    cursor.execute("SELECT COUNT(*) FROM artists")
+    total = cursor.fetchone()[0]
+    cursor.close()
+    conn.close()
+    print(f"🌱 Seeded {catalog.size:,} synthetic artists in {time.perf_counter() - start:.1f} s ({total:,} in artists)")
+
+    server, api_base = start_server(fake)
+    env = dict(os.environ, SPOTIFY_API_BASE=api_base, DATABASE_URL=database_url, SPOTIFY_REQUEST_INTERVAL='0')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, 'update_popularity.py'], env=env,
+                            capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    print(f"⚡ update_popularity.py: {total:,} artists in {elapsed:.1f} s ({total / elapsed:.1f}/s, exit {result.returncode})")
+    for line in result.stdout.splitlines():
+        if line.startswith(('✓', '✗ Failed', '💰', '🧮', '🏆')):
+            print(f"   {line}")
+
+
+if __name__ == '__main__':
+    artists = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 30.0
+    sample = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    catalog = SyntheticCatalog(artists)
+    print(f"🎧 Fake Spotify: {artists:,} artists, {latency_ms:.0f} ms median latency, {sample} sampled")
+
+    run_calls('per-artist', FakeSpotify(catalog, latency_ms), per_artist, sample)
+    run_calls('batched', FakeSpotify(catalog, latency_ms), batched, min(artists, sample * 50))
+    run_calls('enrichment', FakeSpotify(catalog, latency_ms), enrichment, sample)
+    run_calls('rate-limited', FakeSpotify(catalog, latency_ms, rate_limit=10), per_artist, sample)
+    run_calls('flaky', FakeSpotify(catalog, latency_ms, error_rate=0.05, missing_rate=0.02), per_artist, sample)
+
+    database_url = os.getenv('BENCH_DATABASE_URL')
+    if database_url:
+        bench_update_popularity(database_url, SyntheticCatalog(min(artists, 5 * sample)), FakeSpotify(catalog, latency_ms))
+    else:
+        print("ℹ️  Set BENCH_DATABASE_URL to a scratch database to time update_popularity.py end to end")
@@ -0,0 +1,66 @@
+"""
+Benchmark the vectorized valuation engine on a synthetic book
+
+Usage: python bench_valuations.py [users] [artists] [positions_per_user]
+"""
+import sys
+import time
+
+import numpy as np
+
+from valuations import compute_valuations
+
+
+def synthetic_book(users, artists, positions_per_user, seed=42):
+    """Random positions over a uniformly sampled artist catalog"""
+    rng = np.random.default_rng(seed)
+    user_ids = np.arange(1, users + 1, dtype=np.int64)
+    counts = rng.integers(0, positions_per_user * 2 + 1, size=users)
+    total = int(counts.sum())
+    positions = {
+        'user_ids': np.repeat(user_ids, counts),
+        'artist_ids': rng.integers(1, artists + 1, size=total),
+        'shares': rng.integers(1, 500, size=total).astype(np.float64),
+        'avg_cost': rng.integers(1, 101, size=total).astype(np.float64),
+    }
+    prices = np.zeros(artists + 1)
+    prices[1:] = rng.integers(0, 101, size=artists)
+    return user_ids, positions, prices
+
+
+def naive(user_ids, positions, prices):
+    """Per-position Python loop the engine replaces"""
+    invested, cost = {}, {}
+    for user_id, artist_id, shares, avg_cost in zip(
+            positions['user_ids'].tolist(), positions['artist_ids'].tolist(),
+            positions['shares'].tolist(), positions['avg_cost'].tolist()):
+        invested[user_id] = invested.get(user_id, 0) + shares * prices[artist_id]
+        cost[user_id] = cost.get(user_id, 0) + shares * avg_cost
+    return invested, cost
+
+
+if __name__ == '__main__':
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    artists = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    per_user = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    user_ids, positions, prices = synthetic_book(users, artists, per_user)
+    print(f"📊 {users:,} users, {artists:,} artists, {len(positions['user_ids']):,} positions")
+
+    start = time.perf_counter()
+    valuations = compute_valuations(user_ids, positions, prices)
+    engine_time = time.perf_counter() - start
+    print(f"⚡ NumPy engine: {engine_time * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    invested, cost = naive(user_ids, positions, prices)
+    naive_time = time.perf_counter() - start
+    print(f"🐢 Python loop:  {naive_time * 1000:.1f} ms ({naive_time / engine_time:.0f}x slower)")
+
+    sample = user_ids[np.flatnonzero(valuations['positions'])[:1000]]
+    mismatches = sum(
+        1 for i, user_id in zip(np.searchsorted(user_ids, sample), sample.tolist())
+        if abs(valuations['invested'][i] - invested[user_id]) > 1e-6
+        or abs(valuations['cost'][i] - cost[user_id]) > 1e-6
+    )
+    print(f"✓ Spot-checked {len(sample)} users, {mismatches} mismatches")
@@ -0,0 +1,212 @@
+"""
+Conditional order (stop-loss / take-profit) evaluation
+"""
+from psycopg2.extras import execute_values
+
+from valuations import apply_trade_deltas
+
+
+ORDER_TYPES = ('stop_loss', 'take_profit')
+
+# Orders executed per database transaction
+EXECUTION_BATCH_SIZE = 1000
+
+
+def load_tick_prices(cursor, ticks):
+    """
+    Load a tick's popularity values into the tick_prices temp table.
+
+    Args:
+        cursor: Database cursor
+        ticks: Iterable of (spotify_id, popularity) tuples
+    """
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS tick_prices (
+            spotify_id VARCHAR(255) PRIMARY KEY,
+            popularity INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("TRUNCATE tick_prices")
+    execute_values(cursor, """
+        INSERT INTO tick_prices (spotify_id, popularity) VALUES %s
+        ON CONFLICT (spotify_id) DO UPDATE SET popularity = EXCLUDED.popularity
+    """, list(ticks), page_size=5000)
+    cursor.execute("ANALYZE tick_prices")
+
+
+def find_fired_orders(cursor):
+    """
+    Join tick_prices against every pending trigger in one pass.
+
+    Returns:
+        list: IDs of fired orders, oldest first
+    """
+    cursor.execute("""
+        SELECT o.id
+        FROM conditional_orders o
+        JOIN artists a ON a.id = o.artist_id
+        JOIN tick_prices tp ON tp.spotify_id = a.spotify_id
+        WHERE o.status = 'pending'
+          AND ((o.order_type = 'stop_loss' AND tp.popularity <= o.trigger_popularity)
+            OR (o.order_type = 'take_profit' AND tp.popularity >= o.trigger_popularity))
+        ORDER BY o.created_at, o.id
+    """)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def execute_order_batch(cursor, order_ids):
+    """
+    Execute a batch of fired orders as market sells at the tick price.
+
+    Orders are filled oldest first against the position they protect.
+    Orders whose position is gone (or already used up by an earlier
+    order in the batch) are cancelled instead.
+
+    Returns:
+        tuple: (executed_count, cancelled_count)
+    """
+    # Lock the orders and the positions they sell from
+    cursor.execute("""
+        SELECT o.id, o.user_id, o.artist_id, o.order_type, o.shares,
+               o.trigger_popularity, o.privacy, tp.popularity,
+               b.id, b.shares, b.avg_popularity
+        FROM conditional_orders o
+        JOIN artists a ON a.id = o.artist_id
+        JOIN tick_prices tp ON tp.spotify_id = a.spotify_id
+        JOIN bets b ON b.user_id = o.user_id AND b.artist_id = o.artist_id
+        WHERE o.id = ANY(%s) AND o.status = 'pending'
+        ORDER BY o.created_at, o.id
+        FOR UPDATE OF o, b
+    """, (list(order_ids),))
+    rows = cursor.fetchall()
+
+    remaining = {}      # bet_id -> shares left after this batch
+    fills = []          # (order_id, shares, popularity)
+    cancelled = []
+    credits = {}        # user_id -> points credited
+    cost_released = {}  # user_id -> cost basis sold
+    closed = {}         # user_id -> positions closed
+    trades = []
+
+    for (order_id, user_id, artist_id, order_type, order_shares,
+         trigger, privacy, popularity, bet_id, bet_shares, avg_popularity) in rows:
+        available = remaining.get(bet_id, bet_shares)
+        shares = min(order_shares, available)
+        if shares <= 0:
+            cancelled.append(order_id)
+            continue
+
+        remaining[bet_id] = available - shares
+        if remaining[bet_id] == 0:
+            closed[user_id] = closed.get(user_id, 0) + 1
+        total_value = shares * popularity
+        label = 'Stop-loss' if order_type == 'stop_loss' else 'Take-profit'
+
+        fills.append((order_id, shares, popularity))
+        credits[user_id] = credits.get(user_id, 0) + total_value
+        cost_released[user_id] = cost_released.get(user_id, 0) + shares * avg_popularity
+        trades.append((user_id, artist_id, shares, popularity, total_value,
+                       f"{label} triggered at {popularity} (trigger {trigger})", privacy))
+
+    # Fired orders that no longer have a position to sell from
+    locked = {row[0] for row in rows}
+    cancelled.extend(order_id for order_id in order_ids if order_id not in locked)
+
+    if fills:
+        emptied = [bet_id for bet_id, shares in remaining.items() if shares == 0]
+        reduced = [(bet_id, shares) for bet_id, shares in remaining.items() if shares > 0]
+
+        if emptied:
+            cursor.execute("DELETE FROM bets WHERE id = ANY(%s)", (emptied,))
+        if reduced:
+            execute_values(cursor, """
+                UPDATE bets SET shares = v.shares, timestamp = NOW()
+                FROM (VALUES %s) AS v(id, shares)
+                WHERE bets.id = v.id
+            """, reduced, page_size=EXECUTION_BATCH_SIZE)
+
+        execute_values(cursor, """
+            UPDATE users SET balance = balance + v.amount
+            FROM (VALUES %s) AS v(id, amount)
+            WHERE users.id = v.id
+        """, list(credits.items()), template="(%s, %s::numeric)", page_size=EXECUTION_BATCH_SIZE)
+
+        apply_trade_deltas(cursor, [
+            (user_id, -credits[user_id], -cost_released[user_id], -closed.get(user_id, 0))
+            for user_id in credits
+        ])
+
+        execute_values(cursor, """
+            INSERT INTO transactions
+            (user_id, artist_id, transaction_type, shares, popularity_per_share,
+             total_amount, caption, privacy)
+            VALUES %s
+        """, trades, template="(%s, %s, 'sell', %s, %s, %s, %s, %s)",
+           page_size=EXECUTION_BATCH_SIZE)
+
+        execute_values(cursor, """
+            UPDATE conditional_orders
+            SET status = 'executed', executed_shares = v.shares,
+                executed_popularity = v.popularity, executed_at = NOW()
+            FROM (VALUES %s) AS v(id, shares, popularity)
+            WHERE conditional_orders.id = v.id
+        """, fills, page_size=EXECUTION_BATCH_SIZE)
+
+    cancelled_count = 0
+    if cancelled:
+        cursor.execute("""
+            UPDATE conditional_orders
+            SET status = 'cancelled', executed_at = NOW()
+            WHERE id = ANY(%s) AND status = 'pending'
+        """, (cancelled,))
+        cancelled_count = cursor.rowcount
+
+    return len(fills), cancelled_count
+
+
+def evaluate_conditional_orders(conn, ticks, batch_size=EXECUTION_BATCH_SIZE):
+    """
+    Evaluate all pending conditional orders against a popularity tick.
+
+    Fired orders are found with a single set-based query, then executed
+    in batches with one transaction per batch so a failure only rolls
+    back its own batch.
+
+    Args:
+        conn: psycopg2 connection (committed/rolled back per batch)
+        ticks: Iterable of (spotify_id, popularity) tuples for this tick
+        batch_size: Orders executed per transaction
+
+    Returns:
+        dict: fired, executed, cancelled and failed order counts
+    """
+    stats = {'fired': 0, 'executed': 0, 'cancelled': 0, 'failed': 0}
+    ticks = list(ticks)
+    if not ticks:
+        return stats
+
+    cursor = conn.cursor()
+    try:
+        load_tick_prices(cursor, ticks)
+        fired = find_fired_orders(cursor)
+        conn.commit()
+        stats['fired'] = len(fired)
+
+        for start in range(0, len(fired), batch_size):
+            batch = fired[start:start + batch_size]
+            try:
+                executed, cancelled = execute_order_batch(cursor, batch)
+                conn.commit()
+                stats['executed'] += executed
+                stats['cancelled'] += cancelled
+            except Exception as e:
+                conn.rollback()
+                stats['failed'] += len(batch)
+                print(f"✗ Error executing conditional order batch at {start}: {e}")
+
+        cursor.execute("DROP TABLE IF EXISTS tick_prices")
+        conn.commit()
+    finally:
+        cursor.close()
+
+    return stats
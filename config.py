@@ -20,10 +20,21 @@ class Config:
     DATABASE_URL = os.getenv('DATABASE_URL')
     DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
     DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 20))
+    # Extra connections for background threads sharing the pool: scheduler
+    # jobs (3), deferred enrichment (2) and bulk imports (1)
+    DB_POOL_BACKGROUND = int(os.getenv('DB_POOL_BACKGROUND', 6))
     
     # Spotify API
     SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
     SPOTIFY_CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET')
+    # Redirect right after adding an artist and fetch its Spotify data in the background
+    DEFER_ARTIST_ENRICHMENT = os.getenv('DEFER_ARTIST_ENRICHMENT', 'false').lower() == 'true'
+    
+    # In-process scheduler (see job_scheduler.py); intervals in minutes, 0 disables a job
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'false').lower() == 'true'
+    SCHEDULER_POPULARITY_MINUTES = int(os.getenv('SCHEDULER_POPULARITY_MINUTES', 24 * 60))
+    SCHEDULER_SNAPSHOT_MINUTES = int(os.getenv('SCHEDULER_SNAPSHOT_MINUTES', 60))
+    SCHEDULER_ROLLUP_MINUTES = int(os.getenv('SCHEDULER_ROLLUP_MINUTES', 15))
     
     # Flask Config
     DEBUG = os.getenv('FLASK_ENV') == 'development'
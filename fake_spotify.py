@@ -0,0 +1,471 @@
+"""
+Local Spotify Web API stand-in
+
+Serves the endpoints our ingestion code calls (artist, artists, top
+tracks, albums and artist search) from a deterministic synthetic
+catalog, so update_popularity.py, refresh_data, the add-artist flow
+and the seeders can run and be benchmarked offline. Point them at it
+with SPOTIFY_API_BASE (see spotify_client.py).
+
+The catalog is computed from the artist index encoded in each id, so
+100k+ artists cost no memory beyond the search name list. Popularity
+drifts by day (--day shifts it) so repeated ingests produce real ticks.
+
+Recorded fixtures override the synthetic responses: with --fixtures DIR
+every request whose method, path and query match a recorded file is
+replayed verbatim, and with --record misses are forwarded to the real
+API (using SPOTIFY_CLIENT_ID/SECRET) and saved for later replays.
+
+Fault injection, all optional:
+    --latency-ms / --latency-sigma  log-normal response latency
+    --rate-limit                    requests per second before 429 + Retry-After
+    --throttle-rate                 fraction of random 429s
+    --error-rate                    fraction of random 500/502/503s
+    --missing-rate                  fraction of artist ids that 404 (null in batches)
+
+Usage: python fake_spotify.py --artists 100000 --latency-ms 80 --rate-limit 50
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+DEFAULT_PORT = 8765
+DEFAULT_ARTISTS = 10_000
+
+# Same limits as the Web API
+MAX_BATCH_IDS = 50
+MAX_SEARCH_LIMIT = 50
+
+ID_PREFIX = '0fAke'
+ID_LENGTH = 22
+BASE62 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'zu', 'ne', 'ti', 'va', 'so', 'be',
+             'dra', 'fen', 'gol', 'hex', 'jin', 'kri', 'lux', 'mor', 'nyx', 'pel',
+             'quo', 'ryn', 'sil', 'tor', 'umb', 'vex', 'wyn', 'xan', 'yel', 'zor',
+             'ae', 'io', 'ou', 'ly', 'sha', 'cho', 'thi', 'phe', 'bri', 'cla']
+GENRES = ['pop', 'rock', 'hip hop', 'rap', 'indie', 'edm', 'house', 'techno', 'r&b',
+          'soul', 'jazz', 'country', 'folk', 'metal', 'punk', 'latin', 'k-pop', 'reggaeton',
+          'afrobeats', 'ambient', 'trap', 'drill', 'alt z', 'bedroom pop']
+
+# Real payloads list ~180 market codes per track/album; synthesize the same bulk
+MARKETS = [a + b for a in 'ABCDEFGHIKLMNPRSTUVZ' for b in 'ADEGIKLMNOR'][:183]
+
+_MASK = (1 << 64) - 1
+
+
+def _mix(*values):
+    """splitmix64 over a tuple of ints: fast, deterministic pseudo-randomness"""
+    x = 0x9E3779B97F4A7C15
+    for v in values:
+        x = (x ^ (v & _MASK)) * 0xBF58476D1CE4E5B9 & _MASK
+        x = (x ^ (x >> 31)) * 0x94D049BB133111EB & _MASK
+        x ^= x >> 29
+    return x
+
+
+def _base62(n, width):
+    digits = []
+    while n:
+        n, r = divmod(n, 62)
+        digits.append(BASE62[r])
+    return ''.join(reversed(digits)).rjust(width, '0')
+
+
+class SyntheticCatalog:
+    """Deterministic artists, tracks and albums for ids artist_id(0..size-1)"""
+
+    def __init__(self, size=DEFAULT_ARTISTS, seed=0, day=None):
+        self.size = size
+        self.seed = seed
+        self.day = day or date.today()
+        self._names = None
+        self._names_lock = threading.Lock()
+
+    def artist_id(self, index):
+        return ID_PREFIX + _base62(index, ID_LENGTH - len(ID_PREFIX))
+
+    def index_of(self, spotify_id):
+        """Catalog index for an id, or None if it is not one of ours"""
+        if len(spotify_id) != ID_LENGTH or not spotify_id.startswith(ID_PREFIX):
+            return None
+        index = 0
+        for ch in spotify_id[len(ID_PREFIX):]:
+            digit = BASE62.find(ch)
+            if digit < 0:
+                return None
+            index = index * 62 + digit
+        return index if index < self.size else None
+
+    def name(self, index):
+        # Scramble the index so neighbours do not share syllables, then read
+        # it as four base-40 digits: unique for the first 2.56M artists
+        n = (index * 1_000_003 + self.seed) % len(SYLLABLES) ** 4
+        parts = []
+        for _ in range(4):
+            n, r = divmod(n, len(SYLLABLES))
+            parts.append(SYLLABLES[r])
+        return f"{(parts[0] + parts[1]).title()} {(parts[2] + parts[3]).title()}"
+
+    def popularity(self, index, day=None):
+        """Base level per artist plus a weekly swing and daily noise, 0-100"""
+        day = (day or self.day).toordinal()
+        h = _mix(self.seed, index)
+        base = 5 + h % 80
+        swing = 8 * math.sin(day / 7 + (h >> 8) % 628 / 100)
+        noise = _mix(self.seed, index, day) % 7 - 3
+        return max(0, min(100, round(base + swing + noise)))
+
+    def genres(self, index):
+        h = _mix(self.seed, index, 1)
+        return sorted({GENRES[(h >> (8 * k)) % len(GENRES)] for k in range(1 + h % 3)})
+
+    def _images(self, kind, key):
+        return [{'height': size, 'width': size,
+                 'url': f"https://i.scdn.co/image/{kind}-{key}-{size}"}
+                for size in (640, 300, 64)]
+
+    def _simple_artist(self, index):
+        spotify_id = self.artist_id(index)
+        return {
+            'external_urls': {'spotify': f"https://open.spotify.com/artist/{spotify_id}"},
+            'href': f"https://api.spotify.com/v1/artists/{spotify_id}",
+            'id': spotify_id,
+            'name': self.name(index),
+            'type': 'artist',
+            'uri': f"spotify:artist:{spotify_id}",
+        }
+
+    def artist(self, index):
+        artist = self._simple_artist(index)
+        artist.update({
+            'followers': {'href': None, 'total': _mix(self.seed, index, 2) % 5_000_000},
+            'genres': self.genres(index),
+            'images': self._images('artist', artist['id']),
+            'popularity': self.popularity(index),
+        })
+        return artist
+
+    def album(self, index, n):
+        album_id = _base62(_mix(self.seed, index, 3, n), ID_LENGTH)
+        released = date(2024, 1, 1) - timedelta(days=n * 97 + _mix(index, n) % 60)
+        return {
+            'album_group': 'album',
+            'album_type': 'album',
+            'artists': [self._simple_artist(index)],
+            'available_markets': MARKETS,
+            'external_urls': {'spotify': f"https://open.spotify.com/album/{album_id}"},
+            'href': f"https://api.spotify.com/v1/albums/{album_id}",
+            'id': album_id,
+            'images': self._images('album', album_id),
+            'name': f"{self.name(index).split()[0]} Vol. {n + 1}",
+            'release_date': released.isoformat(),
+            'release_date_precision': 'day',
+            'total_tracks': 8 + _mix(index, n) % 10,
+            'type': 'album',
+            'uri': f"spotify:album:{album_id}",
+        }
+
+    def top_tracks(self, index):
+        tracks = []
+        for n in range(10):
+            track_id = _base62(_mix(self.seed, index, 4, n), ID_LENGTH)
+            tracks.append({
+                'album': self.album(index, n % 3),
+                'artists': [self._simple_artist(index)],
+                'available_markets': MARKETS,
+                'disc_number': 1,
+                'duration_ms': 150_000 + _mix(index, n, 5) % 120_000,
+                'explicit': bool(_mix(index, n, 6) % 2),
+                'external_ids': {'isrc': f"QZFAKE{_mix(index, n) % 10**6:06d}"},
+                'external_urls': {'spotify': f"https://open.spotify.com/track/{track_id}"},
+                'href': f"https://api.spotify.com/v1/tracks/{track_id}",
+                'id': track_id,
+                'is_local': False,
+                'name': f"Track {n + 1} ({self.name(index).split()[1]})",
+                'popularity': max(0, self.popularity(index) - n * 3),
+                'preview_url': None,
+                'track_number': n + 1,
+                'type': 'track',
+                'uri': f"spotify:track:{track_id}",
+            })
+        return tracks
+
+    def search(self, query, limit, offset):
+        """Indices of artists whose name contains the query, most popular first"""
+        with self._names_lock:
+            if self._names is None:
+                self._names = [self.name(i).lower() for i in range(self.size)]
+        query = query.lower().strip()
+        matches = [i for i, name in enumerate(self._names) if query in name]
+        matches.sort(key=lambda i: -self.popularity(i))
+        return matches[offset:offset + limit], len(matches)
+
+
+def fixture_key(method, path, query):
+    """Canonical request key: method, path and sorted query parameters"""
+    params = '&'.join(f"{k}={v}" for k in sorted(query) for v in query[k])
+    return f"{method} {path}?{params}"
+
+
+def load_fixtures(directory):
+    """Recorded responses by fixture key"""
+    fixtures = {}
+    if directory and os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if filename.endswith('.json'):
+                with open(os.path.join(directory, filename)) as f:
+                    fixture = json.load(f)
+                fixtures[fixture['key']] = (fixture['status'], fixture['body'])
+    return fixtures
+
+
+class FakeSpotify:
+    """Routes Web API requests to fixtures or the synthetic catalog, injecting faults"""
+
+    def __init__(self, catalog, latency_ms=0.0, latency_sigma=0.5, rate_limit=None,
+                 throttle_rate=0.0, error_rate=0.0, missing_rate=0.0,
+                 fixtures_dir=None, record=False, seed=0):
+        self.catalog = catalog
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.rate_limit = rate_limit
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.missing_rate = missing_rate
+        self.fixtures_dir = fixtures_dir
+        self.fixtures = load_fixtures(fixtures_dir)
+        self.record = record
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = float(rate_limit or 0)
+        self.refilled_at = time.monotonic()
+        self.stats = {}
+        self._upstream = None
+
+    def _count(self, endpoint, status):
+        with self.lock:
+            key = f"{endpoint} {status}"
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _take_token(self):
+        """Token bucket of rate_limit requests/second; returns Retry-After or None"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate_limit, self.tokens + (now - self.refilled_at) * self.rate_limit)
+            self.refilled_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return max(1, math.ceil((1 - self.tokens) / self.rate_limit))
+
+    def _roll(self):
+        with self.lock:
+            return self.random.random()
+
+    def _delay(self):
+        if self.latency_ms > 0:
+            with self.lock:
+                seconds = self.random.lognormvariate(math.log(self.latency_ms), self.latency_sigma) / 1000
+            time.sleep(seconds)
+
+    def _missing(self, index):
+        return _mix(self.catalog.seed, index, 7) % 10_000 < self.missing_rate * 10_000
+
+    def _lookup(self, spotify_id):
+        index = self.catalog.index_of(spotify_id)
+        if index is None or self._missing(index):
+            return None
+        return index
+
+    def handle(self, method, path, query):
+        """
+        Answer one request.
+
+        Returns:
+            tuple: (status, extra headers dict, JSON body)
+        """
+        self._delay()
+        endpoint = re.sub(r'/artists/[^/]+', '/artists/{id}', path)
+
+        retry_after = self._take_token() if self.rate_limit else None
+        if retry_after is None and self.throttle_rate and self._roll() < self.throttle_rate:
+            retry_after = 1
+        if retry_after is not None:
+            self._count(endpoint, 429)
+            return 429, {'Retry-After': str(retry_after)}, _error(429, 'API rate limit exceeded')
+        if self.error_rate and self._roll() < self.error_rate:
+            status = (500, 502, 503)[int(self._roll() * 3)]
+            self._count(endpoint, status)
+            return status, {}, _error(status, 'Server error')
+
+        key = fixture_key(method, path, query)
+        if key in self.fixtures:
+            status, body = self.fixtures[key]
+        elif self.record:
+            status, body = self._record(key, path, query)
+        else:
+            status, body = self._route(path, query)
+        self._count(endpoint, status)
+        return status, {}, body
+
+    def _route(self, path, query):
+        catalog = self.catalog
+        match = re.fullmatch(r'/v1/artists/([^/]+)(/top-tracks|/albums)?', path)
+        if match:
+            index = self._lookup(match.group(1))
+            if index is None:
+                return 404, _error(404, 'Resource not found')
+            if match.group(2) == '/top-tracks':
+                return 200, {'tracks': catalog.top_tracks(index)}
+            if match.group(2) == '/albums':
+                limit = min(int(_param(query, 'limit', 20)), 50)
+                offset = int(_param(query, 'offset', 0))
+                items = [catalog.album(index, n) for n in range(offset, min(offset + limit, 12))]
+                return 200, _page(path, items, 12, limit, offset)
+            return 200, catalog.artist(index)
+
+        if path == '/v1/artists':
+            ids = [i for i in _param(query, 'ids', '').split(',') if i]
+            if not ids or len(ids) > MAX_BATCH_IDS:
+                return 400, _error(400, 'Invalid ids')
+            return 200, {'artists': [None if (index := self._lookup(i)) is None else catalog.artist(index)
+                                     for i in ids]}
+
+        if path == '/v1/search':
+            if 'artist' not in _param(query, 'type', '').split(','):
+                return 400, _error(400, 'Only artist search is supported')
+            limit = min(int(_param(query, 'limit', 10)), MAX_SEARCH_LIMIT)
+            offset = int(_param(query, 'offset', 0))
+            indices, total = catalog.search(_param(query, 'q', ''), limit, offset)
+            items = [catalog.artist(i) for i in indices if not self._missing(i)]
+            return 200, {'artists': _page(path, items, total, limit, offset)}
+
+        return 404, _error(404, 'Service not found')
+
+    def _record(self, key, path, query):
+        """Forward a miss to the real API and save the response as a fixture"""
+        import requests
+        from spotipy.oauth2 import SpotifyClientCredentials
+
+        if self._upstream is None:
+            self._upstream = SpotifyClientCredentials()
+        token = self._upstream.get_access_token(as_dict=False)
+        response = requests.get(f"https://api.spotify.com{path}", params=query,
+                                headers={'Authorization': f"Bearer {token}"}, timeout=10)
+        status, body = response.status_code, response.json()
+        if status == 200:
+            os.makedirs(self.fixtures_dir, exist_ok=True)
+            filename = hashlib.sha1(key.encode()).hexdigest()[:20] + '.json'
+            with open(os.path.join(self.fixtures_dir, filename), 'w') as f:
+                json.dump({'key': key, 'status': status, 'body': body}, f)
+            with self.lock:
+                self.fixtures[key] = (status, body)
+        return status, body
+
+
+def _param(query, name, default):
+    values = query.get(name)
+    return values[0] if values else default
+
+
+def _page(path, items, total, limit, offset):
+    return {
+        'href': f"https://api.spotify.com{path}?offset={offset}&limit={limit}",
+        'items': items,
+        'limit': limit,
+        'next': None if offset + limit >= total else f"https://api.spotify.com{path}?offset={offset + limit}&limit={limit}",
+        'offset': offset,
+        'previous': None,
+        'total': total,
+    }
+
+
+def _error(status, message):
+    return {'error': {'status': status, 'message': message}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/_fake/stats':
+            status, headers, body = 200, {}, self.server.fake.stats
+        else:
+            status, headers, body = self.server.fake.handle('GET', url.path.rstrip('/'), parse_qs(url.query))
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(fake, host='127.0.0.1', port=0):
+    """
+    Serve a FakeSpotify on a background thread.
+
+    Returns:
+        tuple: (server, api base URL for SPOTIFY_API_BASE)
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.fake = fake
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local Spotify Web API stand-in")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--artists', type=int, default=DEFAULT_ARTISTS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--day', type=int, default=0, help="shift the catalog's day by this many days")
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--rate-limit', type=float, default=None)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--missing-rate', type=float, default=0.0)
+    parser.add_argument('--fixtures', default=None, help="directory of recorded responses")
+    parser.add_argument('--record', action='store_true', help="record misses from the real API into --fixtures")
+    parser.add_argument('--dump-ids', metavar='FILE', help="write the catalog's artist ids and exit")
+    args = parser.parse_args()
+    if args.record and not args.fixtures:
+        parser.error("--record needs --fixtures")
+
+    catalog = SyntheticCatalog(args.artists, args.seed, date.today() + timedelta(days=args.day))
+    if args.dump_ids:
+        with open(args.dump_ids, 'w') as f:
+            f.writelines(catalog.artist_id(i) + '\n' for i in range(args.artists))
+        print(f"✅ Wrote {args.artists:,} artist ids to {args.dump_ids}")
+    else:
+        fake = FakeSpotify(catalog, args.latency_ms, args.latency_sigma, args.rate_limit,
+                           args.throttle_rate, args.error_rate, args.missing_rate,
+                           args.fixtures, args.record, args.seed)
+        server, api_base = start_server(fake, args.host, args.port)
+        print(f"🎧 Fake Spotify serving {args.artists:,} artists ({len(fake.fixtures)} fixtures)")
+        print(f"   export SPOTIFY_API_BASE={api_base}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -0,0 +1,83 @@
+"""
+Genre facets for the artist catalog
+
+genre_facets holds the number of quoted artists per genre. It is
+recomputed in one statement at the end of each ingest, so /artists
+reads facet counts with an index scan instead of unnesting
+spotify_data.genres on every request. Filtering by genre uses array
+containment (@>), which the GIN index on spotify_data.genres serves.
+"""
+
+
+FACET_LIMIT = 30
+MAX_FILTER_GENRES = 5
+
+
+def refresh_genre_facets(cursor):
+    """
+    Recount quoted artists per genre.
+
+    Only changed counts are rewritten and genres no artist carries any
+    more are removed.
+
+    Returns:
+        int: Number of facet rows inserted or updated
+    """
+    cursor.execute("""
+        WITH counts AS (
+            SELECT g.genre, COUNT(DISTINCT sd.spotify_id) AS artist_count
+            FROM spotify_data sd
+            JOIN artists a ON a.spotify_id = sd.spotify_id
+            CROSS JOIN LATERAL unnest(sd.genres) AS g(genre)
+            WHERE a.current_popularity IS NOT NULL
+            GROUP BY g.genre
+        ),
+        removed AS (
+            DELETE FROM genre_facets f
+            WHERE NOT EXISTS (SELECT 1 FROM counts WHERE counts.genre = f.genre)
+        )
+        INSERT INTO genre_facets (genre, artist_count, updated_at)
+        SELECT genre, artist_count, NOW() FROM counts
+        ON CONFLICT (genre) DO UPDATE SET
+            artist_count = EXCLUDED.artist_count,
+            updated_at = NOW()
+        WHERE genre_facets.artist_count IS DISTINCT FROM EXCLUDED.artist_count
+    """)
+    return cursor.rowcount
+
+
+def get_genre_facets(cursor, limit=FACET_LIMIT):
+    """
+    Most common genres in the catalog.
+
+    Returns:
+        list: (genre, artist_count) tuples, largest first
+    """
+    cursor.execute("""
+        SELECT genre, artist_count
+        FROM genre_facets
+        ORDER BY artist_count DESC, genre
+        LIMIT %s
+    """, (limit,))
+    return cursor.fetchall()
+
+
+def parse_genre_filter(values):
+    """Clean the selected genres: trimmed, deduplicated, at most MAX_FILTER_GENRES"""
+    genres = []
+    for value in values:
+        value = value.strip()
+        if value and value not in genres:
+            genres.append(value)
+    return genres[:MAX_FILTER_GENRES]
+
+
+def genre_filter_sql(spotify_id_column, placeholder='%s'):
+    """
+    Predicate restricting rows to artists carrying every genre passed as
+    a text[] parameter.
+    """
+    return f"""EXISTS (
+            SELECT 1 FROM spotify_data sd
+            WHERE sd.spotify_id = {spotify_id_column} AND sd.genres @> {placeholder}::text[]
+        )"""
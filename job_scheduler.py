@@ -0,0 +1,151 @@
+"""
+In-process job scheduler with Postgres leader election
+
+With SCHEDULER_ENABLED every gunicorn worker, on every replica, runs an
+APScheduler BackgroundScheduler with the same jobs. Each worker checks
+every job every POLL_MINUTES (and once at boot); a check tries
+pg_try_advisory_lock on the job's key, and the holder runs the job only
+if scheduled_jobs shows no start within the last full interval. Every
+other check skips, so each job runs once per interval across the
+deployment, and a deploy or worker recycle never triggers an
+off-schedule run. Runs may start up to POLL_MINUTES late.
+
+The lock is a session lock on a pooled connection held for the whole
+job; if the job raises, the connection is closed instead of returned,
+which drops any session locks the job itself left behind.
+"""
+import time
+from datetime import datetime
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+
+SCHEDULER_LOCK_ID = 4242004
+
+# How often each worker checks whether a job is due
+POLL_MINUTES = 5
+
+
+def run_exclusive(conn, name, interval_seconds, job):
+    """
+    Run job(conn) if this process wins the job's lock and it is due.
+
+    Args:
+        conn: Database connection (the job commits its own work)
+        name: Job name, the lock key and scheduled_jobs row
+        interval_seconds: The job's interval
+        job: Callable taking the connection
+
+    Returns:
+        str: 'ran', 'locked' (another worker is running it) or 'recent'
+            (it already started within the last interval)
+
+    Raises:
+        Exception: Whatever the job raised, after recording the failure
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT pg_try_advisory_lock(%s, hashtext(%s))", (SCHEDULER_LOCK_ID, name))
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return 'locked'
+        try:
+            cursor.execute("""
+                SELECT last_started_at > NOW() - make_interval(secs => %s)
+                FROM scheduled_jobs WHERE name = %s
+            """, (interval_seconds, name))
+            row = cursor.fetchone()
+            if row and row[0]:
+                conn.rollback()
+                return 'recent'
+            cursor.execute("""
+                INSERT INTO scheduled_jobs (name, last_started_at, runs)
+                VALUES (%s, NOW(), 1)
+                ON CONFLICT (name) DO UPDATE SET
+                    last_started_at = NOW(), runs = scheduled_jobs.runs + 1
+            """, (name,))
+            conn.commit()
+
+            started = time.monotonic()
+            try:
+                job(conn)
+            except Exception as e:
+                conn.rollback()
+                _record_finish(cursor, name, 'failed', str(e)[:500])
+                conn.commit()
+                raise
+            _record_finish(cursor, name, 'ok', None)
+            conn.commit()
+            print(f"⏱️  Scheduled job {name} finished in {time.monotonic() - started:.1f}s")
+            return 'ran'
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", (SCHEDULER_LOCK_ID, name))
+            conn.commit()
+    finally:
+        cursor.close()
+
+
+def _record_finish(cursor, name, status, error):
+    cursor.execute("""
+        UPDATE scheduled_jobs
+        SET last_finished_at = NOW(), last_status = %s, last_error = %s
+        WHERE name = %s
+    """, (status, error, name))
+
+
+def job_status(cursor):
+    """
+    Last run of every scheduled job.
+
+    Returns:
+        list: dicts with name, last_started_at, last_finished_at,
+            last_status, last_error and runs
+    """
+    cursor.execute("""
+        SELECT name, last_started_at, last_finished_at, last_status, last_error, runs
+        FROM scheduled_jobs
+        ORDER BY name
+    """)
+    return [{'name': name,
+             'last_started_at': started.isoformat() if started else None,
+             'last_finished_at': finished.isoformat() if finished else None,
+             'last_status': status, 'last_error': error, 'runs': runs}
+            for name, started, finished, status, error, runs in cursor.fetchall()]
+
+
+def start_scheduler(db_pool, jobs):
+    """
+    Start a background scheduler running jobs under leader election.
+
+    Args:
+        db_pool: psycopg2 pool the jobs borrow a connection from
+        jobs: Iterable of (name, interval_minutes, job) where job takes
+            a connection; jobs with an interval of 0 are left out. A job
+            first runs at boot only if it is already a full interval
+            since its last start.
+
+    Returns:
+        BackgroundScheduler: The started scheduler (None if no jobs)
+    """
+    jobs = [(name, minutes, job) for name, minutes, job in jobs if minutes > 0]
+    if not jobs:
+        return None
+    scheduler = BackgroundScheduler(daemon=True)
+    for name, minutes, job in jobs:
+        scheduler.add_job(_run_pooled, 'interval', minutes=min(minutes, POLL_MINUTES), id=name,
+                          args=(db_pool, name, minutes * 60, job),
+                          next_run_time=datetime.now(),
+                          coalesce=True, max_instances=1, misfire_grace_time=60)
+    scheduler.start()
+    return scheduler
+
+
+def _run_pooled(db_pool, name, interval_seconds, job):
+    conn = db_pool.getconn()
+    try:
+        run_exclusive(conn, name, interval_seconds, job)
+    except Exception as e:
+        print(f"✗ Scheduled job {name} failed: {e}")
+        db_pool.putconn(conn, close=True)
+    else:
+        db_pool.putconn(conn)
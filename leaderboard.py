@@ -0,0 +1,196 @@
+"""
+Net-worth leaderboard
+
+leaderboard holds one row per user with net worth (cash balance plus
+invested value from user_valuations) and its competition rank. The whole
+table is re-ranked after each ingest tick; between ticks a single user's
+row is re-ranked incrementally by shifting only the users between their
+old and new net worth.
+"""
+from pagination import encode_cursor, decode_cursor
+
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Advisory lock serializing rank writers (arbitrary app-wide constant)
+LEADERBOARD_LOCK_ID = 4242001
+
+
+def refresh_leaderboard(cursor):
+    """
+    Re-rank every user from current balances and valuations.
+
+    Only rows whose net worth or rank changed are written.
+
+    Returns:
+        int: Number of leaderboard rows written
+    """
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LEADERBOARD_LOCK_ID,))
+    cursor.execute("""
+        INSERT INTO leaderboard (user_id, net_worth, rank, updated_at)
+        SELECT id, net_worth, RANK() OVER (ORDER BY net_worth DESC), NOW()
+        FROM (
+            SELECT u.id, COALESCE(u.balance, 0) + COALESCE(v.invested_value, 0) AS net_worth
+            FROM users u
+            LEFT JOIN user_valuations v ON v.user_id = u.id
+        ) worth
+        ON CONFLICT (user_id) DO UPDATE SET
+            net_worth = EXCLUDED.net_worth,
+            rank = EXCLUDED.rank,
+            updated_at = NOW()
+        WHERE leaderboard.net_worth IS DISTINCT FROM EXCLUDED.net_worth
+           OR leaderboard.rank IS DISTINCT FROM EXCLUDED.rank
+    """)
+    return cursor.rowcount
+
+
+def _current_net_worth(cursor, user_id):
+    cursor.execute("""
+        SELECT COALESCE(u.balance, 0) + COALESCE(v.invested_value, 0)
+        FROM users u
+        LEFT JOIN user_valuations v ON v.user_id = u.id
+        WHERE u.id = %s
+    """, (user_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _ranked_net_worth(cursor, user_id):
+    cursor.execute("SELECT net_worth FROM leaderboard WHERE user_id = %s", (user_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def update_user_rank(cursor, user_id):
+    """
+    Re-rank one user after their net worth changed outside a tick.
+
+    Trades at the quoted popularity leave net worth unchanged, so this
+    usually returns after two primary-key lookups. Otherwise only users
+    whose net worth lies between the old and new value move by one rank.
+    Must run inside the caller's transaction.
+
+    Returns:
+        bool: True if the leaderboard changed
+    """
+    new_worth = _current_net_worth(cursor, user_id)
+    if new_worth is None or _ranked_net_worth(cursor, user_id) == new_worth:
+        return False
+
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LEADERBOARD_LOCK_ID,))
+    old_worth = _ranked_net_worth(cursor, user_id)
+    if old_worth == new_worth:
+        return False
+
+    if old_worth is None:
+        cursor.execute("""
+            UPDATE leaderboard SET rank = rank + 1
+            WHERE net_worth < %s
+        """, (new_worth,))
+    elif new_worth > old_worth:
+        cursor.execute("""
+            UPDATE leaderboard SET rank = rank + 1
+            WHERE net_worth >= %s AND net_worth < %s AND user_id <> %s
+        """, (old_worth, new_worth, user_id))
+    else:
+        cursor.execute("""
+            UPDATE leaderboard SET rank = rank - 1
+            WHERE net_worth >= %s AND net_worth < %s AND user_id <> %s
+        """, (new_worth, old_worth, user_id))
+
+    cursor.execute("""
+        INSERT INTO leaderboard (user_id, net_worth, rank, updated_at)
+        SELECT %s, %s, 1 + COUNT(*), NOW()
+        FROM leaderboard
+        WHERE net_worth > %s AND user_id <> %s
+        ON CONFLICT (user_id) DO UPDATE SET
+            net_worth = EXCLUDED.net_worth,
+            rank = EXCLUDED.rank,
+            updated_at = NOW()
+    """, (user_id, new_worth, new_worth, user_id))
+    return True
+
+
+def get_user_rank(cursor, user_id):
+    """
+    Look up a user's leaderboard entry by primary key.
+
+    Returns:
+        dict or None: rank and net_worth
+    """
+    cursor.execute("""
+        SELECT rank, net_worth
+        FROM leaderboard
+        WHERE user_id = %s
+    """, (user_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return {'rank': row[0], 'net_worth': float(row[1])}
+
+
+def get_leaderboard_page(cursor, cursor_token=None, limit=PAGE_SIZE, following_of=None):
+    """
+    Fetch one keyset-paginated page of the leaderboard.
+
+    Args:
+        cursor: Database cursor
+        cursor_token: next_cursor from the previous page, or None
+        limit: Page size (capped at MAX_PAGE_SIZE)
+        following_of: If set, only this user and the users they follow
+
+    Returns:
+        dict: entries and next_cursor (None on the last page)
+
+    Raises:
+        ValueError: If cursor_token is malformed
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    after = decode_cursor(cursor_token, (int, int))
+
+    keyset = ""
+    params = []
+    if after:
+        keyset = "WHERE (l.rank, l.user_id) > (%s, %s)"
+        params.extend(after)
+
+    if following_of is None:
+        cursor.execute(f"""
+            SELECT l.rank, l.user_id, u.username, l.net_worth
+            FROM leaderboard l
+            JOIN users u ON u.id = l.user_id
+            {keyset}
+            ORDER BY l.rank, l.user_id
+            LIMIT %s
+        """, params + [limit + 1])
+    else:
+        # Start from the user's (few) follows and look each one up by key,
+        # rather than walking the global rank index until a page fills
+        cursor.execute(f"""
+            WITH circle AS MATERIALIZED (
+                SELECT %s AS user_id
+                UNION
+                SELECT followed_id FROM follows
+                WHERE follower_id = %s AND status = 'accepted'
+            )
+            SELECT l.rank, l.user_id, u.username, l.net_worth
+            FROM circle c
+            JOIN leaderboard l ON l.user_id = c.user_id
+            JOIN users u ON u.id = l.user_id
+            {keyset}
+            ORDER BY l.rank, l.user_id
+            LIMIT %s
+        """, [following_of, following_of] + params + [limit + 1])
+    rows = cursor.fetchall()
+
+    entries = [
+        {'rank': rank, 'user_id': user_id, 'username': username,
+         'net_worth': float(net_worth)}
+        for rank, user_id, username, net_worth in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = entries[-1]
+        next_cursor = encode_cursor((last['rank'], last['user_id']))
+    return {'entries': entries, 'next_cursor': next_cursor}
@@ -0,0 +1,254 @@
+"""
+Anticip market index and genre sub-indices
+
+Each index is the equal-weighted average popularity of its artists: the
+whole quoted catalog for the market index, and the artists tagged with a
+genre for each 'genre:<name>' sub-index. market_index_state keeps the
+running popularity sum and artist count per index; every tick applies
+the per-artist popularity deltas to those sums (see apply_index_ticks,
+called from valuations.apply_ticks) instead of re-aggregating the
+catalog. A first quote adds the artist to its indices the same way, and
+refreshed genres move a quoted artist between genre indices through
+apply_genre_changes. Only deletions and bulk loads rebuild the sums in
+full.
+
+After each ingest the current values are appended to
+market_index_history, which the chart API serves in the same Chart.js
+shape as portfolio history.
+"""
+from datetime import timedelta
+
+
+MARKET_INDEX = 'market'
+GENRE_PREFIX = 'genre:'
+
+# Genres with fewer artists are too noisy to chart
+MIN_GENRE_ARTISTS = 5
+
+RANGES = {
+    '1week': timedelta(days=7),
+    '1month': timedelta(days=30),
+    '3months': timedelta(days=90),
+    '1year': timedelta(days=365),
+    'all': None,
+}
+
+
+def index_label(index_key):
+    """Display name for an index key"""
+    if index_key.startswith(GENRE_PREFIX):
+        return f"{index_key[len(GENRE_PREFIX):].title()} Index"
+    return 'Anticip Index'
+
+
+def apply_index_ticks(cursor, spotify_ids, popularities):
+    """
+    Move index sums by a tick's per-artist popularity deltas.
+
+    Must run before the tick's quotes are written to artists, with the
+    quoted rows already locked. Artists quoted for the first time join
+    their indices.
+
+    Args:
+        cursor: Database cursor
+        spotify_ids: Ticked artists
+        popularities: New popularity per artist, aligned with spotify_ids
+    """
+    cursor.execute("""
+        WITH tick AS (
+            SELECT * FROM unnest(%s::varchar[], %s::integer[]) AS t(spotify_id, popularity)
+        ),
+        moved AS (
+            SELECT a.spotify_id,
+                   tick.popularity - COALESCE(a.current_popularity, 0) AS delta,
+                   (a.current_popularity IS NULL)::int AS added
+            FROM artists a
+            JOIN tick ON tick.spotify_id = a.spotify_id
+            WHERE a.current_popularity IS DISTINCT FROM tick.popularity
+        ),
+        index_moves AS (
+            SELECT %s AS index_key, SUM(delta) AS delta, SUM(added) AS added
+            FROM moved
+            UNION ALL
+            SELECT %s || g.genre, SUM(m.delta), SUM(m.added)
+            FROM moved m
+            JOIN spotify_data sd ON sd.spotify_id = m.spotify_id
+            CROSS JOIN LATERAL unnest(sd.genres) AS g(genre)
+            GROUP BY g.genre
+        )
+        INSERT INTO market_index_state AS s (index_key, popularity_sum, artist_count, updated_at)
+        SELECT index_key, delta, added, NOW()
+        FROM index_moves
+        WHERE delta IS NOT NULL
+        ON CONFLICT (index_key) DO UPDATE SET
+            popularity_sum = s.popularity_sum + EXCLUDED.popularity_sum,
+            artist_count = s.artist_count + EXCLUDED.artist_count,
+            updated_at = NOW()
+    """, (list(spotify_ids), list(popularities), MARKET_INDEX, GENRE_PREFIX))
+
+
+def lock_genres(cursor, spotify_ids):
+    """
+    Lock artists rows ahead of a genre update and read their current genres.
+
+    Returns:
+        dict: spotify_id -> genres (None without spotify_data)
+    """
+    cursor.execute("""
+        SELECT a.spotify_id, sd.genres
+        FROM artists a
+        LEFT JOIN spotify_data sd ON sd.spotify_id = a.spotify_id
+        WHERE a.spotify_id = ANY(%s)
+        ORDER BY a.id
+        FOR UPDATE OF a
+    """, (list(spotify_ids),))
+    return dict(cursor.fetchall())
+
+
+def genre_moves(changes):
+    """
+    Flatten genre changes into per-genre membership moves.
+
+    Args:
+        changes: Iterable of (spotify_id, old_genres, new_genres)
+
+    Returns:
+        list: (spotify_id, genre, +1 joined / -1 left) tuples
+    """
+    moves = []
+    for spotify_id, old_genres, new_genres in changes:
+        old_genres, new_genres = set(old_genres or ()), set(new_genres or ())
+        moves.extend((spotify_id, genre, -1) for genre in sorted(old_genres - new_genres))
+        moves.extend((spotify_id, genre, 1) for genre in sorted(new_genres - old_genres))
+    return moves
+
+
+def apply_genre_changes(cursor, changes):
+    """
+    Move quoted artists between genre indices after their genres changed.
+
+    Must run in the transaction that writes the new genres, with the
+    artists rows locked, so no tick moves them in between. Unquoted
+    artists are skipped; their first tick adds them.
+
+    Args:
+        cursor: Database cursor
+        changes: Iterable of (spotify_id, old_genres, new_genres)
+    """
+    moves = genre_moves(changes)
+    if not moves:
+        return
+    spotify_ids, genres, signs = zip(*moves)
+    cursor.execute("""
+        WITH moves AS (
+            SELECT * FROM unnest(%s::varchar[], %s::text[], %s::integer[]) AS m(spotify_id, genre, sign)
+        )
+        INSERT INTO market_index_state AS s (index_key, popularity_sum, artist_count, updated_at)
+        SELECT %s || m.genre, SUM(m.sign * a.current_popularity), SUM(m.sign), NOW()
+        FROM moves m
+        JOIN artists a ON a.spotify_id = m.spotify_id
+        WHERE a.current_popularity IS NOT NULL
+        GROUP BY m.genre
+        ON CONFLICT (index_key) DO UPDATE SET
+            popularity_sum = s.popularity_sum + EXCLUDED.popularity_sum,
+            artist_count = s.artist_count + EXCLUDED.artist_count,
+            updated_at = NOW()
+    """, (list(spotify_ids), list(genres), list(signs), GENRE_PREFIX))
+
+
+def rebuild_market_index(cursor):
+    """
+    Recompute every index's sum and count from current quotes.
+
+    Used to seed the state, after membership changes and to repair
+    drift; ticks only apply deltas.
+    """
+    cursor.execute("""
+        WITH sums AS (
+            SELECT %s AS index_key, COALESCE(SUM(current_popularity), 0) AS popularity_sum,
+                   COUNT(*) AS artist_count
+            FROM artists
+            WHERE current_popularity IS NOT NULL
+            UNION ALL
+            SELECT %s || g.genre, SUM(a.current_popularity), COUNT(*)
+            FROM artists a
+            JOIN spotify_data sd ON sd.spotify_id = a.spotify_id
+            CROSS JOIN LATERAL unnest(sd.genres) AS g(genre)
+            WHERE a.current_popularity IS NOT NULL
+            GROUP BY g.genre
+        ),
+        removed AS (
+            DELETE FROM market_index_state st
+            WHERE NOT EXISTS (SELECT 1 FROM sums WHERE sums.index_key = st.index_key)
+        )
+        INSERT INTO market_index_state (index_key, popularity_sum, artist_count, updated_at)
+        SELECT index_key, popularity_sum, artist_count, NOW() FROM sums
+        ON CONFLICT (index_key) DO UPDATE SET
+            popularity_sum = EXCLUDED.popularity_sum,
+            artist_count = EXCLUDED.artist_count,
+            updated_at = NOW()
+    """, (MARKET_INDEX, GENRE_PREFIX))
+    return cursor.rowcount
+
+
+def record_index_points(cursor):
+    """
+    Append the current value of every chartable index to its history.
+
+    Returns:
+        int: Number of points recorded
+    """
+    cursor.execute("""
+        INSERT INTO market_index_history (index_key, recorded_at, value, artist_count)
+        SELECT index_key, NOW(), popularity_sum::numeric / artist_count, artist_count
+        FROM market_index_state
+        WHERE artist_count > 0 AND (index_key = %s OR artist_count >= %s)
+        ON CONFLICT (index_key, recorded_at) DO NOTHING
+    """, (MARKET_INDEX, MIN_GENRE_ARTISTS))
+    return cursor.rowcount
+
+
+def list_indices(cursor, limit=20):
+    """
+    Current values of the market index and the largest genre indices.
+
+    Returns:
+        list: dicts with key, label, value and artist_count; market first
+    """
+    cursor.execute("""
+        SELECT index_key, popularity_sum::float / artist_count, artist_count
+        FROM market_index_state
+        WHERE artist_count > 0 AND (index_key = %s OR artist_count >= %s)
+        ORDER BY index_key = %s DESC, artist_count DESC, index_key
+        LIMIT %s
+    """, (MARKET_INDEX, MIN_GENRE_ARTISTS, MARKET_INDEX, limit))
+    return [{'key': key, 'label': index_label(key), 'value': round(value, 2), 'artist_count': count}
+            for key, value, count in cursor.fetchall()]
+
+
+def get_index_chart(cursor, index_key=MARKET_INDEX, range_key='1month'):
+    """
+    Index history formatted for Chart.js, like /portfolio_history.
+
+    Returns:
+        dict: {'datasets': [...]} with one time-series dataset
+    """
+    interval = RANGES.get(range_key, RANGES['1month'])
+    cursor.execute("""
+        SELECT recorded_at, value
+        FROM market_index_history
+        WHERE index_key = %s
+          AND (%s::interval IS NULL OR recorded_at >= NOW() - %s::interval)
+        ORDER BY recorded_at ASC
+    """, (index_key, interval, interval))
+    return {
+        'datasets': [{
+            'label': index_label(index_key),
+            'data': [{'x': recorded_at.isoformat(), 'y': float(value)}
+                     for recorded_at, value in cursor.fetchall()],
+            'borderColor': 'rgb(99, 102, 241)',
+            'backgroundColor': 'rgba(99, 102, 241, 0.1)',
+            'fill': False,
+            'tension': 0.4
+        }]
+    }
@@ -0,0 +1,97 @@
+"""
+Top movers over 1, 7 and 30 days
+
+artist_movers keeps one row per quoted artist with the change in
+popularity since the daily close 1, 7 and 30 days ago. It is recomputed
+at the end of each ingest, so reading the biggest gainers or losers is
+a single top-N scan of the (delta, spotify_id) index for that period.
+"""
+
+
+# period -> (movers column, days back)
+PERIODS = {
+    '1d': ('delta_1d', 1),
+    '7d': ('delta_7d', 7),
+    '30d': ('delta_30d', 30),
+}
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def refresh_movers(cursor):
+    """
+    Recompute every artist's deltas against past daily closes.
+
+    The baseline for each period is the latest close on or before that
+    many days ago, found with a backward scan of artist_daily_close's
+    primary key; artists without one get a NULL delta.
+
+    Returns:
+        int: Number of movers rows written
+    """
+    baselines = ",\n".join(
+        f"""(SELECT d.popularity FROM artist_daily_close d
+                 WHERE d.spotify_id = a.spotify_id AND d.day <= CURRENT_DATE - {days}
+                 ORDER BY d.day DESC LIMIT 1) AS base_{period}"""
+        for period, (_, days) in PERIODS.items()
+    )
+    cursor.execute(f"""
+        INSERT INTO artist_movers AS m
+            (spotify_id, popularity, delta_1d, delta_7d, delta_30d, updated_at)
+        SELECT spotify_id, current_popularity,
+               current_popularity - base_1d,
+               current_popularity - base_7d,
+               current_popularity - base_30d,
+               NOW()
+        FROM (
+            SELECT a.spotify_id, a.current_popularity,
+                   {baselines}
+            FROM artists a
+            WHERE a.current_popularity IS NOT NULL
+        ) b
+        ON CONFLICT (spotify_id) DO UPDATE SET
+            popularity = EXCLUDED.popularity,
+            delta_1d = EXCLUDED.delta_1d,
+            delta_7d = EXCLUDED.delta_7d,
+            delta_30d = EXCLUDED.delta_30d,
+            updated_at = NOW()
+    """)
+    return cursor.rowcount
+
+
+def get_movers(cursor, period='1d', kind='gainers', limit=DEFAULT_LIMIT):
+    """
+    Biggest gainers or losers over a period.
+
+    Args:
+        cursor: Database cursor
+        period: One of PERIODS (unknown values fall back to '1d')
+        kind: 'gainers' (largest rise first) or 'losers' (largest drop first)
+        limit: Number of artists (capped at MAX_LIMIT)
+
+    Returns:
+        list: dicts with spotify_id, name, image_url, popularity and delta
+    """
+    column = PERIODS.get(period, PERIODS['1d'])[0]
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    if kind == 'losers':
+        where, order_by = f"m.{column} < 0", f"m.{column} ASC, m.spotify_id ASC"
+    else:
+        where, order_by = f"m.{column} > 0", f"m.{column} DESC, m.spotify_id DESC"
+
+    cursor.execute(f"""
+        SELECT m.spotify_id, a.name, a.image_url, m.popularity, m.{column}
+        FROM artist_movers m
+        JOIN artists a ON a.spotify_id = m.spotify_id
+        WHERE {where}
+        ORDER BY {order_by}
+        LIMIT %s
+    """, (limit,))
+    return [{
+        'spotify_id': row[0],
+        'name': row[1],
+        'image_url': row[2],
+        'popularity': row[3],
+        'delta': row[4],
+    } for row in cursor.fetchall()]
@@ -0,0 +1,45 @@
+"""
+Opaque keyset pagination cursors
+"""
+import base64
+import json
+
+
+def encode_cursor(values):
+    """
+    Encode the sort key of the last row on a page as an opaque token.
+
+    Args:
+        values: Sequence of key values (str() is used for non-JSON types)
+
+    Returns:
+        str: URL-safe cursor token
+    """
+    raw = json.dumps(list(values), default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, converters):
+    """
+    Decode a cursor token back into typed key values.
+
+    Args:
+        token: Cursor from encode_cursor(), or None/empty for the first page
+        converters: One callable per key value (e.g. int, Decimal)
+
+    Returns:
+        tuple or None: Key values, or None for the first page
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(converters):
+            raise ValueError("wrong number of cursor values")
+        return tuple(convert(value) for convert, value in zip(converters, values))
+    except (TypeError, ValueError, ArithmeticError) as e:
+        raise ValueError("Invalid cursor") from e
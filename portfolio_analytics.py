@@ -0,0 +1,183 @@
+"""
+Portfolio risk/return analytics
+
+Metrics are computed with NumPy over a user's portfolio_history series
+and current holdings, and cached in-process per (user, range) until a
+new snapshot is recorded or the holdings are revalued.
+"""
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+
+
+RANGES = {
+    '1week': timedelta(days=7),
+    '1month': timedelta(days=30),
+    '3months': timedelta(days=90),
+    '1year': timedelta(days=365),
+    'all': None,
+}
+
+# Cached (user, range) results kept per worker
+CACHE_SIZE = 1024
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_marker(cursor, user_id):
+    """Latest snapshot time and valuation update; any change invalidates"""
+    cursor.execute("""
+        SELECT (SELECT MAX(recorded_at) FROM portfolio_history WHERE user_id = %s),
+               (SELECT updated_at FROM user_valuations WHERE user_id = %s)
+    """, (user_id, user_id))
+    return cursor.fetchone()
+
+
+def series_metrics(timestamps, values):
+    """
+    Time-weighted return, max drawdown and annualized volatility of a
+    value series.
+
+    Args:
+        timestamps: datetime64 array, ascending
+        values: float array of portfolio values
+
+    Returns:
+        dict: time_weighted_return, max_drawdown, volatility (fractions,
+            None when the series is too short)
+    """
+    metrics = {'time_weighted_return': None, 'max_drawdown': None, 'volatility': None}
+    if len(values) < 2:
+        return metrics
+
+    previous = values[:-1]
+    period_returns = np.divide(values[1:], previous, out=np.ones_like(previous), where=previous > 0) - 1
+    metrics['time_weighted_return'] = float(np.prod(1 + period_returns) - 1)
+
+    peaks = np.maximum.accumulate(values)
+    drawdowns = np.divide(values, peaks, out=np.ones_like(values), where=peaks > 0) - 1
+    metrics['max_drawdown'] = float(drawdowns.min())
+
+    # Volatility on end-of-day values so intraday snapshot bursts don't skew it
+    days = timestamps.astype('datetime64[D]')
+    last_of_day = len(days) - 1 - np.unique(days[::-1], return_index=True)[1]
+    daily = values[np.sort(last_of_day)]
+    if len(daily) >= 3:
+        daily_previous = daily[:-1]
+        daily_returns = np.divide(daily[1:], daily_previous, out=np.ones_like(daily_previous),
+                                  where=daily_previous > 0) - 1
+        metrics['volatility'] = float(np.std(daily_returns, ddof=1) * np.sqrt(365))
+    return metrics
+
+
+def holdings_metrics(holdings):
+    """
+    Per-artist contribution and genre concentration of current holdings.
+
+    Args:
+        holdings: List of (name, spotify_id, shares, avg_popularity,
+            current_popularity, genres) tuples
+
+    Returns:
+        dict: contributions, genres and genre_hhi (Herfindahl index of
+            genre weights, 1.0 = a single genre)
+    """
+    if not holdings:
+        return {'contributions': [], 'genres': [], 'genre_hhi': None}
+
+    names, spotify_ids, shares, avg_popularity, current_popularity, genres = zip(*holdings)
+    shares = np.array(shares, dtype=np.float64)
+    value = shares * np.array(current_popularity, dtype=np.float64)
+    cost = shares * np.array(avg_popularity, dtype=np.float64)
+    gain = value - cost
+    total_value = value.sum()
+    total_cost = cost.sum()
+
+    contribution = gain / total_cost if total_cost > 0 else np.zeros_like(gain)
+    weight = value / total_value if total_value > 0 else np.zeros_like(value)
+    order = np.argsort(-gain, kind='stable')
+    contributions = [{
+        'name': names[i],
+        'spotify_id': spotify_ids[i],
+        'value': float(value[i]),
+        'gain': float(gain[i]),
+        'contribution': float(contribution[i]),
+        'weight': float(weight[i]),
+    } for i in order.tolist()]
+
+    # Split each holding's value evenly across its genres
+    artist_genres = [list(g) if g else ['unknown'] for g in genres]
+    genre_counts = np.array([len(g) for g in artist_genres])
+    genre_names, genre_index = np.unique(np.concatenate(artist_genres), return_inverse=True)
+    genre_values = np.bincount(genre_index, weights=np.repeat(value / genre_counts, genre_counts),
+                               minlength=len(genre_names))
+    genre_weights = genre_values / total_value if total_value > 0 else np.zeros_like(genre_values)
+    genre_order = np.argsort(-genre_weights, kind='stable')
+
+    return {
+        'contributions': contributions,
+        'genres': [{'genre': str(genre_names[i]), 'weight': float(genre_weights[i])}
+                   for i in genre_order.tolist()],
+        'genre_hhi': float(np.square(genre_weights).sum()) if total_value > 0 else None,
+    }
+
+
+def compute_portfolio_analytics(cursor, user_id, range_key):
+    """Compute analytics for one user and range without caching"""
+    interval = RANGES[range_key]
+    cursor.execute("""
+        SELECT recorded_at, total_points
+        FROM portfolio_history
+        WHERE user_id = %s
+          AND (%s::interval IS NULL OR recorded_at >= NOW() - %s::interval)
+        ORDER BY recorded_at ASC
+    """, (user_id, interval, interval))
+    rows = cursor.fetchall()
+    timestamps = np.array([row[0] for row in rows], dtype='datetime64[us]')
+    values = np.array([float(row[1] or 0) for row in rows], dtype=np.float64)
+
+    cursor.execute("""
+        SELECT a.name, a.spotify_id, b.shares, b.avg_popularity,
+               COALESCE(a.current_popularity, 0), sd.genres
+        FROM bets b
+        JOIN artists a ON a.id = b.artist_id
+        LEFT JOIN spotify_data sd ON sd.spotify_id = a.spotify_id
+        WHERE b.user_id = %s
+    """, (user_id,))
+
+    result = {'range': range_key, 'points': len(values)}
+    result.update(series_metrics(timestamps, values))
+    result.update(holdings_metrics(cursor.fetchall()))
+    return result
+
+
+def get_portfolio_analytics(cursor, user_id, range_key='1month'):
+    """
+    Cached portfolio analytics for a user and time range.
+
+    Returns:
+        dict: Series metrics (time_weighted_return, max_drawdown,
+            volatility) plus contributions, genres and genre_hhi
+    """
+    if range_key not in RANGES:
+        range_key = '1month'
+    key = (user_id, range_key)
+    marker = _cache_marker(cursor, user_id)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == marker:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    result = compute_portfolio_analytics(cursor, user_id, range_key)
+
+    with _cache_lock:
+        _cache[key] = (marker, result)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,360 @@
+"""
+Event-sourced portfolio reconstruction
+
+A user's cash and positions at any moment are rebuilt from the
+transactions ledger (starting from the registration balance) and valued
+against artist_history. portfolio_checkpoints stores periodic state so a
+point-in-time replay only applies the transactions after the nearest
+checkpoint, and backfill_portfolio_history() replays every user day by
+day in one vectorized pass to fill gaps in portfolio_history.
+
+Usage:
+    python portfolio_replay.py backfill [days]   # fill missing daily points
+    python portfolio_replay.py checkpoint        # checkpoint live state now
+"""
+import io
+import sys
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+
+# Balance every account is opened with (see register())
+STARTING_BALANCE = 10000.0
+
+# How often state is checkpointed, both live and during backfill
+CHECKPOINT_INTERVAL = timedelta(days=7)
+
+# portfolio_history rows buffered per COPY during backfill
+COPY_BATCH_ROWS = 200000
+
+EPOCH = date(1970, 1, 1)
+
+
+def write_live_checkpoints(cursor):
+    """
+    Checkpoint every user's current balance and positions in one statement.
+
+    Returns:
+        int: Number of checkpoints written
+    """
+    cursor.execute("""
+        INSERT INTO portfolio_checkpoints (user_id, as_of, cash, artist_ids, shares)
+        SELECT u.id, NOW(), COALESCE(u.balance, 0),
+               COALESCE(array_agg(b.artist_id ORDER BY b.artist_id) FILTER (WHERE b.id IS NOT NULL), '{}'),
+               COALESCE(array_agg(b.shares ORDER BY b.artist_id) FILTER (WHERE b.id IS NOT NULL), '{}')
+        FROM users u
+        LEFT JOIN bets b ON b.user_id = u.id
+        GROUP BY u.id
+        ON CONFLICT (user_id, as_of) DO NOTHING
+    """)
+    return cursor.rowcount
+
+
+def checkpoint_if_due(cursor):
+    """Write live checkpoints when the newest one is older than CHECKPOINT_INTERVAL"""
+    cursor.execute("SELECT MAX(as_of) < NOW() - %s OR MAX(as_of) IS NULL FROM portfolio_checkpoints",
+                   (CHECKPOINT_INTERVAL,))
+    if cursor.fetchone()[0]:
+        return write_live_checkpoints(cursor)
+    return 0
+
+
+def replay_user(cursor, user_id, at):
+    """
+    Rebuild one user's portfolio as it stood at a timestamp.
+
+    Starts from the nearest checkpoint at or before `at` (or the opening
+    balance) and applies the ledger from there.
+
+    Args:
+        cursor: Database cursor
+        user_id: User to replay
+        at: datetime to reconstruct
+
+    Returns:
+        dict or None: cash, positions {artist_id: shares}, invested, total
+            and the checkpoint replay started from; None if the user did
+            not exist yet
+    """
+    cursor.execute("SELECT created_at FROM users WHERE id = %s", (user_id,))
+    row = cursor.fetchone()
+    if not row or (row[0] and row[0] > at):
+        return None
+
+    cursor.execute("""
+        SELECT as_of, cash, artist_ids, shares
+        FROM portfolio_checkpoints
+        WHERE user_id = %s AND as_of <= %s
+        ORDER BY as_of DESC
+        LIMIT 1
+    """, (user_id, at))
+    checkpoint = cursor.fetchone()
+    if checkpoint:
+        replay_from, cash = checkpoint[0], float(checkpoint[1])
+        positions = dict(zip(checkpoint[2], checkpoint[3]))
+    else:
+        replay_from, cash, positions = None, STARTING_BALANCE, {}
+
+    cursor.execute("""
+        SELECT artist_id, transaction_type, shares,
+               COALESCE(total_amount, shares * popularity_per_share)
+        FROM transactions
+        WHERE user_id = %s AND created_at <= %s
+          AND (%s::timestamp IS NULL OR created_at > %s::timestamp)
+        ORDER BY created_at, id
+    """, (user_id, at, replay_from, replay_from))
+    for artist_id, transaction_type, shares, amount in cursor.fetchall():
+        if transaction_type == 'buy':
+            positions[artist_id] = positions.get(artist_id, 0) + shares
+            cash -= float(amount)
+        else:
+            positions[artist_id] = positions.get(artist_id, 0) - shares
+            cash += float(amount)
+    positions = {artist_id: shares for artist_id, shares in positions.items() if shares > 0}
+
+    invested = 0.0
+    if positions:
+        cursor.execute("""
+            SELECT a.id, lp.popularity
+            FROM artists a
+            JOIN LATERAL (
+                SELECT popularity FROM artist_history
+                WHERE spotify_id = a.spotify_id AND recorded_at <= %s
+                ORDER BY recorded_at DESC
+                LIMIT 1
+            ) lp ON true
+            WHERE a.id = ANY(%s)
+        """, (at, list(positions.keys())))
+        invested = float(sum(positions[artist_id] * popularity for artist_id, popularity in cursor.fetchall()))
+
+    return {
+        'at': at,
+        'replayed_from': replay_from,
+        'cash': cash,
+        'positions': positions,
+        'invested': invested,
+        'total': cash + invested,
+    }
+
+
+def _load_close_matrix(cursor, start, end, n_artist_slots):
+    """Daily closes as an (artist id x day) matrix, carried forward over gaps"""
+    n_days = end - start + 1
+    closes = np.full((n_artist_slots, n_days), np.nan)
+
+    # Last close before the range seeds the carry-forward
+    cursor.execute("""
+        SELECT DISTINCT ON (a.id) a.id, dc.popularity
+        FROM artist_daily_close dc
+        JOIN artists a ON a.spotify_id = dc.spotify_id
+        WHERE dc.day < %s
+        ORDER BY a.id, dc.day DESC
+    """, (EPOCH + timedelta(days=start),))
+    previous = np.full(n_artist_slots, np.nan)
+    for artist_id, popularity in cursor.fetchall():
+        previous[artist_id] = popularity
+
+    cursor.execute("""
+        SELECT a.id, dc.day - DATE '1970-01-01', dc.popularity
+        FROM artist_daily_close dc
+        JOIN artists a ON a.spotify_id = dc.spotify_id
+        WHERE dc.day BETWEEN %s AND %s
+    """, (EPOCH + timedelta(days=start), EPOCH + timedelta(days=end)))
+    rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 3)
+    closes[rows[:, 0], rows[:, 1] - start] = rows[:, 2]
+
+    for day in range(n_days):
+        column = closes[:, day]
+        missing = np.isnan(column)
+        column[missing] = previous[missing]
+        previous = column
+    return np.nan_to_num(closes)
+
+
+def _flush_history(cursor, buf):
+    buf.seek(0)
+    cursor.copy_expert("""
+        COPY portfolio_history (user_id, total_points, points_invested, points_reserve, recorded_at)
+        FROM STDIN
+    """, buf)
+
+
+def backfill_portfolio_history(conn, days=None):
+    """
+    Replay every user's ledger day by day and insert the missing
+    end-of-day portfolio_history points.
+
+    State is kept as one shares counter per (user, artist) pair, so each
+    day costs a single vectorized revaluation against that day's closes.
+    Days that already have a snapshot for a user are left untouched, and
+    ledger-derived checkpoints are written every CHECKPOINT_INTERVAL.
+
+    Args:
+        conn: psycopg2 connection (committed on success)
+        days: Only backfill this many days back from yesterday
+
+    Returns:
+        dict: days replayed, points inserted and checkpoints written
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT CURRENT_DATE - DATE '1970-01-01' - 1,
+                   (SELECT MIN(created_at)::date - DATE '1970-01-01' FROM transactions),
+                   (SELECT MAX(id) FROM artists)
+        """)
+        end, first_day, max_artist_id = cursor.fetchone()
+        stats = {'days': 0, 'inserted': 0, 'checkpoints': 0}
+        if first_day is None or first_day > end:
+            return stats
+        start = first_day if days is None else max(first_day, end - days + 1)
+        n_artist_slots = (max_artist_id or 0) + 1
+
+        cursor.execute("""
+            SELECT id, COALESCE(created_at::date - DATE '1970-01-01', 0)
+            FROM users ORDER BY id
+        """)
+        users = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+        user_ids, created_day = users[:, 0], users[:, 1]
+        n_users = len(user_ids)
+
+        cursor.execute("""
+            SELECT user_id, artist_id,
+                   CASE WHEN transaction_type = 'buy' THEN shares ELSE -shares END,
+                   CASE WHEN transaction_type = 'buy' THEN -1 ELSE 1 END
+                       * COALESCE(total_amount, shares * popularity_per_share),
+                   created_at::date - DATE '1970-01-01'
+            FROM transactions
+            WHERE created_at::date <= %s AND artist_id IS NOT NULL
+            ORDER BY created_at, id
+        """, (EPOCH + timedelta(days=end),))
+        ledger = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 5)
+        tx_user = np.searchsorted(user_ids, ledger[:, 0].astype(np.int64))
+        tx_artist = ledger[:, 1].astype(np.int64)
+        tx_shares = ledger[:, 2]
+        tx_cash = ledger[:, 3]
+        tx_day = ledger[:, 4].astype(np.int64)
+
+        # One shares counter per (user, artist) pair, sorted by user
+        pair_keys, tx_pair = np.unique(tx_user * n_artist_slots + tx_artist, return_inverse=True)
+        pair_user = pair_keys // n_artist_slots
+        pair_artist = pair_keys % n_artist_slots
+        pair_shares = np.zeros(len(pair_keys))
+        cash = np.full(n_users, STARTING_BALANCE)
+
+        closes = _load_close_matrix(cursor, start, end, n_artist_slots)
+
+        cursor.execute("""
+            SELECT user_id, recorded_at::date - DATE '1970-01-01'
+            FROM portfolio_history
+            WHERE recorded_at::date BETWEEN %s AND %s
+            GROUP BY 1, 2
+            ORDER BY 2
+        """, (EPOCH + timedelta(days=start), EPOCH + timedelta(days=end)))
+        existing = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+        existing_user = np.searchsorted(user_ids, existing[:, 0])
+        existing_day = existing[:, 1]
+
+        # State before the backfill window
+        applied = np.searchsorted(tx_day, start, side='left')
+        np.add.at(pair_shares, tx_pair[:applied], tx_shares[:applied])
+        np.add.at(cash, tx_user[:applied], tx_cash[:applied])
+
+        checkpoint_every = CHECKPOINT_INTERVAL.days
+        changed = np.zeros(n_users, dtype=bool)
+        buf = io.StringIO()
+        buffered = 0
+
+        for day in range(start, end + 1):
+            upto = np.searchsorted(tx_day, day, side='right')
+            if upto > applied:
+                np.add.at(pair_shares, tx_pair[applied:upto], tx_shares[applied:upto])
+                np.add.at(cash, tx_user[applied:upto], tx_cash[applied:upto])
+                changed[tx_user[applied:upto]] = True
+                applied = upto
+
+            invested = np.bincount(pair_user, weights=pair_shares * closes[pair_artist, day - start],
+                                   minlength=n_users)
+
+            missing = created_day <= day
+            lo, hi = np.searchsorted(existing_day, [day, day + 1])
+            missing[existing_user[lo:hi]] = False
+            rows = np.flatnonzero(missing)
+
+            if len(rows):
+                recorded_at = datetime.combine(EPOCH + timedelta(days=day), datetime.max.time())
+                np.savetxt(buf, np.column_stack([
+                    user_ids[rows], cash[rows] + invested[rows], invested[rows], cash[rows]
+                ]), fmt=['%d', '%.2f', '%.2f', '%.2f'], delimiter='\t', newline=f'\t{recorded_at}\n')
+                buffered += len(rows)
+                stats['inserted'] += len(rows)
+            if buffered >= COPY_BATCH_ROWS:
+                _flush_history(cursor, buf)
+                buf = io.StringIO()
+                buffered = 0
+
+            if (day - start + 1) % checkpoint_every == 0 and changed.any():
+                stats['checkpoints'] += _write_replay_checkpoints(
+                    cursor, EPOCH + timedelta(days=day + 1), np.flatnonzero(changed),
+                    user_ids, cash, pair_user, pair_artist, pair_shares)
+                changed[:] = False
+            stats['days'] += 1
+
+        if buffered:
+            _flush_history(cursor, buf)
+        conn.commit()
+        return stats
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _write_replay_checkpoints(cursor, as_of, user_rows, user_ids, cash,
+                              pair_user, pair_artist, pair_shares):
+    """Checkpoint replayed state for the given users at midnight `as_of`"""
+    bounds = np.searchsorted(pair_user, np.stack([user_rows, user_rows + 1]))
+    checkpoints = []
+    for row, lo, hi in zip(user_rows.tolist(), bounds[0].tolist(), bounds[1].tolist()):
+        held = pair_shares[lo:hi] > 0
+        checkpoints.append((
+            int(user_ids[row]), as_of, round(float(cash[row]), 2),
+            pair_artist[lo:hi][held].tolist(), pair_shares[lo:hi][held].astype(np.int64).tolist(),
+        ))
+    written = execute_values(cursor, """
+        INSERT INTO portfolio_checkpoints (user_id, as_of, cash, artist_ids, shares)
+        VALUES %s
+        ON CONFLICT (user_id, as_of) DO NOTHING
+        RETURNING 1
+    """, checkpoints, template="(%s, %s, %s, %s::integer[], %s::integer[])", page_size=1000, fetch=True)
+    return len(written)
+
+
+if __name__ == '__main__':
+    import os
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL", "postgresql://localhost/anticip_db")
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'backfill'
+    conn = psycopg2.connect(database_url)
+    try:
+        if command == 'checkpoint':
+            cursor = conn.cursor()
+            written = write_live_checkpoints(cursor)
+            conn.commit()
+            print(f"✅ Checkpointed {written} users")
+        else:
+            days = int(sys.argv[2]) if len(sys.argv) > 2 else None
+            stats = backfill_portfolio_history(conn, days)
+            print(f"✅ Replayed {stats['days']} days: {stats['inserted']} history points, "
+                  f"{stats['checkpoints']} checkpoints")
+    finally:
+        conn.close()
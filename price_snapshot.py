@@ -0,0 +1,266 @@
+"""
+Shared-memory price snapshot
+
+The current quote of every artist is published to a single file that
+gunicorn workers memory-map read-only, so the pages are shared through
+the OS page cache and a lookup is a binary search over the mapped ids
+instead of a database round trip. A new version is written to a temp
+file and swapped in with os.replace; workers notice the new inode and
+remap, while requests still holding the old map keep reading it.
+
+Quotes are ingested on another host, so workers also compare the
+snapshot with the artists table every CHECK_INTERVAL seconds and
+republish it (one worker at a time, under an advisory lock) when it is
+behind.
+
+File layout (little-endian, sections 8-byte aligned):
+    header      magic, version (ns), count, id width, quoted_through (us)
+    ids         count fixed-width spotify ids, sorted bytewise
+    popularity  count int16
+    quoted_at   count uint32 epoch seconds (0 = unknown)
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+
+SNAPSHOT_PATH = os.getenv('PRICE_SNAPSHOT_PATH',
+                          os.path.join(tempfile.gettempdir(), 'anticip_prices.snap'))
+
+MAGIC = b'APS1'
+HEADER = struct.Struct('<4sQIIq')
+HEADER_SIZE = 32
+
+# Seconds between a worker's staleness checks against the database
+CHECK_INTERVAL = 30
+
+# Republish even when the marker matches, so late-committed ticks are picked up
+MAX_SNAPSHOT_AGE = 600
+
+SNAPSHOT_LOCK_ID = 4242002
+
+_EPOCH = datetime(1970, 1, 1)
+
+_snapshot = None
+_checked_at = 0.0
+_snapshot_lock = threading.Lock()
+
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+
+def _layout(count, id_width):
+    """Byte offsets of the ids, popularity and quoted_at sections, plus file size"""
+    ids_at = HEADER_SIZE
+    popularity_at = _align(ids_at + count * id_width)
+    quoted_at = _align(popularity_at + 2 * count)
+    return ids_at, popularity_at, quoted_at, _align(quoted_at + 4 * count)
+
+
+class PriceSnapshot:
+    """Read-only view over a mapped snapshot file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.key = (stat.st_ino, stat.st_mtime_ns)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.version, count, self.id_width, self.quoted_through = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"Not a price snapshot: {path}")
+        ids_at, popularity_at, quoted_at, _ = _layout(count, self.id_width)
+        self.ids = np.frombuffer(self._map, dtype=f'S{self.id_width}', count=count, offset=ids_at)
+        self.popularity = np.frombuffer(self._map, dtype='<i2', count=count, offset=popularity_at)
+        self.quoted_at = np.frombuffer(self._map, dtype='<u4', count=count, offset=quoted_at)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def published_at(self):
+        return self.version / 1e9
+
+    def index(self, spotify_id):
+        """Position of an artist in the snapshot, or None when unquoted"""
+        key = spotify_id.encode()
+        if len(key) > self.id_width:
+            return None
+        i = int(self.ids.searchsorted(key))
+        if i < len(self.ids) and self.ids[i] == key:
+            return i
+        return None
+
+    def _quote_at(self, i):
+        seconds = int(self.quoted_at[i])
+        return int(self.popularity[i]), (_EPOCH + timedelta(seconds=seconds) if seconds else None)
+
+    def popularity_of(self, spotify_id):
+        """Current popularity of an artist, or None when unquoted"""
+        i = self.index(spotify_id)
+        return None if i is None else int(self.popularity[i])
+
+    def quote(self, spotify_id):
+        """(popularity, quoted_at) for an artist, or None when unquoted"""
+        i = self.index(spotify_id)
+        return None if i is None else self._quote_at(i)
+
+    def popularity_array(self, spotify_ids):
+        """Popularity for each id as an int16 array, -1 where unquoted"""
+        result = np.full(len(spotify_ids), -1, dtype=np.int16)
+        if not len(self.ids):
+            return result
+        keys = np.array([s.encode() for s in spotify_ids], dtype=f'S{self.id_width + 1}')
+        positions = np.minimum(self.ids.searchsorted(keys), len(self.ids) - 1)
+        found = self.ids[positions] == keys
+        result[found] = self.popularity[positions[found]]
+        return result
+
+    def quotes(self, spotify_ids):
+        """
+        Look up many artists with one vectorized search.
+
+        Returns:
+            dict: spotify_id -> (popularity, quoted_at) for quoted artists
+        """
+        spotify_ids = [s for s in spotify_ids if len(s.encode()) <= self.id_width]
+        if not spotify_ids or not len(self.ids):
+            return {}
+        keys = np.array([s.encode() for s in spotify_ids], dtype=self.ids.dtype)
+        positions = np.minimum(self.ids.searchsorted(keys), len(self.ids) - 1)
+        found = self.ids[positions] == keys
+        return {spotify_ids[j]: self._quote_at(int(positions[j])) for j in np.flatnonzero(found).tolist()}
+
+
+def _db_marker(cursor):
+    """Latest quote time (us) and quoted artist count; any change means stale"""
+    cursor.execute("""
+        SELECT COALESCE((EXTRACT(EPOCH FROM MAX(quoted_at)) * 1000000)::bigint, 0), COUNT(*)
+        FROM artists
+        WHERE current_popularity IS NOT NULL
+    """)
+    return tuple(cursor.fetchone())
+
+
+def publish_snapshot(cursor, path=SNAPSHOT_PATH):
+    """
+    Write the current quotes to a new snapshot file and swap it in.
+
+    Returns:
+        int: Number of artists in the snapshot
+    """
+    cursor.execute("""
+        SELECT spotify_id, current_popularity,
+               COALESCE((EXTRACT(EPOCH FROM quoted_at) * 1000000)::bigint, 0)
+        FROM artists
+        WHERE current_popularity IS NOT NULL
+    """)
+    rows = cursor.fetchall()
+    count = len(rows)
+    id_width = max([len(row[0].encode()) for row in rows] or [1])
+
+    ids = np.array([row[0].encode() for row in rows], dtype=f'S{id_width}')
+    quoted_us = np.array([row[2] for row in rows], dtype=np.int64)
+    order = np.argsort(ids, kind='stable')
+    ids = ids[order]
+    popularity = np.array([row[1] for row in rows], dtype='<i2')[order]
+    quoted_at = (quoted_us // 1000000).astype('<u4')[order]
+    quoted_through = int(quoted_us.max()) if count else 0
+
+    ids_at, popularity_at, quoted_at_at, size = _layout(count, id_width)
+    buf = bytearray(size)
+    HEADER.pack_into(buf, 0, MAGIC, time.time_ns(), count, id_width, quoted_through)
+    buf[ids_at:ids_at + ids.nbytes] = ids.tobytes()
+    buf[popularity_at:popularity_at + popularity.nbytes] = popularity.tobytes()
+    buf[quoted_at_at:quoted_at_at + quoted_at.nbytes] = quoted_at.tobytes()
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(buf)
+    os.replace(tmp_path, path)
+    return count
+
+
+def _remap(snapshot, path):
+    """Map the file at path if it is a different version than snapshot"""
+    try:
+        stat = os.stat(path)
+        if snapshot is None or snapshot.key != (stat.st_ino, stat.st_mtime_ns):
+            return PriceSnapshot(path)
+    except FileNotFoundError:
+        pass
+    return snapshot
+
+
+def _republish(cursor, path, wait):
+    """Publish under the advisory lock; skip if another worker holds it"""
+    if wait:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (SNAPSHOT_LOCK_ID,))
+    else:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (SNAPSHOT_LOCK_ID,))
+        if not cursor.fetchone()[0]:
+            return
+    try:
+        # A worker that waited for the lock may find the file already written
+        if not (wait and os.path.exists(path)):
+            publish_snapshot(cursor, path)
+    except Exception:
+        # Clear an aborted transaction so the unlock below can run
+        cursor.connection.rollback()
+        raise
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (SNAPSHOT_LOCK_ID,))
+
+
+def get_snapshot(cursor=None, path=SNAPSHOT_PATH):
+    """
+    Current price snapshot for this worker.
+
+    Remaps when a newer file has been swapped in. With a cursor, the
+    snapshot is also checked against the database at most every
+    CHECK_INTERVAL seconds and republished when it is behind.
+
+    Returns:
+        PriceSnapshot: Mapped snapshot (None only without a cursor when
+            nothing has been published yet)
+    """
+    global _snapshot, _checked_at
+    with _snapshot_lock:
+        _snapshot = _remap(_snapshot, path)
+        now = time.monotonic()
+        if cursor is not None and (_snapshot is None or now - _checked_at >= CHECK_INTERVAL):
+            _checked_at = now
+            stale = (_snapshot is None
+                     or time.time() - _snapshot.published_at > MAX_SNAPSHOT_AGE
+                     or _db_marker(cursor) != (_snapshot.quoted_through, len(_snapshot)))
+            if stale:
+                _republish(cursor, path, wait=_snapshot is None)
+                _snapshot = _remap(_snapshot, path)
+        return _snapshot
+
+
+if __name__ == '__main__':
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL", "postgresql://localhost/anticip_db")
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+    conn = psycopg2.connect(database_url)
+    cursor = conn.cursor()
+    try:
+        count = publish_snapshot(cursor)
+        print(f"✅ Published price snapshot of {count} artists to {SNAPSHOT_PATH}")
+    finally:
+        cursor.close()
+        conn.close()
@@ -7,6 +7,8 @@ import psycopg2
 import os
 import sys
 
+from spotify_projection import compact_payloads, payload_sizes, PROJECTION_VERSION
+
 def check_column_exists(cursor, table, column):
     """Check if a column exists in a table"""
     cursor.execute("""
@@ -17,6 +19,34 @@ def check_column_exists(cursor, table, column):
     """, (table, column))
     return cursor.fetchone()[0]
 
+def check_table_exists(cursor, table):
+    """Check if a table exists"""
+    cursor.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.tables 
+            WHERE table_name = %s
+        );
+    """, (table,))
+    return cursor.fetchone()[0]
+
+def index_state(cursor, index):
+    """Return 'valid', 'invalid' (failed concurrent build) or None if missing"""
+    cursor.execute("""
+        SELECT i.indisvalid FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s
+    """, (index,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return 'valid' if row[0] else 'invalid'
+
+# Trigram indexes behind ranked artist/user search (see search.py)
+SEARCH_INDEXES = [
+    ('idx_artists_name_trgm', 'artists', 'name'),
+    ('idx_users_username_trgm', 'users', 'username'),
+]
+
 def run_migration():
     """Ensure database has the correct schema"""
     try:
@@ -75,6 +105,46 @@ def run_migration():
             print("   ❌ ERROR: transactions table missing popularity_per_share column!")
             return False
         
+        # 3. Trigram search indexes (built concurrently so live tables stay writable)
+        print("\n📋 Checking search indexes...")
+        try:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        except psycopg2.Error as e:
+            print(f"   ⚠️  pg_trgm unavailable, search falls back to unindexed ILIKE: {e}")
+        else:
+            for index, table, column in SEARCH_INDEXES:
+                if not check_table_exists(cursor, table):
+                    print(f"   ⚠️  {table} table not created yet, skipping {index}")
+                    continue
+                state = index_state(cursor, index)
+                if state == 'valid':
+                    print(f"   ✅ {index} present")
+                    continue
+                if state == 'invalid':
+                    print(f"   ⚠️  Dropping invalid {index} left by a failed build...")
+                    cursor.execute(f"DROP INDEX CONCURRENTLY {index};")
+                print(f"   🔄 Creating {index}...")
+                cursor.execute(
+                    f"CREATE INDEX CONCURRENTLY {index} ON {table} USING gin ({column} gin_trgm_ops);"
+                )
+                print(f"   ✅ {index} created")
+                migration_needed = True
+        
+        # 4. Compact Spotify track/album payloads written before the projection
+        print("\n📋 Checking SPOTIFY_DATA payloads...")
+        if check_column_exists(cursor, 'spotify_data', 'payload_version'):
+            rewritten = compact_payloads(conn)
+            if rewritten:
+                print(f"   ✅ Compacted {rewritten} rows to payload v{PROJECTION_VERSION}")
+                migration_needed = True
+            else:
+                print(f"   ✅ All rows at payload v{PROJECTION_VERSION}")
+            for stats in payload_sizes(cursor):
+                print(f"   📦 v{stats['version']}: {stats['rows']} rows, "
+                      f"{stats['top_tracks_bytes'] + stats['recent_albums_bytes']} B per row")
+        else:
+            print("   ⚠️  payload_version column not created yet, skipping")
+        
         if not migration_needed:
             print("\n✅ All database schemas are correct - no migration needed")
         else:
@@ -0,0 +1,178 @@
+"""
+Staleness-driven refresh of Spotify artist data
+
+Popularity moves daily, but top tracks and albums change far less
+often, so refreshing them for every artist on every run wastes most of
+the API quota. Popularity (with followers and genres) is fetched for
+the whole catalog with batched sp.artists calls, 50 ids per request;
+tracks and albums are refreshed only for the most overdue artists,
+within a per-run call budget.
+
+An artist is due once its data is older than its target age, which
+shrinks from MAX_AGE_HOURS as more users hold it and as its popularity
+rises:
+
+    target_age = MAX_AGE_HOURS / (1 + HOLDER_WEIGHT * ln(1 + holders)
+                                    + POPULARITY_WEIGHT * popularity / 100)
+
+Due artists are refreshed in order of age / target_age, so a heavily
+held artist two days stale goes before an obscure one a week stale;
+artists with no spotify_data yet come first.
+"""
+import json
+import os
+
+from psycopg2.extras import execute_values
+
+from artist_enrichment import fetch_bundles, upsert_spotify_data
+from market_index import lock_genres, apply_genre_changes
+
+
+# Refresh tracks and albums at least weekly, even for artists nobody holds
+MAX_AGE_HOURS = 7 * 24
+MIN_AGE_HOURS = 6
+HOLDER_WEIGHT = 1.5
+POPULARITY_WEIGHT = 2.0
+
+# Track/album calls per run (2 per artist, 3 when the artist object is not known)
+REFRESH_BUDGET = int(os.getenv('SPOTIFY_REFRESH_BUDGET', 400))
+
+ARTISTS_PER_CALL = 50
+
+
+def fetch_artists(sp, spotify_ids):
+    """
+    Fetch artist objects with batched sp.artists calls.
+
+    Returns:
+        tuple: (spotify_id -> artist object, ids that failed or were not found)
+    """
+    artists = {}
+    failed = []
+    for i in range(0, len(spotify_ids), ARTISTS_PER_CALL):
+        batch = spotify_ids[i:i + ARTISTS_PER_CALL]
+        try:
+            found = sp.artists(batch)['artists']
+        except Exception as e:
+            print(f"Error fetching artists batch at {i}: {e}")
+            failed.extend(batch)
+            continue
+        for spotify_id, artist in zip(batch, found):
+            if artist:
+                artists[spotify_id] = artist
+            else:
+                failed.append(spotify_id)
+    return artists, failed
+
+
+def update_artist_metadata(cursor, artists):
+    """
+    Store followers, popularity, genres and links from a popularity pass.
+
+    Only existing spotify_data rows are touched and last_updated is
+    left alone: it tracks the track/album refresh. Quoted artists whose
+    genres changed are moved between genre indices.
+
+    Returns:
+        list: spotify_ids whose genres changed
+    """
+    if not artists:
+        return []
+    old_genres = lock_genres(cursor, artists.keys())
+    changes = [(spotify_id, old_genres[spotify_id], artist.get('genres', []))
+               for spotify_id, artist in artists.items()
+               if old_genres.get(spotify_id) is not None
+               and set(old_genres[spotify_id]) != set(artist.get('genres', []))]
+    execute_values(cursor, """
+        UPDATE spotify_data sd
+        SET followers = v.followers, popularity = v.popularity,
+            genres = v.genres, external_urls = v.external_urls
+        FROM (VALUES %s) AS v(spotify_id, followers, popularity, genres, external_urls)
+        WHERE sd.spotify_id = v.spotify_id
+    """, [(spotify_id, artist.get('followers', {}).get('total', 0), artist.get('popularity', 0),
+           artist.get('genres', []), json.dumps(artist.get('external_urls', {})))
+          for spotify_id, artist in artists.items()],
+        template="(%s, %s, %s, %s::text[], %s::jsonb)")
+    apply_genre_changes(cursor, changes)
+    return [spotify_id for spotify_id, _, _ in changes]
+
+
+def select_stale(cursor, limit):
+    """
+    Most overdue artists for a track/album refresh.
+
+    Returns:
+        tuple: ((spotify_id, priority) tuples, most overdue first, where
+            priority is age / target age so >= 1 means due; total number
+            of due artists before the limit)
+    """
+    cursor.execute("""
+        WITH holders AS (
+            SELECT artist_id, COUNT(DISTINCT user_id) AS holders
+            FROM bets
+            WHERE shares > 0
+            GROUP BY artist_id
+        ),
+        scored AS (
+            SELECT a.spotify_id,
+                   EXTRACT(EPOCH FROM NOW() - sd.last_updated) / 3600 AS age_hours,
+                   %(max_age)s / (1 + %(holder_weight)s * ln(1 + COALESCE(h.holders, 0))
+                                    + %(popularity_weight)s * COALESCE(a.current_popularity, 0) / 100.0)
+                       AS target_hours,
+                   sd.spotify_id IS NULL AS missing
+            FROM artists a
+            LEFT JOIN spotify_data sd ON sd.spotify_id = a.spotify_id
+            LEFT JOIN holders h ON h.artist_id = a.id
+        )
+        SELECT spotify_id,
+               CASE WHEN missing THEN 'Infinity'::float
+                    ELSE age_hours / GREATEST(target_hours, %(min_age)s) END AS priority,
+               COUNT(*) OVER () AS due
+        FROM scored
+        WHERE missing OR age_hours >= GREATEST(target_hours, %(min_age)s)
+        ORDER BY priority DESC, spotify_id
+        LIMIT %(limit)s
+    """, {'max_age': MAX_AGE_HOURS, 'min_age': MIN_AGE_HOURS, 'holder_weight': HOLDER_WEIGHT,
+          'popularity_weight': POPULARITY_WEIGHT, 'limit': limit})
+    rows = cursor.fetchall()
+    due = rows[0][2] if rows else 0
+    return [(spotify_id, float(priority)) for spotify_id, priority, _ in rows], due
+
+
+def refresh_stale(sp, cursor, budget=REFRESH_BUDGET, artists=None):
+    """
+    Refresh tracks and albums for the most overdue artists within budget.
+
+    Args:
+        sp: spotipy client
+        cursor: Database cursor (caller commits)
+        budget: Maximum Spotify calls to spend
+        artists: spotify_id -> artist object from this run's popularity
+            pass; artists not in it cost an extra call
+
+    Returns:
+        dict: due (all overdue artists, including any beyond the budget),
+            selected, refreshed, failed, calls spent and
+            genres_changed (refreshed artists moved between genre indices)
+    """
+    artists = artists or {}
+    candidates, due = select_stale(cursor, budget // 2)
+    selected = []
+    calls = 0
+    for spotify_id, _ in candidates:
+        cost = 2 if spotify_id in artists else 3
+        if calls + cost > budget:
+            break
+        selected.append(spotify_id)
+        calls += cost
+
+    bundles = fetch_bundles(sp, selected, artists, batch=True)
+    fetched = [(spotify_id, bundle) for spotify_id, bundle in bundles.items()
+               if not isinstance(bundle, Exception)]
+    for spotify_id, bundle in bundles.items():
+        if isinstance(bundle, Exception):
+            print(f"Error refreshing {spotify_id}: {bundle}")
+    genres_changed = upsert_spotify_data(cursor, fetched)
+    return {'due': due, 'selected': len(selected), 'refreshed': len(fetched),
+            'failed': len(selected) - len(fetched), 'calls': calls,
+            'genres_changed': len(genres_changed)}
@@ -0,0 +1,89 @@
+"""
+Ranked artist and user search
+
+Names match as substrings (ILIKE) or fuzzily (pg_trgm's % operator) and
+are ranked by trigram similarity, with a LIMIT so only the best matches
+leave the database. Both predicates are served by the GIN trigram
+indexes that railway_migrate.py creates on artists.name and
+users.username.
+
+Databases without pg_trgm (e.g. a bare local Postgres) fall back to an
+unindexed ILIKE ranked by where the match starts.
+"""
+from genre_facets import genre_filter_sql
+
+
+SEARCH_LIMIT = 50
+
+_has_trigram = None
+
+
+def has_trigram_support(cursor):
+    """Whether pg_trgm is installed; checked once per process"""
+    global _has_trigram
+    if _has_trigram is None:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        _has_trigram = cursor.fetchone()[0]
+    return _has_trigram
+
+
+def like_pattern(query):
+    """Substring ILIKE pattern with LIKE wildcards in the query escaped"""
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def _match_and_rank(cursor, column):
+    """WHERE and ORDER BY fragments for a ranked search on column"""
+    if has_trigram_support(cursor):
+        return (f"({column} ILIKE %(pattern)s OR {column} %% %(query)s)",
+                f"similarity({column}, %(query)s) DESC, {column}")
+    return (f"{column} ILIKE %(pattern)s",
+            f"strpos(lower({column}), lower(%(query)s)), length({column}), {column}")
+
+
+def find_artists(cursor, query, limit=SEARCH_LIMIT, genres=None):
+    """
+    Best-matching artists for a search query, optionally restricted to
+    artists tagged with all of the given genres.
+
+    Returns:
+        list: (spotify_id, name, image_url) tuples, best match first
+    """
+    where, order_by = _match_and_rank(cursor, 'a.name')
+    if genres:
+        where += f" AND {genre_filter_sql('a.spotify_id', '%(genres)s')}"
+    cursor.execute(f"""
+        SELECT a.spotify_id, a.name, a.image_url
+        FROM artists a
+        WHERE {where}
+        ORDER BY {order_by}
+        LIMIT %(limit)s
+    """, {'pattern': like_pattern(query), 'query': query, 'limit': limit, 'genres': list(genres or [])})
+    return cursor.fetchall()
+
+
+def find_users(cursor, viewer_id, query, limit=SEARCH_LIMIT):
+    """
+    Best-matching users for a search query, with the viewer's follow status.
+
+    Returns:
+        list: dicts with id, username and follow_status ('none',
+            'pending' or 'following'), best match first
+    """
+    where, order_by = _match_and_rank(cursor, 'u.username')
+    cursor.execute(f"""
+        SELECT u.id, u.username,
+            CASE
+                WHEN f.status IS NULL THEN 'none'
+                WHEN f.status = 'pending' THEN 'pending'
+                WHEN f.status = 'accepted' THEN 'following'
+            END as follow_status
+        FROM users u
+        LEFT JOIN follows f ON f.followed_id = u.id AND f.follower_id = %(viewer_id)s
+        WHERE u.id != %(viewer_id)s AND {where}
+        ORDER BY {order_by}
+        LIMIT %(limit)s
+    """, {'viewer_id': viewer_id, 'pattern': like_pattern(query), 'query': query, 'limit': limit})
+    return [{'id': id, 'username': username, 'follow_status': status}
+            for id, username, status in cursor.fetchall()]
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Bulk artist seeding pipeline
+
+Replaces seed_artists.py and seed_artists_safe.py, which searched one
+query at a time and inserted (and committed) artists row by row. The
+pipeline runs in stages:
+
+    1. inputs      search queries and/or files of artist IDs or URLs
+    2. search      queries fan out over a thread pool, paging through
+                   results, all calls sharing one RateLimiter
+    3. dedupe      IDs are deduplicated in memory as results arrive,
+                   against each other and against artists already seeded
+    4. fetch       IDs without an artist object (ID files) are fetched
+                   50 per sp.artists call, concurrently under the limiter
+    5. load        each chunk is COPYed into a staging table and upserted
+                   into artists, spotify_data and artist_history with a
+                   few set-based statements, then quoted in one tick
+
+Search results already carry full artist objects, so only IDs from
+files cost fetch calls. Seeded artists have no tracks or albums yet;
+their spotify_data is stamped at the epoch so refresh_scheduler treats
+them as overdue.
+
+Usage:
+    python seed_pipeline.py                                 # built-in queries and IDs
+    python seed_pipeline.py --query "k-pop" --query "afrobeats" --pages 20
+    python seed_pipeline.py --queries-file genres.txt --ids-file ids.txt --rate 20
+"""
+import csv
+import io
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from valuations import apply_ticks
+from trade_history import record_daily_closes
+from genre_facets import refresh_genre_facets
+from market_index import rebuild_market_index
+from refresh_scheduler import fetch_artists, ARTISTS_PER_CALL
+from spotify_projection import PROJECTION_VERSION
+
+
+SEARCH_PAGE = 50
+# Spotify serves search results up to offset 1000
+MAX_SEARCH_OFFSET = 1000
+
+REQUESTS_PER_SECOND = 10.0
+WORKERS = 8
+LOAD_CHUNK = 5000
+
+# Searches surface plenty of inactive artists; explicit IDs are always seeded
+MIN_SEARCH_POPULARITY = 20
+
+DEFAULT_QUERIES = [
+    # Top genres
+    "pop", "hip hop", "rap", "rock", "indie", "electronic", "r&b", "country",
+    "jazz", "metal", "alternative", "edm", "latin", "reggae", "blues", "folk",
+    "punk", "soul", "disco", "funk", "techno", "house", "trap",
+
+    # Popular artist names to ensure we get major artists
+    "drake", "taylor swift", "bad bunny", "the weeknd", "ariana grande",
+    "ed sheeran", "post malone", "billie eilish", "dua lipa", "justin bieber",
+    "kanye west", "beyonce", "rihanna", "adele", "bruno mars",
+    "travis scott", "eminem", "kendrick lamar", "j cole", "cardi b",
+    "coldplay", "imagine dragons", "maroon 5", "one direction", "bts",
+    "blackpink", "olivia rodrigo", "harry styles", "shawn mendes", "selena gomez",
+    "sza", "21 savage", "lil baby", "doja cat", "megan thee stallion",
+    "lil uzi vert", "juice wrld", "xxxtentacion", "lil nas x", "roddy ricch",
+    "dababy", "gunna", "young thug", "future", "nicki minaj",
+    "frank ocean", "tyler the creator", "asap rocky", "playboi carti",
+    "the beatles", "led zeppelin", "pink floyd", "queen", "david bowie",
+    "nirvana", "radiohead", "arctic monkeys", "the strokes", "tame impala",
+    "mac miller", "anderson paak", "calvin harris", "marshmello", "chainsmokers",
+    "diplo", "skrillex", "major lazer", "flume", "odesza",
+    "j balvin", "ozuna", "daddy yankee", "maluma",
+    "peso pluma", "karol g", "rauw alejandro", "anuel aa", "farruko",
+]
+
+# Well-known artists seeded even if the searches miss them
+DEFAULT_ARTIST_IDS = [
+    "06HL4z0CvFAxyc27GXpf02",  # Taylor Swift
+    "3TVXtAsR1Inumwj472S9r4",  # Drake
+    "1Xyo4u8uXC1ZmMpatF05PJ",  # The Weeknd
+    "66CXWjxzNUsdJxJ2JdwvnR",  # Ariana Grande
+    "6eUKZXaKkcviH0Ku9w2n3V",  # Ed Sheeran
+    "1dfeR4HaWDbWqFHLkxsg1d",  # Queen
+    "3WrFJ7ztbogyGnTHbHJFl2",  # The Beatles
+    "0du5cEVh5yTK9QJze8zA0C",  # Bruno Mars
+    "4gzpq5DPGxSnKTe4SA8HAU",  # Coldplay
+    "7dGJo4pcD2V6oG8kP0tJRR",  # Eminem
+    "1HY2Jd0NmPuamShAr6KMms",  # Lady Gaga
+    "6M2wZ9GZgrQXHCFfjv46we",  # Dua Lipa
+    "04gDigrS5kc9YWfZHwBETP",  # Maroon 5
+    "5pKCCKE2ajJHZ9KAiaK11H",  # Rihanna
+    "181bsRPaVXVlUKXrxwZfHK",  # Megan Thee Stallion
+    "7tYKF4w9nC0nq9CsPZTHyP",  # SZA
+    "6LuN9FCkKOj5PcnpouEgny",  # Khalid
+    "6S2OmqARrzebs0tKUEyXyp",  # Doja Cat
+    "4r63FhuTkUYltbVAg5TQnk",  # Cardi B
+    "0Y5tJX1MQlPlqiwlOH1tJY",  # Travis Scott
+    "1URnnhqYAYcrqrcwql10ft",  # 21 Savage
+    "2YZyLoL8N0Wb9xBt1NhZWg",  # Kendrick Lamar
+    "5K4W6rqBFWDnAN6FQUkS6x",  # Kanye West
+    "1uNFoZAHBGtllmzznpCI3s",  # Justin Bieber
+    "6LqNN22kT3074XbTVUrhzX",  # Katy Perry
+    "15UsOTVnJzReFVN1VCnxy4",  # XXXTENTACION
+    "3Nrfpe0tUJi4K4DXYWgMUX",  # BTS
+    "0iEtIxbK0KxaSlF7G42ZOp",  # Metro Boomin
+    "5f7VJjfbwm532GiveGC0ZK",  # Lil Baby
+    "3fMbdgg4jU18AjLCKBhRSm",  # Michael Jackson
+    "22bE4uQ6baNwSHPVcDxLCe",  # The Rolling Stones
+    "4MXUO7sVCaFgFjoTI5ox5c",  # Juice WRLD
+    "5INjqkS1o8h1imAzPqGZBb",  # Tame Impala
+    "6KImCVD70vtIoJWnq6nGn3",  # Harry Styles
+    "0hCNtLu0JehylgoiP8L4Gh",  # Nicki Minaj
+    "5cj0lLjcoR7YOSnhnX0Po5",  # Shawn Mendes
+    "13ubrt8QOOCPljQ2FL1Kca",  # A$AP Rocky
+]
+
+# Bare IDs, spotify:artist: URIs and open.spotify.com/artist/ URLs
+ARTIST_ID_PATTERN = re.compile(r'(?<![0-9A-Za-z])([0-9A-Za-z]{22})(?![0-9A-Za-z])')
+
+
+class RateLimiter:
+    """Spaces calls at most rate per second across all threads"""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_at = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+def parse_artist_ids(lines):
+    """
+    Artist IDs from lines of IDs, URIs or URLs; blank lines and # comments are skipped.
+
+    Returns:
+        list: IDs in input order (duplicates kept; the pipeline dedupes)
+    """
+    ids = []
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        match = ARTIST_ID_PATTERN.search(line)
+        if match:
+            ids.append(match.group(1))
+    return ids
+
+
+def _search_query(sp, limiter, query, pages):
+    """Page through one query's artist results, stopping at the first short page"""
+    artists = []
+    for offset in range(0, min(pages * SEARCH_PAGE, MAX_SEARCH_OFFSET), SEARCH_PAGE):
+        limiter.wait()
+        items = sp.search(q=query, type='artist', limit=SEARCH_PAGE, offset=offset)['artists']['items']
+        artists.extend(item for item in items if item)
+        if len(items) < SEARCH_PAGE:
+            break
+    return artists
+
+
+def _fetch_chunk(sp, limiter, spotify_ids):
+    limiter.wait()
+    return fetch_artists(sp, spotify_ids)
+
+
+def collect_artists(sp, queries=(), spotify_ids=(), known=(), pages=1,
+                    rate=REQUESTS_PER_SECOND, workers=WORKERS, min_popularity=MIN_SEARCH_POPULARITY):
+    """
+    Search, dedupe and fetch: every new artist object the inputs lead to.
+
+    Args:
+        sp: spotipy client
+        queries: Search queries
+        spotify_ids: Explicit artist IDs
+        known: IDs to skip (already seeded)
+        pages: Result pages of 50 per query
+        rate: Spotify calls per second, across all workers
+        workers: Concurrent Spotify calls
+        min_popularity: Searched artists below this are skipped
+
+    Returns:
+        tuple: (spotify_id -> artist object, stats dict)
+    """
+    limiter = RateLimiter(rate)
+    seen = set(known)
+    artists = {}
+    stats = {'queries': len(queries), 'search_errors': 0, 'found': 0, 'duplicates': 0,
+             'known': 0, 'unpopular': 0, 'fetched': 0, 'failed': 0}
+
+    def admit(spotify_id):
+        if spotify_id in seen:
+            stats['known' if spotify_id in known else 'duplicates'] += 1
+            return False
+        seen.add(spotify_id)
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='seed') as pool:
+        searches = {pool.submit(_search_query, sp, limiter, query, pages): query for query in queries}
+        for future in as_completed(searches):
+            try:
+                found = future.result()
+            except Exception as e:
+                print(f"⚠️  Error searching for '{searches[future]}': {e}")
+                stats['search_errors'] += 1
+                continue
+            stats['found'] += len(found)
+            for artist in found:
+                if (artist.get('popularity') or 0) < min_popularity:
+                    stats['unpopular'] += 1
+                elif admit(artist['id']):
+                    artists[artist['id']] = artist
+
+        to_fetch = [spotify_id for spotify_id in dict.fromkeys(spotify_ids) if admit(spotify_id)]
+        chunks = [to_fetch[i:i + ARTISTS_PER_CALL] for i in range(0, len(to_fetch), ARTISTS_PER_CALL)]
+        for fetched, failed in pool.map(lambda chunk: _fetch_chunk(sp, limiter, chunk), chunks):
+            artists.update(fetched)
+            stats['fetched'] += len(fetched)
+            stats['failed'] += len(failed)
+    return artists, stats
+
+
+def load_known_ids(cursor):
+    """spotify_ids already in the catalog"""
+    cursor.execute("SELECT spotify_id FROM artists")
+    return {spotify_id for spotify_id, in cursor.fetchall()}
+
+
+def bulk_load(cursor, artists):
+    """
+    COPY artists into staging and upsert the catalog tables from it.
+
+    New artists get their artists row, first artist_history tick and
+    quote; spotify_data is upserted for all of them (existing track and
+    album payloads are kept). Must run inside the caller's transaction.
+
+    Args:
+        cursor: Database cursor
+        artists: Iterable of Spotify artist objects
+
+    Returns:
+        int: Number of artists inserted
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for artist in artists:
+        images = artist.get('images') or []
+        writer.writerow([
+            artist['id'],
+            artist.get('name') or '',
+            images[0]['url'] if images else None,
+            artist.get('popularity') or 0,
+            (artist.get('followers') or {}).get('total') or 0,
+            json.dumps(artist.get('genres') or []),
+            json.dumps(artist.get('external_urls') or {}),
+        ])
+    buf.seek(0)
+
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS seed_staging (
+            spotify_id VARCHAR(255),
+            name VARCHAR(255),
+            image_url VARCHAR(255),
+            popularity INTEGER,
+            followers INTEGER,
+            genres JSONB,
+            external_urls JSONB
+        )
+    """)
+    cursor.execute("TRUNCATE seed_staging")
+    cursor.copy_expert("COPY seed_staging FROM STDIN WITH (FORMAT csv)", buf)
+
+    # Another process may have added some of them since the known IDs were loaded
+    cursor.execute("""
+        INSERT INTO artists (spotify_id, name, image_url)
+        SELECT spotify_id, name, image_url FROM seed_staging
+        ON CONFLICT (spotify_id) DO NOTHING
+        RETURNING spotify_id
+    """)
+    inserted = [spotify_id for spotify_id, in cursor.fetchall()]
+
+    cursor.execute(f"""
+        INSERT INTO spotify_data
+        (spotify_id, followers, popularity, genres, external_urls, last_updated, payload_version)
+        SELECT spotify_id, followers, popularity,
+               ARRAY(SELECT jsonb_array_elements_text(genres)), external_urls,
+               'epoch', {PROJECTION_VERSION}
+        FROM seed_staging
+        ON CONFLICT (spotify_id) DO UPDATE SET
+            followers = EXCLUDED.followers,
+            popularity = EXCLUDED.popularity,
+            genres = EXCLUDED.genres,
+            external_urls = EXCLUDED.external_urls
+    """)
+
+    cursor.execute("""
+        INSERT INTO artist_history (spotify_id, popularity)
+        SELECT spotify_id, popularity FROM seed_staging
+        WHERE spotify_id = ANY(%s)
+        RETURNING spotify_id, popularity
+    """, (inserted,))
+    ticks = cursor.fetchall()
+    apply_ticks(cursor, ticks)
+    record_daily_closes(cursor, ticks)
+    return len(inserted)
+
+
+def seed(sp, conn, queries=(), spotify_ids=(), pages=1, rate=REQUESTS_PER_SECOND,
+         workers=WORKERS, min_popularity=MIN_SEARCH_POPULARITY, chunk_size=LOAD_CHUNK):
+    """
+    Run the whole pipeline: collect new artists, then load them chunk by chunk.
+
+    Args:
+        sp: spotipy client
+        conn: Database connection (committed per chunk)
+        Remaining args as collect_artists; chunk_size artists per load transaction
+
+    Returns:
+        dict: collect stats plus inserted count and timings
+    """
+    cursor = conn.cursor()
+    try:
+        started = time.monotonic()
+        known = load_known_ids(cursor)
+        conn.commit()
+        artists, stats = collect_artists(sp, queries, spotify_ids, known, pages, rate, workers, min_popularity)
+        stats['collect_seconds'] = round(time.monotonic() - started, 1)
+        print(f"🔎 Collected {len(artists):,} new artists in {stats['collect_seconds']}s "
+              f"({stats['duplicates']:,} duplicates, {stats['known']:,} already seeded)")
+
+        started = time.monotonic()
+        stats['inserted'] = 0
+        pending = list(artists.values())
+        for i in range(0, len(pending), chunk_size):
+            stats['inserted'] += bulk_load(cursor, pending[i:i + chunk_size])
+            conn.commit()
+            print(f"💾 Loaded {min(i + chunk_size, len(pending)):,}/{len(pending):,} artists")
+        if stats['inserted']:
+            refresh_genre_facets(cursor)
+            rebuild_market_index(cursor)
+            conn.commit()
+        stats['load_seconds'] = round(time.monotonic() - started, 1)
+        return stats
+    finally:
+        cursor.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import psycopg2
+    from dotenv import load_dotenv
+    from spotify_client import make_spotify
+
+    parser = argparse.ArgumentParser(description="Seed the artist catalog from Spotify searches and ID lists")
+    parser.add_argument('--query', action='append', default=[], help="Search query (repeatable)")
+    parser.add_argument('--queries-file', help="File with one search query per line")
+    parser.add_argument('--ids-file', help="File with artist IDs, URIs or URLs, one per line")
+    parser.add_argument('--pages', type=int, default=1, help=f"Result pages of {SEARCH_PAGE} per query")
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, help="Spotify calls per second")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="Concurrent Spotify calls")
+    parser.add_argument('--min-popularity', type=int, default=MIN_SEARCH_POPULARITY,
+                        help="Skip searched artists below this popularity")
+    args = parser.parse_args()
+
+    queries = list(args.query)
+    if args.queries_file:
+        with open(args.queries_file) as f:
+            queries.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    spotify_ids = []
+    if args.ids_file:
+        with open(args.ids_file) as f:
+            spotify_ids = parse_artist_ids(f)
+    if not queries and not spotify_ids:
+        queries, spotify_ids = DEFAULT_QUERIES, DEFAULT_ARTIST_IDS
+
+    load_dotenv()
+    sp = make_spotify(os.getenv("SPOTIFY_CLIENT_ID"), os.getenv("SPOTIFY_CLIENT_SECRET"))
+    database_url = os.getenv("DATABASE_URL", "postgresql://localhost/anticip_db")
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+    conn = psycopg2.connect(database_url)
+
+    print(f"🎵 Seeding from {len(queries)} queries and {len(spotify_ids)} artist IDs "
+          f"({args.rate:g} calls/s, {args.workers} workers)")
+    try:
+        stats = seed(sp, conn, queries, spotify_ids, args.pages, args.rate, args.workers, args.min_popularity)
+    finally:
+        conn.close()
+    print(f"🎉 Added {stats['inserted']:,} artists "
+          f"(collect {stats['collect_seconds']}s, load {stats['load_seconds']}s, "
+          f"{stats['search_errors']} search errors, {stats['failed']} IDs not found)")
@@ -0,0 +1,40 @@
+"""
+Spotify client factory
+
+Every ingestion path builds its spotipy client here. Setting
+SPOTIFY_API_BASE points the client at another Web API host, such as
+the local stand-in in fake_spotify.py, instead of api.spotify.com; the
+stand-in accepts any bearer token, so no credentials are needed.
+"""
+import os
+
+import spotipy
+from spotipy.oauth2 import SpotifyClientCredentials
+
+
+# Token sent to a SPOTIFY_API_BASE host; the local stand-in ignores it
+LOCAL_TOKEN = 'local-token'
+
+
+def make_spotify(client_id=None, client_secret=None, **kwargs):
+    """
+    Build a spotipy client for the real Web API or SPOTIFY_API_BASE.
+
+    Args:
+        client_id: Spotify client id (defaults to SPOTIFY_CLIENT_ID)
+        client_secret: Spotify client secret (defaults to SPOTIFY_CLIENT_SECRET)
+        **kwargs: Passed through to spotipy.Spotify (retries, requests_timeout, ...)
+
+    Returns:
+        spotipy.Spotify: Configured client
+    """
+    api_base = os.getenv('SPOTIFY_API_BASE')
+    if api_base:
+        sp = spotipy.Spotify(auth=LOCAL_TOKEN, **kwargs)
+        sp.prefix = api_base.rstrip('/') + '/'
+        return sp
+
+    return spotipy.Spotify(auth_manager=SpotifyClientCredentials(
+        client_id=client_id or os.getenv("SPOTIFY_CLIENT_ID"),
+        client_secret=client_secret or os.getenv("SPOTIFY_CLIENT_SECRET")
+    ), **kwargs)
@@ -0,0 +1,148 @@
+"""
+Compact projection of Spotify track and album payloads
+
+Full Spotify track and album objects carry dozens of fields we never
+render, including ~180-entry available_markets arrays, which made
+spotify_data rows kilobytes of TOASTed JSONB that artist_detail and
+portfolio had to fetch and decompress. Only the fields the templates
+use are stored now, and spotify_data.payload_version records which
+shape a row holds:
+    1  raw Spotify objects (rows written before the projection)
+    2  PROJECTION_VERSION: the projection below
+
+compact_payloads rewrites older rows in batches; payload_sizes reports
+the stored bytes per version so the saving can be checked.
+"""
+from psycopg2.extras import Json, execute_values
+
+
+PROJECTION_VERSION = 2
+MIGRATION_BATCH = 500
+
+
+def _spotify_url(obj):
+    url = (obj.get('external_urls') or {}).get('spotify')
+    return {'spotify': url} if url else {}
+
+
+def project_track(track):
+    """Name, popularity, link and album name plus its smallest image (used by the track lists)"""
+    album = track.get('album') or {}
+    images = album.get('images') or []
+    return {
+        'name': track.get('name'),
+        'popularity': track.get('popularity'),
+        'external_urls': _spotify_url(track),
+        'album': {'name': album.get('name'), 'images': images[-1:]},
+    }
+
+
+def project_album(album):
+    """Name, release date, link and largest image (used by the album grid)"""
+    images = album.get('images') or []
+    return {
+        'name': album.get('name'),
+        'release_date': album.get('release_date') or '',
+        'external_urls': _spotify_url(album),
+        'images': images[:1],
+    }
+
+
+def project_tracks(tracks, limit=10):
+    return [project_track(track) for track in (tracks or [])[:limit]]
+
+
+def project_albums(albums, limit=5):
+    return [project_album(album) for album in (albums or [])[:limit]]
+
+
+def compact_payloads(conn, batch_size=MIGRATION_BATCH):
+    """
+    Rewrite rows stored before PROJECTION_VERSION into the compact shape.
+
+    Walks spotify_data in spotify_id order and commits after each batch,
+    so a large table is migrated without one long write transaction.
+
+    Args:
+        conn: Database connection (committed per batch)
+        batch_size: Rows per batch
+
+    Returns:
+        int: Number of rows rewritten
+    """
+    cursor = conn.cursor()
+    rewritten = 0
+    after = ''
+    try:
+        while True:
+            cursor.execute("""
+                SELECT spotify_id, top_tracks, recent_albums
+                FROM spotify_data
+                WHERE payload_version < %s AND spotify_id > %s
+                ORDER BY spotify_id
+                LIMIT %s
+            """, (PROJECTION_VERSION, after, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return rewritten
+            execute_values(cursor, f"""
+                UPDATE spotify_data sd
+                SET top_tracks = v.top_tracks, recent_albums = v.recent_albums,
+                    payload_version = {PROJECTION_VERSION}
+                FROM (VALUES %s) AS v(spotify_id, top_tracks, recent_albums)
+                WHERE sd.spotify_id = v.spotify_id
+            """, [
+                (spotify_id, Json(project_tracks(top_tracks)), Json(project_albums(recent_albums)))
+                for spotify_id, top_tracks, recent_albums in rows
+            ], template="(%s, %s::jsonb, %s::jsonb)")
+            conn.commit()
+            rewritten += len(rows)
+            after = rows[-1][0]
+    finally:
+        cursor.close()
+
+
+def payload_sizes(cursor):
+    """
+    Stored size of the track and album payloads per payload version.
+
+    Returns:
+        list: dicts with version, rows, and average top_tracks and
+            recent_albums bytes (as stored, after compression)
+    """
+    cursor.execute("""
+        SELECT payload_version, COUNT(*),
+               COALESCE(AVG(pg_column_size(top_tracks)), 0),
+               COALESCE(AVG(pg_column_size(recent_albums)), 0)
+        FROM spotify_data
+        GROUP BY payload_version
+        ORDER BY payload_version
+    """)
+    return [{'version': version, 'rows': rows, 'top_tracks_bytes': round(float(tracks)),
+             'recent_albums_bytes': round(float(albums))}
+            for version, rows, tracks, albums in cursor.fetchall()]
+
+
+if __name__ == '__main__':
+    import os
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL", "postgresql://localhost/anticip_db")
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+    conn = psycopg2.connect(database_url)
+    cursor = conn.cursor()
+    try:
+        for stats in payload_sizes(cursor):
+            print(f"📦 v{stats['version']}: {stats['rows']:,} rows, {stats['top_tracks_bytes']:,} B tracks, "
+                  f"{stats['recent_albums_bytes']:,} B albums per row")
+        rewritten = compact_payloads(conn)
+        print(f"✅ Compacted {rewritten:,} spotify_data rows")
+        for stats in payload_sizes(cursor):
+            print(f"📦 v{stats['version']}: {stats['rows']:,} rows, {stats['top_tracks_bytes']:,} B tracks, "
+                  f"{stats['recent_albums_bytes']:,} B albums per row")
+    finally:
+        cursor.close()
+        conn.close()
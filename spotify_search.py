@@ -0,0 +1,201 @@
+"""
+Cached Spotify artist search for /add_artist
+
+Lookups are keyed by the normalized query (case, accents and spacing
+folded, as in autocomplete) and kept per worker in a bounded LRU:
+results live for SEARCH_TTL seconds, empty results for the shorter
+NEGATIVE_TTL so a typo does not cost an API call on every retry.
+
+Calls to Spotify go through a circuit breaker. Errors, rate limiting
+(429) and calls slower than SLOW_CALL_SECONDS count as failures; after
+FAILURE_THRESHOLD in a row the breaker opens for OPEN_SECONDS (or the
+Retry-After Spotify sent), and while it is open or a call fails,
+expired entries up to STALE_TTL old are served instead of an error.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from autocomplete import normalize
+
+
+SEARCH_TTL = 6 * 3600
+NEGATIVE_TTL = 10 * 60
+STALE_TTL = 7 * 24 * 3600
+MAX_ENTRIES = 5000
+
+FAILURE_THRESHOLD = 3
+OPEN_SECONDS = 30
+SLOW_CALL_SECONDS = 2.0
+
+# Statuses the search client lets urllib3 handle. A status in the list is
+# reported by spotipy as a header-less 429 once retries run out, so 429
+# itself must be absent for Retry-After to reach the breaker (an empty
+# list would fall back to spotipy's defaults, which include 429)
+SEARCH_STATUS_FORCELIST = (500, 502, 503, 504)
+
+
+class SearchUnavailable(Exception):
+    """Spotify is failing and there is no cached result to fall back on"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open trial call"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, open_seconds=OPEN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.failures < self.failure_threshold:
+            return 'closed'
+        return 'open' if time.monotonic() < self.open_until else 'half-open'
+
+    def allow(self):
+        """Whether a call may go through now (one trial at a time once the open period ends)"""
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.trial_running = False
+
+    def record_failure(self, retry_after=None):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if retry_after is not None:
+                self.failures = max(self.failures, self.failure_threshold)
+            if self.failures >= self.failure_threshold:
+                self.open_until = time.monotonic() + (retry_after or self.open_seconds)
+
+
+class SearchCache:
+    """LRU of normalized query -> (artists, stored_at, expires_at)"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.metrics = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'stale_served': 0,
+                        'evictions': 0, 'errors': 0, 'rejected': 0}
+
+    def count(self, metric):
+        with self.lock:
+            self.metrics[metric] += 1
+
+    def get(self, key, now, allow_stale=False):
+        """Cached artists for key, or None when missing or expired (unless allow_stale)"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            artists, stored_at, expires_at = entry
+            if now < expires_at or (allow_stale and now - stored_at < STALE_TTL):
+                self.entries.move_to_end(key)
+                return artists
+            return None
+
+    def put(self, key, artists, now):
+        ttl = SEARCH_TTL if artists else NEGATIVE_TTL
+        with self.lock:
+            self.entries[key] = (artists, now, now + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.metrics['evictions'] += 1
+
+
+_cache = SearchCache()
+_breaker = CircuitBreaker()
+
+
+def _retry_after(error):
+    """
+    Retry-After seconds from a spotipy 429, else None.
+
+    The header is only present when the client was built with
+    SEARCH_STATUS_FORCELIST; a 429 from exhausted retries has none, and
+    the breaker then opens for OPEN_SECONDS.
+    """
+    if getattr(error, 'http_status', None) != 429:
+        return None
+    # spotipy reports every exhausted retry as a 429; only real ones say so
+    if '429' not in str(getattr(error, 'reason', None) or '429'):
+        return None
+    headers = getattr(error, 'headers', None) or {}
+    try:
+        return max(1, int(headers.get('Retry-After', OPEN_SECONDS)))
+    except (TypeError, ValueError):
+        return OPEN_SECONDS
+
+
+def search_artists(sp, query, limit=5):
+    """
+    Search Spotify artists through the cache and circuit breaker.
+
+    Args:
+        sp: spotipy client (ideally without internal retries and with
+            SEARCH_STATUS_FORCELIST, so a 429 and its Retry-After reach
+            the breaker instead of sleeping in the request)
+        query: Artist name as typed
+        limit: Number of results
+
+    Returns:
+        list: Spotify artist objects
+
+    Raises:
+        SearchUnavailable: If Spotify is failing and nothing is cached
+    """
+    key = (normalize(query), limit)
+    now = time.time()
+    artists = _cache.get(key, now)
+    if artists is not None:
+        _cache.count('hits' if artists else 'negative_hits')
+        return artists
+    _cache.count('misses')
+
+    if _breaker.allow():
+        started = time.monotonic()
+        try:
+            artists = sp.search(q=query, type='artist', limit=limit)['artists']['items']
+        except Exception as e:
+            _breaker.record_failure(_retry_after(e))
+            _cache.count('errors')
+        else:
+            if time.monotonic() - started > SLOW_CALL_SECONDS:
+                _breaker.record_failure()
+            else:
+                _breaker.record_success()
+            _cache.put(key, artists, now)
+            return artists
+    else:
+        _cache.count('rejected')
+
+    stale = _cache.get(key, now, allow_stale=True)
+    if stale is not None:
+        _cache.count('stale_served')
+        return stale
+    raise SearchUnavailable("Spotify search is temporarily unavailable, please try again shortly")
+
+
+def search_stats():
+    """Cache hit/miss counters plus size and breaker state"""
+    with _cache.lock:
+        stats = dict(_cache.metrics, entries=len(_cache.entries))
+    lookups = stats['hits'] + stats['negative_hits'] + stats['misses']
+    stats['hit_rate'] = round((stats['hits'] + stats['negative_hits']) / lookups, 3) if lookups else None
+    stats['breaker'] = _breaker.state
+    return stats
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Checks for the in-memory artist autocomplete index (autocomplete.AutocompleteIndex).
+"""
+import pytest
+
+import autocomplete
+from autocomplete import AutocompleteIndex, normalize
+
+
+ARTISTS = [
+    ('sp0', 'Taylor Swift', 'img0'),
+    ('sp1', 'Swans', 'img1'),
+    ('sp2', 'Sigur Rós', 'img2'),
+    ('sp3', 'The Swell Season', 'img3'),
+    ('sp4', 'Beyoncé', 'img4'),
+    ('sp5', 'Swift Swift', 'img5'),
+]
+POPULARITY = [95, 40, 60, 30, -1, 10]
+
+
+@pytest.fixture
+def index():
+    return AutocompleteIndex(1, 'v1', ARTISTS, POPULARITY)
+
+
+def _names(results):
+    return [result['name'] for result in results]
+
+
+def test_normalize_folds_case_accents_and_spacing():
+    assert normalize('  Sigur   RÓS ') == 'sigur ros'
+
+
+def test_prefix_matches_name_and_later_words_by_popularity(index):
+    assert _names(index.search('swi')) == ['Taylor Swift', 'Swift Swift']
+    assert _names(index.search('sw')) == ['Taylor Swift', 'Swans', 'The Swell Season', 'Swift Swift']
+
+
+def test_accented_names_match_unaccented_queries(index):
+    assert _names(index.search('ros')) == ['Sigur Rós']
+    assert _names(index.search('BEYONCE')) == ['Beyoncé']
+
+
+def test_artist_with_several_matching_keys_appears_once(index):
+    assert _names(index.search('swift')) == ['Taylor Swift', 'Swift Swift']
+
+
+def test_limit_and_unquoted_popularity(index):
+    assert len(index.search('s', limit=2)) == 2
+    assert index.search('bey')[0]['popularity'] is None
+
+
+def test_no_match_and_blank_query(index):
+    assert index.search('zzz') == []
+    assert index.search('   ') == []
+
+
+def test_reprice_reorders_without_rebuilding(index):
+    keys = index.keys
+    index.reprice('v2', [10, 90, 60, 30, -1, 10])
+    assert index.keys is keys
+    assert _names(index.search('sw'))[0] == 'Swans'
+
+
+def test_memoized_wide_ranges_match_direct_search(index, monkeypatch):
+    direct = index.search('s')
+    monkeypatch.setattr(autocomplete, 'MEMO_RANGE', 0)
+    assert index.search('s') == direct
+    assert index.search('s') == direct
+    assert ('s', autocomplete.DEFAULT_LIMIT) in index._memo
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-v']))
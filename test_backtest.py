@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Checks for the strategy backtesting engine (backtest.run_backtest).
+"""
+from datetime import date
+
+import numpy as np
+import pytest
+
+from backtest import PriceMatrix, run_backtest, run_strategy
+
+
+NAN = np.nan
+
+
+@pytest.fixture
+def matrix():
+    # Artist C is first quoted on day 2, so it cannot be scored before day 3
+    prices = np.array([
+        [10, 50, NAN],
+        [10, 40, NAN],
+        [20, 30, 5],
+        [20, 20, 6],
+        [40, 10, 9],
+    ], dtype=np.float32)
+    return PriceMatrix('v1', date(2026, 1, 1), ['a', 'b', 'c'], ['A', 'B', 'C'], prices)
+
+
+def test_risers(matrix):
+    result = run_backtest(matrix, 'risers', count=1, lookback=1, rebalance_every=2,
+                          days=4, initial_points=100)
+
+    # Day 1: A (flat) beats B (falling): 10 shares at 10.
+    # Day 3: sell A at 20 for 200, buy C (+1): 33 shares at 6, 2 points left over
+    assert result['dates'] == ['2026-01-02', '2026-01-03', '2026-01-04', '2026-01-05']
+    assert result['equity'] == [100.0, 200.0, 200.0, 299.0]
+    assert result['total_return'] == pytest.approx(1.99)
+    assert result['max_drawdown'] == 0.0
+    assert result['trades'] == 3
+    assert result['holdings'] == [('c', 'C', 33)]
+
+
+def test_fallers_drawdown(matrix):
+    result = run_backtest(matrix, 'fallers', count=1, lookback=1, rebalance_every=2,
+                          days=4, initial_points=100)
+
+    # B both times: 2 shares at 40 (20 cash), then 3 shares at 20
+    assert result['equity'] == [100.0, 80.0, 60.0, 30.0]
+    assert result['max_drawdown'] == pytest.approx(-0.7)
+    assert result['holdings'] == [('b', 'B', 3)]
+
+
+def test_popular_splits_points_across_picks(matrix):
+    result = run_backtest(matrix, 'popular', count=2, lookback=1, rebalance_every=10,
+                          days=4, initial_points=100)
+
+    # C is unquoted on day 1, so A and B get 50 points each: 5 at 10, 1 at 40
+    assert sorted(result['holdings']) == [('a', 'A', 5), ('b', 'B', 1)]
+    assert result['equity'][0] == 100.0
+
+
+def test_window_is_clipped_to_the_lookback(matrix):
+    result = run_strategy(matrix, {'lookback': 3, 'days': 365, 'initial_points': 100})
+    assert len(result['dates']) == 2
+
+
+def test_not_enough_history(matrix):
+    with pytest.raises(ValueError):
+        run_backtest(matrix, lookback=5)
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-v']))
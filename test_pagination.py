@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Checks for keyset pagination cursors (pagination.py).
+"""
+from decimal import Decimal
+
+import pytest
+
+from pagination import encode_cursor, decode_cursor
+
+
+def test_round_trip():
+    token = encode_cursor((12, 3456))
+    assert decode_cursor(token, (int, int)) == (12, 3456)
+
+
+def test_round_trip_of_non_json_types():
+    token = encode_cursor((Decimal('1234.50'), 'Sigur Rós', 7))
+    assert decode_cursor(token, (Decimal, str, int)) == (Decimal('1234.50'), 'Sigur Rós', 7)
+
+
+def test_token_is_url_safe():
+    token = encode_cursor(('?&/+= ' * 10, 1))
+    assert '=' not in token and '+' not in token and '/' not in token
+
+
+def test_first_page():
+    assert decode_cursor(None, (int, int)) is None
+    assert decode_cursor('', (int, int)) is None
+
+
+@pytest.mark.parametrize('token', [
+    'not a cursor!',
+    encode_cursor((1,)),
+    encode_cursor((1, 2, 3)),
+    encode_cursor(('abc', 1)),
+    encode_cursor({'rank': 1}),
+])
+def test_malformed_tokens_raise_value_error(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token, (int, int))
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-v']))
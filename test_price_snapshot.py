@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Checks for the shared-memory price snapshot file (price_snapshot.py).
+"""
+from datetime import datetime
+
+import pytest
+
+from price_snapshot import PriceSnapshot, publish_snapshot, _remap, HEADER_SIZE
+
+
+class FakeCursor:
+    """Returns canned (spotify_id, popularity, quoted_at us) rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+
+QUOTED_AT = datetime(2026, 10, 18, 6, 0, 0)
+QUOTED_US = int((QUOTED_AT - datetime(1970, 1, 1)).total_seconds()) * 1000000
+
+ROWS = [
+    ('4Z8W4fKeB5YxbusRsdQVPb', 71, QUOTED_US),
+    ('06HL4z0CvFAxyc27GXpf02', 100, QUOTED_US + 5000000),
+    ('short', 0, 0),
+    ('0du5cEVh5yTK9QJze8zA0C', 88, QUOTED_US - 7000000),
+]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = tmp_path / 'prices.snap'
+    assert publish_snapshot(FakeCursor(ROWS), str(path)) == len(ROWS)
+    return PriceSnapshot(str(path))
+
+
+def test_header_round_trip(snapshot):
+    assert len(snapshot) == len(ROWS)
+    assert snapshot.id_width == 22
+    assert snapshot.quoted_through == QUOTED_US + 5000000
+
+
+def test_ids_are_sorted_and_sections_aligned(snapshot):
+    assert list(snapshot.ids) == sorted(row[0].encode() for row in ROWS)
+    for section in (snapshot.ids, snapshot.popularity, snapshot.quoted_at):
+        offset = section.__array_interface__['data'][0] - snapshot.ids.__array_interface__['data'][0]
+        assert (HEADER_SIZE + offset) % 8 == 0
+
+
+def test_quotes_round_trip(snapshot):
+    assert snapshot.quote('4Z8W4fKeB5YxbusRsdQVPb') == (71, QUOTED_AT)
+    assert snapshot.quote('short') == (0, None)
+    assert snapshot.popularity_of('06HL4z0CvFAxyc27GXpf02') == 100
+    assert snapshot.quote('missing') is None
+    assert snapshot.quote('x' * 40) is None
+
+
+def test_bulk_lookups_match_single_lookups(snapshot):
+    ids = [row[0] for row in ROWS] + ['missing', '4Z8W4fKeB5YxbusRsdQVPbX']
+    assert snapshot.popularity_array(ids).tolist() == [71, 100, 0, 88, -1, -1]
+    assert snapshot.quotes(ids) == {row[0]: snapshot.quote(row[0]) for row in ROWS}
+
+
+def test_empty_snapshot(tmp_path):
+    path = tmp_path / 'empty.snap'
+    publish_snapshot(FakeCursor([]), str(path))
+    snapshot = PriceSnapshot(str(path))
+    assert len(snapshot) == 0
+    assert snapshot.quote('anything') is None
+    assert snapshot.popularity_array(['a']).tolist() == [-1]
+
+
+def test_remap_picks_up_a_republished_file(tmp_path):
+    path = str(tmp_path / 'prices.snap')
+    publish_snapshot(FakeCursor(ROWS), path)
+    first = _remap(None, path)
+    assert _remap(first, path) is first
+
+    publish_snapshot(FakeCursor(ROWS[:1]), path)
+    second = _remap(first, path)
+    assert second is not first and len(second) == 1
+    # The old map stays readable for requests still holding it
+    assert first.popularity_of('06HL4z0CvFAxyc27GXpf02') == 100
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / 'bogus.snap'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        PriceSnapshot(str(path))
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-v']))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Checks for the staleness-driven Spotify refresh (refresh_scheduler.py)
+and the genre index moves it triggers (market_index.genre_moves).
+"""
+import pytest
+
+import refresh_scheduler
+from refresh_scheduler import refresh_stale
+from market_index import genre_moves
+
+
+class FakeCursor:
+    """Answers select_stale's query with canned (spotify_id, priority, due) rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.limit = None
+
+    def execute(self, query, params=None):
+        self.limit = params['limit']
+
+    def fetchall(self):
+        return self.rows[:self.limit]
+
+
+class FakeSpotify:
+    def __init__(self):
+        self.calls = []
+
+    def artist(self, spotify_id):
+        self.calls.append(('artist', spotify_id))
+        return {'id': spotify_id, 'genres': []}
+
+    def artist_top_tracks(self, spotify_id, country=None):
+        self.calls.append(('top_tracks', spotify_id))
+        return {'tracks': []}
+
+    def artist_albums(self, spotify_id, album_type=None, limit=None):
+        self.calls.append(('albums', spotify_id))
+        return {'items': []}
+
+
+@pytest.fixture
+def upserted(monkeypatch):
+    saved = []
+
+    def fake_upsert(cursor, bundles):
+        saved.extend(spotify_id for spotify_id, _ in bundles)
+        return []
+    monkeypatch.setattr(refresh_scheduler, 'upsert_spotify_data', fake_upsert)
+    return saved
+
+
+def _due(count):
+    return [(f'artist{i:03d}', float(count - i), count) for i in range(count)]
+
+
+def test_budget_cuts_off_selection(upserted):
+    sp = FakeSpotify()
+    # Unknown artists cost 3 calls each, so a budget of 10 fits three
+    stats = refresh_stale(sp, FakeCursor(_due(40)), budget=10)
+
+    assert stats['selected'] == 3
+    assert stats['calls'] == 9
+    assert len(sp.calls) == 9
+    assert upserted == ['artist000', 'artist001', 'artist002']
+
+
+def test_known_artists_cost_two_calls(upserted):
+    sp = FakeSpotify()
+    known = {f'artist{i:03d}': {'id': f'artist{i:03d}', 'genres': []} for i in range(40)}
+    stats = refresh_stale(sp, FakeCursor(_due(40)), budget=10, artists=known)
+
+    assert stats['selected'] == 5
+    assert stats['calls'] == 10
+    assert not any(kind == 'artist' for kind, _ in sp.calls)
+
+
+def test_due_counts_the_backlog_beyond_the_budget(upserted):
+    stats = refresh_stale(FakeSpotify(), FakeCursor(_due(40)), budget=10)
+
+    assert stats['due'] == 40
+    assert stats['refreshed'] == 3
+
+
+def test_nothing_due(upserted):
+    stats = refresh_stale(FakeSpotify(), FakeCursor([]), budget=10)
+
+    assert stats == {'due': 0, 'selected': 0, 'refreshed': 0, 'failed': 0, 'calls': 0,
+                     'genres_changed': 0}
+
+
+def test_genre_moves_only_changed_genres():
+    moves = genre_moves([
+        ('a', ['pop', 'rock'], ['rock', 'indie']),
+        ('b', None, ['jazz']),
+        ('c', ['metal'], ['metal']),
+    ])
+
+    assert moves == [('a', 'pop', -1), ('a', 'indie', 1), ('b', 'jazz', 1)]
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-v']))
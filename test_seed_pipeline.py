@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Checks for the seeding pipeline's input parsing and rate limiter (seed_pipeline.py).
+"""
+import pytest
+
+import seed_pipeline
+from seed_pipeline import RateLimiter, parse_artist_ids
+
+
+ID = '06HL4z0CvFAxyc27GXpf02'
+OTHER = '4Z8W4fKeB5YxbusRsdQVPb'
+
+
+def test_ids_uris_and_urls():
+    lines = [
+        f'{ID}\n',
+        f'spotify:artist:{OTHER}',
+        f'https://open.spotify.com/artist/{ID}?si=abc123',
+        f'https://open.spotify.com/intl-de/artist/{OTHER}',
+    ]
+    assert parse_artist_ids(lines) == [ID, OTHER, ID, OTHER]
+
+
+def test_comments_blanks_and_junk_are_skipped():
+    lines = ['# seed list', '', '   ', f'{ID}  # Taylor Swift', f'# {OTHER}',
+             'not an id', ID + 'X', ID[:-1]]
+    assert parse_artist_ids(lines) == [ID]
+
+
+class FakeClock:
+    """Stands in for time.monotonic/time.sleep; sleeping advances the clock"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(seed_pipeline.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(seed_pipeline.time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_rate_limiter_spaces_calls(clock):
+    limiter = RateLimiter(rate=4)
+    for _ in range(4):
+        limiter.wait()
+    assert clock.sleeps == [0.25, 0.25, 0.25]
+
+
+def test_rate_limiter_does_not_bank_idle_time(clock):
+    limiter = RateLimiter(rate=4)
+    limiter.wait()
+    clock.now += 10
+    limiter.wait()
+    limiter.wait()
+    assert clock.sleeps == [0.25]
+
+
+def test_unlimited_rate_never_sleeps(clock):
+    limiter = RateLimiter(rate=0)
+    for _ in range(5):
+        limiter.wait()
+    assert clock.sleeps == []
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-v']))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Checks for the compact Spotify track and album projection (spotify_projection.py).
+"""
+import pytest
+
+from spotify_projection import project_track, project_album, project_tracks, project_albums
+
+
+IMAGES = [
+    {'url': 'large', 'height': 640, 'width': 640},
+    {'url': 'medium', 'height': 300, 'width': 300},
+    {'url': 'small', 'height': 64, 'width': 64},
+]
+
+TRACK = {
+    'name': 'Hoppípolla',
+    'popularity': 62,
+    'available_markets': ['IS'] * 180,
+    'external_urls': {'spotify': 'https://open.spotify.com/track/t1'},
+    'album': {'name': 'Takk...', 'images': IMAGES, 'available_markets': ['IS'] * 180},
+    'duration_ms': 268000,
+}
+
+ALBUM = {
+    'name': 'Takk...',
+    'release_date': '2005-09-12',
+    'available_markets': ['IS'] * 180,
+    'external_urls': {'spotify': 'https://open.spotify.com/album/a1'},
+    'images': IMAGES,
+    'total_tracks': 11,
+}
+
+
+def test_track_keeps_the_template_fields_and_smallest_image():
+    assert project_track(TRACK) == {
+        'name': 'Hoppípolla',
+        'popularity': 62,
+        'external_urls': {'spotify': 'https://open.spotify.com/track/t1'},
+        'album': {'name': 'Takk...', 'images': [IMAGES[-1]]},
+    }
+
+
+def test_album_keeps_the_template_fields_and_largest_image():
+    assert project_album(ALBUM) == {
+        'name': 'Takk...',
+        'release_date': '2005-09-12',
+        'external_urls': {'spotify': 'https://open.spotify.com/album/a1'},
+        'images': [IMAGES[0]],
+    }
+
+
+def test_missing_fields():
+    assert project_track({'name': 'x'}) == {
+        'name': 'x', 'popularity': None, 'external_urls': {}, 'album': {'name': None, 'images': []},
+    }
+    assert project_album({'name': 'y', 'release_date': None, 'external_urls': None}) == {
+        'name': 'y', 'release_date': '', 'external_urls': {}, 'images': [],
+    }
+
+
+def test_projection_is_idempotent():
+    assert project_track(project_track(TRACK)) == project_track(TRACK)
+    assert project_album(project_album(ALBUM)) == project_album(ALBUM)
+
+
+def test_list_limits_and_none():
+    assert len(project_tracks([TRACK] * 12)) == 10
+    assert len(project_albums([ALBUM] * 7)) == 5
+    assert len(project_tracks([TRACK] * 3, limit=2)) == 2
+    assert project_tracks(None) == []
+    assert project_albums(None) == []
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-v']))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Checks for the Spotify search circuit breaker and Retry-After handling (spotify_search.py).
+"""
+import pytest
+from spotipy import SpotifyException
+
+import spotify_search
+from spotify_search import CircuitBreaker, OPEN_SECONDS, _retry_after
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic for the breaker"""
+    now = [1000.0]
+    monkeypatch.setattr(spotify_search.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, open_seconds=30)
+    for _ in range(2):
+        breaker.record_failure()
+        assert breaker.state == 'closed'
+        assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+
+def test_success_resets_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, open_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+
+def test_half_open_allows_a_single_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=30)
+    breaker.record_failure()
+    clock[0] += 31
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # A failed trial reopens the breaker for another open period
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    clock[0] += 31
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow() and breaker.allow()
+
+
+def test_retry_after_opens_immediately_for_that_long(clock):
+    breaker = CircuitBreaker(failure_threshold=3, open_seconds=30)
+    breaker.record_failure(retry_after=120)
+    assert breaker.state == 'open'
+    clock[0] += 60
+    assert breaker.state == 'open'
+    clock[0] += 61
+    assert breaker.state == 'half-open'
+
+
+def test_retry_after_reads_the_header_of_a_real_429():
+    error = SpotifyException(429, -1, "rate limited", headers={'Retry-After': '17'})
+    assert _retry_after(error) == 17
+
+
+def test_retry_after_ignores_exhausted_retries_of_other_statuses():
+    error = SpotifyException(429, -1, "Max Retries", reason="too many 500 error responses")
+    assert _retry_after(error) is None
+    assert _retry_after(SpotifyException(500, -1, "server error")) is None
+
+
+def test_retry_after_without_header_falls_back_to_open_seconds():
+    error = SpotifyException(429, -1, "Max Retries", reason="too many 429 error responses")
+    assert _retry_after(error) == OPEN_SECONDS
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-v']))
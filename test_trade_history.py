@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Checks for keyset-paginated trade history (trade_history.get_trade_history_page).
+"""
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from pagination import decode_cursor
+from trade_history import get_trade_history_page, SORT_KEYS
+
+
+class FakeCursor:
+    """Records the query and returns canned transaction rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.query = None
+        self.params = None
+
+    def execute(self, query, params=None):
+        self.query = query
+        self.params = params
+
+    def fetchall(self):
+        return self.rows[:self.params[-1]]
+
+
+def _rows(count):
+    return [(100 - i, f'Artist {i}', None, f'sp{i}', 'buy', i + 1, Decimal('50.00'),
+             Decimal(i + 1) * 50, datetime(2026, 10, 1, 12, 0, i), 50)
+            for i in range(count)]
+
+
+@pytest.mark.parametrize('order', sorted(SORT_KEYS))
+def test_next_cursor_decodes_to_the_last_rows_sort_key(order):
+    rows = _rows(5)
+    page = get_trade_history_page(FakeCursor(rows), 1, order=order, limit=3)
+
+    assert len(page['trades']) == 3
+    last = rows[2]
+    expected = {'date': last[8], 'artist': last[1], 'shares': last[5], 'total_amount': last[7]}[order]
+    assert decode_cursor(page['next_cursor'], (SORT_KEYS[order][1], int)) == (expected, last[0])
+
+
+def test_last_page_has_no_cursor():
+    page = get_trade_history_page(FakeCursor(_rows(2)), 1, limit=3)
+    assert page['next_cursor'] is None
+    assert len(page['trades']) == 2
+
+
+@pytest.mark.parametrize('direction, comparison', [('asc', '>'), ('desc', '<')])
+def test_cursor_continues_in_the_sort_direction(direction, comparison):
+    first = get_trade_history_page(FakeCursor(_rows(5)), 1, order='shares', direction=direction, limit=3)
+    cursor = FakeCursor(_rows(5))
+    get_trade_history_page(cursor, 1, order='shares', direction=direction,
+                           cursor_token=first['next_cursor'], limit=3)
+
+    assert f"(t.shares, t.id) {comparison} (%s, %s)" in cursor.query
+    assert f"ORDER BY t.shares {direction}, t.id {direction}" in cursor.query
+    assert cursor.params == [1, 3, 98, 4]
+
+
+def test_unknown_sort_falls_back_to_newest_first():
+    cursor = FakeCursor([])
+    get_trade_history_page(cursor, 1, order='price; DROP TABLE users', direction='sideways')
+    assert "ORDER BY t.created_at desc, t.id desc" in cursor.query
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-v']))
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Checks for update run sharding (update_runs.py).
+
+shard_of and SHARD_SQL must agree, or shard runners and the merge step
+disagree about which artists a shard covers. The SQL twin is checked
+against Postgres when DATABASE_URL is set.
+"""
+import os
+import random
+import string
+
+import pytest
+
+from update_runs import shard_of, parse_shard, SHARD_SQL
+
+
+def _spotify_ids(count, seed=7):
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits
+    return [''.join(rng.choice(alphabet) for _ in range(22)) for _ in range(count)]
+
+
+def test_shard_of_is_stable_and_in_range():
+    for spotify_id in _spotify_ids(200):
+        for shard_count in (1, 2, 3, 8):
+            shard = shard_of(spotify_id, shard_count)
+            assert 0 <= shard < shard_count
+            assert shard == shard_of(spotify_id, shard_count)
+
+
+def test_shard_of_spreads_artists():
+    counts = [0] * 4
+    for spotify_id in _spotify_ids(4000):
+        counts[shard_of(spotify_id, 4)] += 1
+    assert min(counts) > 800
+
+
+def test_shard_of_matches_shard_sql():
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        pytest.skip("DATABASE_URL not set")
+    import psycopg2
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+
+    # Include an id whose hash has the top bit set, where a signed cast would differ
+    spotify_ids = _spotify_ids(500) + ['4Z8W4fKeB5YxbusRsdQVPb']
+    conn = psycopg2.connect(database_url)
+    try:
+        cursor = conn.cursor()
+        for shard_count in (1, 2, 3, 7):
+            cursor.execute(f"""
+                SELECT spotify_id, {SHARD_SQL.format(spotify_id='spotify_id', shard_count='%s')}
+                FROM unnest(%s::varchar[]) AS t(spotify_id)
+            """, (shard_count, spotify_ids))
+            for spotify_id, shard in cursor.fetchall():
+                assert shard == shard_of(spotify_id, shard_count), (spotify_id, shard_count)
+    finally:
+        conn.close()
+
+
+def test_parse_shard_accepts_valid_specs():
+    assert parse_shard('0/1') == (0, 1)
+    assert parse_shard('2/3') == (2, 3)
+
+
+@pytest.mark.parametrize('spec', ['', '1', '3/3', '-1/2', '0/0', '1/-2', 'a/2', '1/b', '1/2/3'])
+def test_parse_shard_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_shard(spec)
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-v']))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Checks for the vectorized valuation engine (valuations.compute_valuations).
+"""
+import numpy as np
+import pytest
+
+from valuations import compute_valuations
+
+
+def _positions(rows):
+    user_ids, artist_ids, shares, avg_cost = zip(*rows)
+    return {
+        'user_ids': np.array(user_ids, dtype=np.int64),
+        'artist_ids': np.array(artist_ids, dtype=np.int64),
+        'shares': np.array(shares, dtype=np.float64),
+        'avg_cost': np.array(avg_cost, dtype=np.float64),
+    }
+
+
+def test_values_match_per_position_sums():
+    user_ids = np.array([1, 4, 9], dtype=np.int64)
+    prices = np.array([0.0, 50.0, 80.0, 20.0])
+    positions = _positions([
+        (1, 1, 10, 40.0),
+        (1, 3, 5, 25.0),
+        (9, 2, 2, 90.0),
+    ])
+
+    valuations = compute_valuations(user_ids, positions, prices)
+
+    assert valuations['invested'].tolist() == [10 * 50 + 5 * 20, 0, 2 * 80]
+    assert valuations['cost'].tolist() == [10 * 40 + 5 * 25, 0, 2 * 90]
+    assert valuations['gain'].tolist() == [600 - 525, 0, 160 - 180]
+    assert valuations['positions'].tolist() == [2, 0, 1]
+
+
+def test_positions_of_unknown_users_are_dropped():
+    # Users 2 and 12 were not loaded (e.g. created after load_users)
+    user_ids = np.array([1, 5], dtype=np.int64)
+    prices = np.array([0.0, 10.0])
+    positions = _positions([
+        (1, 1, 1, 10.0),
+        (2, 1, 3, 10.0),
+        (5, 1, 4, 10.0),
+        (12, 1, 7, 10.0),
+    ])
+
+    valuations = compute_valuations(user_ids, positions, prices)
+
+    assert len(valuations['invested']) == len(user_ids)
+    assert valuations['invested'].tolist() == [10.0, 40.0]
+    assert valuations['positions'].tolist() == [1, 1]
+
+
+def test_no_positions():
+    user_ids = np.array([1, 2], dtype=np.int64)
+    positions = {key: np.empty(0, dtype=dtype) for key, dtype in
+                 (('user_ids', np.int64), ('artist_ids', np.int64),
+                  ('shares', np.float64), ('avg_cost', np.float64))}
+
+    valuations = compute_valuations(user_ids, positions, np.zeros(1))
+
+    assert valuations['invested'].tolist() == [0.0, 0.0]
+    assert valuations['positions'].tolist() == [0, 0]
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-v']))
@@ -0,0 +1,142 @@
+"""
+Trade history pagination and daily closing popularity
+
+artist_daily_close keeps one row per artist per day holding the last
+popularity recorded that day, so trade history can show the day's
+popularity through a primary-key lookup instead of scanning
+artist_history by DATE(recorded_at).
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from psycopg2.extras import execute_values
+
+from pagination import encode_cursor, decode_cursor
+
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# sort key -> (SQL column, cursor value converter)
+SORT_KEYS = {
+    'date': ('t.created_at', datetime.fromisoformat),
+    'artist': ('a.name', str),
+    'shares': ('t.shares', int),
+    'total_amount': ('t.total_amount', Decimal),
+}
+
+SORT_DIRECTIONS = ('asc', 'desc')
+
+
+def record_daily_closes(cursor, ticks):
+    """
+    Record a tick's popularity as today's close for each artist.
+
+    Args:
+        cursor: Database cursor
+        ticks: Iterable of (spotify_id, popularity) tuples
+    """
+    ticks = dict(ticks)
+    if not ticks:
+        return
+    execute_values(cursor, """
+        INSERT INTO artist_daily_close (spotify_id, day, popularity)
+        VALUES %s
+        ON CONFLICT (spotify_id, day) DO UPDATE SET popularity = EXCLUDED.popularity
+    """, list(ticks.items()), template="(%s, CURRENT_DATE, %s)", page_size=5000)
+
+
+def backfill_daily_closes(cursor):
+    """Derive daily closes from artist_history for days not yet recorded"""
+    cursor.execute("""
+        INSERT INTO artist_daily_close (spotify_id, day, popularity)
+        SELECT DISTINCT ON (spotify_id, recorded_at::date)
+               spotify_id, recorded_at::date, popularity
+        FROM artist_history
+        WHERE recorded_at IS NOT NULL
+        ORDER BY spotify_id, recorded_at::date, recorded_at DESC
+        ON CONFLICT (spotify_id, day) DO NOTHING
+    """)
+    return cursor.rowcount
+
+
+def get_trade_history_page(cursor, user_id, order='date', direction='desc',
+                           cursor_token=None, limit=PAGE_SIZE):
+    """
+    Fetch one keyset-paginated page of a user's transactions.
+
+    Sorting is applied in SQL on a whitelisted key with the transaction id
+    as tie-breaker; unknown keys fall back to date, newest first.
+
+    Args:
+        cursor: Database cursor
+        user_id: Owner of the transactions
+        order: One of SORT_KEYS
+        direction: 'asc' or 'desc'
+        cursor_token: next_cursor from the previous page, or None
+        limit: Page size (capped at MAX_PAGE_SIZE)
+
+    Returns:
+        dict: trades and next_cursor (None on the last page)
+
+    Raises:
+        ValueError: If cursor_token is malformed
+    """
+    if order not in SORT_KEYS:
+        order = 'date'
+    if direction not in SORT_DIRECTIONS:
+        direction = 'desc'
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    column, converter = SORT_KEYS[order]
+    after = decode_cursor(cursor_token, (converter, int))
+
+    keyset = ""
+    params = [user_id]
+    if after:
+        comparison = '>' if direction == 'asc' else '<'
+        keyset = f"AND ({column}, t.id) {comparison} (%s, %s)"
+        params.extend(after)
+
+    cursor.execute(f"""
+        SELECT
+            t.id,
+            a.name,
+            a.image_url,
+            a.spotify_id,
+            t.transaction_type,
+            t.shares,
+            t.popularity_per_share,
+            t.total_amount,
+            t.created_at,
+            dc.popularity
+        FROM transactions t
+        JOIN artists a ON t.artist_id = a.id
+        LEFT JOIN artist_daily_close dc
+            ON dc.spotify_id = a.spotify_id AND dc.day = t.created_at::date
+        WHERE t.user_id = %s {keyset}
+        ORDER BY {column} {direction}, t.id {direction}
+        LIMIT %s
+    """, params + [limit + 1])
+    rows = cursor.fetchall()
+
+    trades = []
+    for row in rows[:limit]:
+        trades.append({
+            'id': row[0],
+            'artist_name': row[1],
+            'image_url': row[2],
+            'spotify_id': row[3],
+            'transaction_type': row[4],  # 'buy' or 'sell'
+            'shares': int(row[5]) if row[5] else 0,
+            'popularity_per_share': float(row[6]) if row[6] else 0.0,
+            'total_amount': float(row[7]) if row[7] else 0.0,
+            'created_at': row[8],
+            'popularity': int(row[9]) if row[9] else 0,
+        })
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        sort_value = {'date': last[8], 'artist': last[1], 'shares': last[5], 'total_amount': last[7]}[order]
+        next_cursor = encode_cursor((sort_value.isoformat() if order == 'date' else sort_value, last[0]))
+    return {'trades': trades, 'next_cursor': next_cursor}
@@ -3,114 +3,288 @@
 Daily Artist Popularity Updater
 Updates all artist popularity scores and price history from Spotify API
 Run this daily via Railway Cron Jobs or GitHub Actions
+
+Sharded across N runners:
+    python update_popularity.py --shard 0/4   (one per shard, in parallel)
+    python update_popularity.py --merge       (once, after every shard)
 """
 
+import argparse
 import os
+import sys
 import psycopg2
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
 from dotenv import load_dotenv
 import time
 from datetime import datetime
 
+from spotify_client import make_spotify
+from conditional_orders import evaluate_conditional_orders
+from valuations import apply_ticks, rebuild_valuations
+from leaderboard import refresh_leaderboard
+from genre_facets import refresh_genre_facets
+from movers import refresh_movers
+from market_index import record_index_points
+from artist_enrichment import retry_pending_enrichment
+from refresh_scheduler import fetch_artists, refresh_stale, ARTISTS_PER_CALL
+from trade_history import record_daily_closes
+from portfolio_replay import checkpoint_if_due
+from update_runs import (start_run, pending_artists, record_batch, mark_fetched, ready_shard_runs,
+                         run_ticks, finish_runs, release_runs, parse_shard)
+
 # Load environment variables
 load_dotenv()
 
-# Spotify setup
-client_id = os.getenv("SPOTIFY_CLIENT_ID")
-client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
-sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-    client_id=client_id,
-    client_secret=client_secret
-))
-
-# Database setup
-database_url = os.getenv("DATABASE_URL")
-if database_url:
-    # Convert postgres:// to postgresql://
-    if database_url.startswith("postgres://"):
-        database_url = database_url.replace("postgres://", "postgresql://", 1)
-    conn = psycopg2.connect(database_url)
-else:
-    # Local fallback
-    conn = psycopg2.connect(
-        dbname="anticip_db",
-        user="stephencoan",
-        password="",
-        host="localhost"
-    )
-
-cursor = conn.cursor()
-
-def update_artist_popularity(spotify_id, name):
-    """Update a single artist's popularity from Spotify"""
+# Seconds between Spotify requests (0 against a local stand-in)
+request_interval = float(os.getenv("SPOTIFY_REQUEST_INTERVAL", "0.3"))
+
+
+def run_update(sp, conn, shard_index=0, shard_count=1, merge=False):
+    """
+    Fetch popularity for every artist (or one shard) and apply the tick.
+
+    Also run in-process by the app's scheduler (see job_scheduler.py).
+
+    Args:
+        sp: spotipy client
+        conn: Database connection (committed step by step)
+        shard_index, shard_count: Shard to fetch; a shard stops once fetched
+        merge: Apply a finished sharded round instead of fetching
+
+    Returns:
+        int: Process exit code (1 if the round could not be merged or
+            the tick could not be applied)
+    """
+    sharded = shard_count > 1
+    cursor = conn.cursor()
+
+    print("=" * 70)
+    print("ANTICIP DAILY POPULARITY UPDATER")
+    print("=" * 70)
+    print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    db_target = "Production (Railway)" if 'railway' in conn.dsn.lower() else "Local Database"
+    print(f"Target: {db_target}")
+    print("=" * 70)
+
+    if merge:
+        # Every shard of the round must have fetched before anything is applied
+        run_ids, problems = ready_shard_runs(cursor)
+        conn.commit()
+        if not run_ids:
+            for problem in problems:
+                print(f"✗ Cannot merge: {problem}")
+            cursor.close()
+            return 1
+        print(f"🔀 Merging update runs {', '.join(f'#{run_id}' for run_id in run_ids)}")
+        ticks = run_ticks(cursor, run_ids)
+        print(f"\nMerged {len(ticks)} artist ticks from {len(run_ids)} shards")
+    else:
+        # Resume an unfinished run, skipping artists it already checkpointed
+        run_id, resumed = start_run(cursor, shard_index, shard_count)
+        conn.commit()
+        if run_id is None:
+            print("⏭️  Another updater is working on the current run, exiting")
+            cursor.close()
+            return 0
+        shard_label = f" (shard {shard_index}/{shard_count})" if sharded else ""
+        print(f"{'🔁 Resuming' if resumed else '🆕 Starting'} update run #{run_id}{shard_label}")
+        run_ids = [run_id]
+
+        artists = pending_artists(cursor, run_id)
+
+        print(f"\nFound {len(artists)} artists to update\n")
+
+        updated = 0
+        failed = 0
+
+        # One batched sp.artists call per batch; each batch commits its history and checkpoints together
+        for start in range(0, len(artists), ARTISTS_PER_CALL):
+            batch = artists[start:start + ARTISTS_PER_CALL]
+            fetched, missing = fetch_artists(sp, [spotify_id for spotify_id, _ in batch])
+            batch_ticks = [(spotify_id, fetched[spotify_id]['popularity'])
+                           for spotify_id, _ in batch if spotify_id in fetched]
+            try:
+                record_batch(cursor, run_id, batch_ticks, missing)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"✗ Error checkpointing batch at {start}: {e}")
+                failed += len(batch)
+                continue
+
+            for i, (spotify_id, name) in enumerate(batch, start + 1):
+                if spotify_id in fetched:
+                    updated += 1
+                    print(f"[{i}/{len(artists)}] {name} ✓ Popularity: {fetched[spotify_id]['popularity']}")
+                else:
+                    failed += 1
+                    print(f"[{i}/{len(artists)}] {name} ✗ Failed")
+
+            # Rate limiting: wait between requests to avoid hitting Spotify API limits
+            if start + ARTISTS_PER_CALL < len(artists):
+                time.sleep(request_interval)  # 300ms default = ~3 requests/second
+
+        # Ticks from earlier attempts of this run are applied too
+        ticks = run_ticks(cursor, run_ids)
+        avg_popularity = sum(popularity for _, popularity in ticks) / len(ticks) if ticks else 0
+
+        print("\n" + "=" * 70)
+        print("UPDATE COMPLETE")
+        print("=" * 70)
+        print(f"✓ Successfully updated: {updated} artists")
+        if resumed:
+            print(f"🔁 Carried over from earlier attempts: {len(ticks) - updated} artists")
+        print(f"✗ Failed: {failed} artists")
+        print(f"📊 Average popularity: {avg_popularity:.1f}")
+
+        # Shards stop here; the merge step applies every shard's ticks once
+        if sharded:
+            mark_fetched(cursor, run_id)
+            conn.commit()
+            release_runs(cursor, run_ids)
+            print(f"📦 Shard {shard_index}/{shard_count} fetched; run --merge once every shard has finished")
+            cursor.close()
+            return 0
+
+    # Move artist quotes and revalue every holder by shares x delta-popularity
+    try:
+        apply_ticks(cursor, ticks)
+        record_daily_closes(cursor, ticks)
+        charted = record_index_points(cursor)
+        conn.commit()
+        print(f"💰 Revalued holdings for {len(ticks)} artist quotes")
+        print(f"📉 Recorded {charted} market index points")
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Error applying popularity tick to valuations: {e}")
+        # Nothing downstream may run on unapplied quotes; the run stays open
+        # so the next start (or --merge) applies its checkpointed ticks
+        release_runs(cursor, run_ids)
+        conn.commit()
+        cursor.close()
+        return 1
+
+    # Evaluate stop-loss / take-profit orders against this tick
+    order_stats = evaluate_conditional_orders(conn, ticks)
+    print(f"🎯 Conditional orders: {order_stats['fired']} fired, "
+          f"{order_stats['executed']} executed, {order_stats['cancelled']} cancelled, "
+          f"{order_stats['failed']} failed")
+
+    # Nightly full revaluation repairs any drift in the incremental summaries
+    try:
+        revalued = rebuild_valuations(cursor)
+        conn.commit()
+        print(f"🧮 Reconciled valuations for {revalued} users")
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Error reconciling valuations: {e}")
+
+    # Re-rank the leaderboard against the new net worths
+    try:
+        reranked = refresh_leaderboard(cursor)
+        conn.commit()
+        print(f"🏆 Leaderboard refreshed ({reranked} rows changed)")
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Error refreshing leaderboard: {e}")
+
+    # Quote deferred adds whose background enrichment was lost
+    try:
+        enriched = retry_pending_enrichment(sp, conn)
+        if enriched:
+            print(f"➕ Enriched {enriched} pending artists")
+    except Exception as e:
+        print(f"✗ Error enriching pending artists: {e}")
+
+    # Refresh top tracks and albums for the most overdue artists within the API budget
+    try:
+        refreshed = refresh_stale(sp, cursor)
+        conn.commit()
+        print(f"🎵 Refreshed tracks/albums for {refreshed['refreshed']} of {refreshed['due']} due artists "
+              f"({refreshed['calls']} calls, {refreshed['genres_changed']} genre changes)")
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Error refreshing stale Spotify data: {e}")
+
+    # Recount genre facets for the artist browser
+    try:
+        refresh_genre_facets(cursor)
+        conn.commit()
+        print("🏷️  Genre facets refreshed")
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Error refreshing genre facets: {e}")
+
+    # Recompute 1d/7d/30d movers against the daily closes
+    try:
+        moved = refresh_movers(cursor)
+        conn.commit()
+        print(f"📈 Movers recomputed for {moved} artists")
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Error computing movers: {e}")
+
+    # Periodic checkpoint so point-in-time replays start close to their target
     try:
-        # Get current artist info from Spotify
-        artist = sp.artist(spotify_id)
-        popularity = artist['popularity']
-        
-        # Insert new popularity history entry
-        cursor.execute("""
-            INSERT INTO artist_history (spotify_id, popularity, recorded_at) 
-            VALUES (%s, %s, NOW())
-        """, (spotify_id, popularity))
-        
+        checkpointed = checkpoint_if_due(cursor)
         conn.commit()
-        return popularity, True
-        
+        if checkpointed:
+            print(f"📌 Checkpointed {checkpointed} portfolios")
     except Exception as e:
-        print(f"✗ Error updating {name} ({spotify_id}): {e}")
         conn.rollback()
-        return None, False
-
-# Main execution
-print("=" * 70)
-print("ANTICIP DAILY POPULARITY UPDATER")
-print("=" * 70)
-print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-db_target = "Production (Railway)" if database_url and 'railway' in database_url.lower() else "Local Database"
-print(f"Target: {db_target}")
-print("=" * 70)
-
-# Get all artists from database
-cursor.execute("SELECT spotify_id, name FROM artists ORDER BY name")
-artists = cursor.fetchall()
-
-print(f"\nFound {len(artists)} artists to update\n")
-
-updated = 0
-failed = 0
-total_popularity = 0
-
-for i, (spotify_id, name) in enumerate(artists, 1):
-    print(f"[{i}/{len(artists)}] Updating {name}...", end=" ")
-    
-    popularity, success = update_artist_popularity(spotify_id, name)
-    
-    if success:
-        updated += 1
-        total_popularity += popularity
-        print(f"✓ Popularity: {popularity}")
+        print(f"✗ Error writing portfolio checkpoints: {e}")
+
+    # Every step has run; a crash before this point resumes the run next time
+    try:
+        finish_runs(cursor, run_ids)
+        conn.commit()
+        print(f"🏁 Update run{'s' if len(run_ids) > 1 else ''} {', '.join(f'#{run_id}' for run_id in run_ids)} complete")
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Error closing update runs: {e}")
+    release_runs(cursor, run_ids)
+
+    print(f"Finished at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+
+    cursor.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update artist popularity from Spotify")
+    parser.add_argument('--shard', type=parse_shard, default=(0, 1), metavar='I/N',
+                        help="Only fetch shard I of N (stable hash of spotify_id); run --merge afterwards")
+    parser.add_argument('--merge', action='store_true',
+                        help="Apply the ticks of a finished sharded round and run the follow-up steps once")
+    args = parser.parse_args()
+
+    # Spotify setup
+    client_id = os.getenv("SPOTIFY_CLIENT_ID")
+    client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
+    sp = make_spotify(client_id, client_secret)
+
+    # Database setup
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        # Convert postgres:// to postgresql://
+        if database_url.startswith("postgres://"):
+            database_url = database_url.replace("postgres://", "postgresql://", 1)
+        conn = psycopg2.connect(database_url)
     else:
-        failed += 1
-        print("✗ Failed")
-    
-    # Rate limiting: wait between requests to avoid hitting Spotify API limits
-    if i < len(artists):
-        time.sleep(0.3)  # 300ms between requests = ~3 requests/second
-
-# Calculate average popularity
-avg_popularity = total_popularity / updated if updated > 0 else 0
-
-print("\n" + "=" * 70)
-print("UPDATE COMPLETE")
-print("=" * 70)
-print(f"✓ Successfully updated: {updated} artists")
-print(f"✗ Failed: {failed} artists")
-print(f"📊 Average popularity: {avg_popularity:.1f}")
-print(f"Finished at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-print("=" * 70)
-
-# Close database connection
-cursor.close()
-conn.close()
+        # Local fallback
+        conn = psycopg2.connect(
+            dbname="anticip_db",
+            user="stephencoan",
+            password="",
+            host="localhost"
+        )
+
+    try:
+        return run_update(sp, conn, *args.shard, merge=args.merge)
+    finally:
+        # Close database connection
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
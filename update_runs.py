@@ -0,0 +1,304 @@
+"""
+Checkpointed popularity update runs
+
+Each update_popularity.py run gets an update_runs row, and every artist
+it fetches is checkpointed in update_run_artists in the same transaction
+as the artist_history row it writes, one batch at a time. A run that
+dies partway (runner timeout, database blip) leaves status 'running';
+the next run within RESUME_HOURS picks it up and only fetches the
+artists without a successful checkpoint, so no artist gets two ticks.
+
+artist_history.run_id ties every row to the run that wrote it (unique
+per run and artist), so a partial run can be inspected or cleaned up
+after the fact. Runs older than RESUME_HOURS are marked 'abandoned'
+rather than resumed, since their popularity is no longer current.
+
+With --shard i/N each of N processes takes the artists whose
+shard_of(spotify_id, N) is i (a stable md5 hash, so shards never
+overlap and an artist keeps its shard between days), runs and
+checkpoints its own shard run, and stops at status 'fetched'. The merge
+step (--merge) waits for all N shard runs of the round, then applies
+their ticks and runs the revaluation and snapshot steps once. An
+unsharded run is shard 0/1 and merges itself.
+"""
+import hashlib
+
+from psycopg2.extras import execute_values
+
+
+RESUME_HOURS = 20
+RUN_LOCK_ID = 4242003
+
+# Postgres twin of shard_of: first 32 bits of md5(spotify_id), mod shard count
+SHARD_SQL = "mod(('x' || substr(md5({spotify_id}), 1, 8))::bit(32)::bigint, {shard_count})"
+
+
+def shard_of(spotify_id, shard_count):
+    """Shard index of an artist (matches SHARD_SQL)"""
+    return int(hashlib.md5(spotify_id.encode()).hexdigest()[:8], 16) % shard_count
+
+
+def parse_shard(value):
+    """
+    Parse an 'i/N' shard spec.
+
+    Returns:
+        tuple: (shard_index, shard_count)
+
+    Raises:
+        ValueError: If the spec is malformed or i is not in 0..N-1
+    """
+    index, _, count = value.partition('/')
+    shard_index, shard_count = int(index), int(count)
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError(f"Shard must be i/N with 0 <= i < N, got {value}")
+    return shard_index, shard_count
+
+
+def start_run(cursor, shard_index=0, shard_count=1):
+    """
+    Resume the shard's latest unfinished run, or start a new one.
+
+    A shard run that already fetched is returned as is (with nothing
+    left pending) rather than fetched again. Takes a session advisory
+    lock on the run, so a second updater started while one is still
+    working does not process it twice.
+
+    Returns:
+        tuple: (run_id, resumed), or (None, False) if another process
+            holds the run
+    """
+    # Serialize run selection so two starters cannot both create a run
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (RUN_LOCK_ID,))
+    cursor.execute("""
+        UPDATE update_runs SET status = 'abandoned'
+        WHERE status IN ('running', 'fetched') AND started_at < NOW() - make_interval(hours => %s)
+    """, (RESUME_HOURS,))
+    cursor.execute("""
+        SELECT id FROM update_runs
+        WHERE status IN ('running', 'fetched') AND shard_index = %s AND shard_count = %s
+        ORDER BY started_at DESC
+        LIMIT 1
+    """, (shard_index, shard_count))
+    row = cursor.fetchone()
+    resumed = row is not None
+    if resumed:
+        run_id = row[0]
+    else:
+        cursor.execute(f"""
+            INSERT INTO update_runs (shard_index, shard_count, artist_count)
+            SELECT %(shard_index)s, %(shard_count)s, COUNT(*) FROM artists a
+            WHERE {SHARD_SQL.format(spotify_id='a.spotify_id', shard_count='%(shard_count)s')} = %(shard_index)s
+            RETURNING id
+        """, {'shard_index': shard_index, 'shard_count': shard_count})
+        run_id = cursor.fetchone()[0]
+
+    cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", (RUN_LOCK_ID, run_id))
+    if not cursor.fetchone()[0]:
+        return None, False
+    if resumed:
+        cursor.execute("""
+            UPDATE update_runs SET attempts = attempts + 1, heartbeat_at = NOW()
+            WHERE id = %s
+        """, (run_id,))
+    return run_id, resumed
+
+
+def release_runs(cursor, run_ids):
+    """Drop the session locks taken by start_run or ready_shard_runs"""
+    for run_id in run_ids:
+        cursor.execute("SELECT pg_advisory_unlock(%s, %s)", (RUN_LOCK_ID, run_id))
+
+
+def pending_artists(cursor, run_id):
+    """
+    Artists in the run's shard it still has to fetch (no successful
+    checkpoint yet).
+
+    Returns:
+        list: (spotify_id, name) tuples in name order
+    """
+    cursor.execute(f"""
+        SELECT a.spotify_id, a.name
+        FROM artists a
+        JOIN update_runs r ON r.id = %s
+        WHERE {SHARD_SQL.format(spotify_id='a.spotify_id', shard_count='r.shard_count')} = r.shard_index
+          AND NOT EXISTS (
+            SELECT 1 FROM update_run_artists c
+            WHERE c.run_id = r.id AND c.spotify_id = a.spotify_id AND c.popularity IS NOT NULL
+        )
+        ORDER BY a.name, a.spotify_id
+    """, (run_id,))
+    return cursor.fetchall()
+
+
+def record_batch(cursor, run_id, ticks, failed):
+    """
+    Write a batch's popularity history and checkpoints.
+
+    Failed artists are checkpointed with no popularity so a resume
+    retries them. Caller commits; history and checkpoints land together.
+
+    Args:
+        cursor: Database cursor
+        run_id: Current run
+        ticks: (spotify_id, popularity) tuples fetched in this batch
+        failed: spotify_ids that could not be fetched
+    """
+    if ticks:
+        execute_values(cursor, """
+            INSERT INTO artist_history (spotify_id, popularity, recorded_at, run_id)
+            VALUES %s
+            ON CONFLICT (run_id, spotify_id) WHERE run_id IS NOT NULL DO NOTHING
+        """, ticks, template=f"(%s, %s, NOW(), {int(run_id)})")
+    checkpoints = list(ticks) + [(spotify_id, None) for spotify_id in failed]
+    if checkpoints:
+        execute_values(cursor, """
+            INSERT INTO update_run_artists (run_id, spotify_id, popularity)
+            VALUES %s
+            ON CONFLICT (run_id, spotify_id) DO UPDATE SET
+                popularity = EXCLUDED.popularity,
+                checkpointed_at = NOW()
+            WHERE update_run_artists.popularity IS NULL
+        """, checkpoints, template=f"({int(run_id)}, %s, %s)")
+    cursor.execute("UPDATE update_runs SET heartbeat_at = NOW() WHERE id = %s", (run_id,))
+
+
+def mark_fetched(cursor, run_id):
+    """Mark a shard run as fetched, ready for the merge step"""
+    cursor.execute("""
+        UPDATE update_runs SET status = 'fetched', heartbeat_at = NOW()
+        WHERE id = %s
+    """, (run_id,))
+
+
+def ready_shard_runs(cursor):
+    """
+    The latest sharded round, if every one of its shards has fetched.
+
+    The round is the most recent run of each shard index for the shard
+    count of the newest sharded run (within RESUME_HOURS). Locks the
+    runs, so a shard still working or a second merge makes this fail.
+
+    Returns:
+        tuple: (run_ids, problems); run_ids is empty and problems
+            lists the missing or unfinished shards if the round is not
+            ready to merge
+    """
+    cursor.execute("""
+        SELECT shard_count FROM update_runs
+        WHERE shard_count > 1 AND status IN ('running', 'fetched')
+          AND started_at >= NOW() - make_interval(hours => %s)
+        ORDER BY started_at DESC
+        LIMIT 1
+    """, (RESUME_HOURS,))
+    row = cursor.fetchone()
+    if row is None:
+        return [], ['no sharded run waiting to be merged']
+    shard_count = row[0]
+    cursor.execute("""
+        SELECT DISTINCT ON (shard_index) shard_index, id, status
+        FROM update_runs
+        WHERE shard_count = %s AND status IN ('running', 'fetched')
+          AND started_at >= NOW() - make_interval(hours => %s)
+        ORDER BY shard_index, started_at DESC
+    """, (shard_count, RESUME_HOURS))
+    runs = {shard_index: (run_id, status) for shard_index, run_id, status in cursor.fetchall()}
+
+    problems = []
+    for shard_index in range(shard_count):
+        if shard_index not in runs:
+            problems.append(f"shard {shard_index}/{shard_count} has not run")
+        elif runs[shard_index][1] != 'fetched':
+            problems.append(f"shard {shard_index}/{shard_count} (run #{runs[shard_index][0]}) is still running")
+    if problems:
+        return [], problems
+
+    run_ids = [run_id for run_id, _ in runs.values()]
+    locked = []
+    for run_id in run_ids:
+        cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", (RUN_LOCK_ID, run_id))
+        if not cursor.fetchone()[0]:
+            release_runs(cursor, locked)
+            return [], [f"run #{run_id} is locked by another process"]
+        locked.append(run_id)
+    return run_ids, []
+
+
+def run_ticks(cursor, run_ids):
+    """
+    Every popularity the runs have recorded, including earlier attempts.
+
+    Returns:
+        list: (spotify_id, popularity) tuples
+    """
+    cursor.execute("""
+        SELECT spotify_id, popularity FROM update_run_artists
+        WHERE run_id = ANY(%s) AND popularity IS NOT NULL
+    """, (list(run_ids),))
+    return cursor.fetchall()
+
+
+def finish_runs(cursor, run_ids):
+    """Mark runs complete once their ticks and follow-up steps have run"""
+    cursor.execute("""
+        UPDATE update_runs SET status = 'complete', finished_at = NOW(), heartbeat_at = NOW()
+        WHERE id = ANY(%s)
+    """, (list(run_ids),))
+
+
+def completed_within(cursor, seconds):
+    """Whether any run (from any runner) completed within the last seconds"""
+    cursor.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM update_runs
+            WHERE status = 'complete' AND finished_at > NOW() - make_interval(secs => %s)
+        )
+    """, (seconds,))
+    return cursor.fetchone()[0]
+
+
+def list_runs(cursor, limit=10):
+    """
+    Recent runs with their progress.
+
+    Returns:
+        list: dicts with id, shard ('i/N'), status, started_at,
+            heartbeat_at, attempts, artist_count, done and failed
+    """
+    cursor.execute("""
+        SELECT r.id, r.shard_index || '/' || r.shard_count, r.status, r.started_at, r.heartbeat_at,
+               r.attempts, r.artist_count,
+               COUNT(c.popularity), COUNT(c.spotify_id) - COUNT(c.popularity)
+        FROM update_runs r
+        LEFT JOIN update_run_artists c ON c.run_id = r.id
+        GROUP BY r.id
+        ORDER BY r.started_at DESC
+        LIMIT %s
+    """, (limit,))
+    return [{'id': run_id, 'shard': shard, 'status': status, 'started_at': started_at,
+             'heartbeat_at': heartbeat_at, 'attempts': attempts, 'artist_count': artist_count,
+             'done': done, 'failed': failed}
+            for run_id, shard, status, started_at, heartbeat_at, attempts, artist_count, done, failed
+            in cursor.fetchall()]
+
+
+if __name__ == '__main__':
+    import os
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL", "postgresql://localhost/anticip_db")
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+    conn = psycopg2.connect(database_url)
+    cursor = conn.cursor()
+    try:
+        for run in list_runs(cursor):
+            print(f"#{run['id']} shard {run['shard']} {run['status']:<9} started {run['started_at']:%Y-%m-%d %H:%M}, "
+                  f"last batch {run['heartbeat_at']:%H:%M}, {run['done']:,}/{run['artist_count']:,} artists, "
+                  f"{run['failed']:,} failed, {run['attempts']} attempt(s)")
+    finally:
+        cursor.close()
+        conn.close()
@@ -103,3 +103,56 @@ def validate_trade_params(shares, action, privacy):
         return False, "Privacy must be 'public', 'followers', or 'private'"
     
     return True, ""
+
+
+def validate_conditional_order_params(order_type, shares, trigger_popularity, privacy):
+    """
+    Validate stop-loss / take-profit order parameters.
+    
+    Returns:
+        tuple: (is_valid: bool, error_message: str)
+    """
+    if order_type not in ['stop_loss', 'take_profit']:
+        return False, "Order type must be 'stop_loss' or 'take_profit'"
+    
+    if shares <= 0:
+        return False, "Shares must be greater than 0"
+    
+    if shares > 10000:
+        return False, "Maximum 10,000 shares per order"
+    
+    if trigger_popularity < 0 or trigger_popularity > 100:
+        return False, "Trigger popularity must be between 0 and 100"
+    
+    if privacy not in ['public', 'followers', 'private']:
+        return False, "Privacy must be 'public', 'followers', or 'private'"
+    
+    return True, ""
+
+
+def validate_backtest_params(strategy, count, lookback, rebalance_every, days, initial_points):
+    """
+    Validate backtest strategy parameters.
+    
+    Returns:
+        tuple: (is_valid: bool, error_message: str)
+    """
+    if strategy not in ['risers', 'fallers', 'popular']:
+        return False, "Strategy must be 'risers', 'fallers', or 'popular'"
+    
+    if count < 1 or count > 100:
+        return False, "Count must be between 1 and 100"
+    
+    if lookback < 1 or lookback > 365:
+        return False, "Lookback must be between 1 and 365 days"
+    
+    if rebalance_every < 1 or rebalance_every > 365:
+        return False, "Rebalance interval must be between 1 and 365 days"
+    
+    if days < 7 or days > 3650:
+        return False, "Backtest window must be between 7 and 3650 days"
+    
+    if initial_points < 100 or initial_points > 1000000:
+        return False, "Starting points must be between 100 and 1,000,000"
+    
+    return True, ""
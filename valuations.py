@@ -0,0 +1,291 @@
+"""
+Incrementally maintained portfolio valuations
+
+user_valuations holds one summary row per user:
+    invested_value  - sum of shares * current popularity
+    cost_basis      - sum of shares * avg_popularity
+    position_count  - number of open positions
+
+Trades adjust the row by delta and each popularity tick applies
+shares * delta-popularity per artist, so portfolio headers and snapshots
+never have to re-aggregate holdings. Full recomputations (seeding,
+drift repair, leaderboards) go through the vectorized engine below,
+which values every user in one NumPy pass.
+"""
+import io
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from market_index import apply_index_ticks
+
+
+def apply_trade_deltas(cursor, deltas):
+    """
+    Apply trade deltas to user valuation summaries.
+
+    Args:
+        cursor: Database cursor
+        deltas: Iterable of (user_id, value_delta, cost_delta, position_delta)
+    """
+    deltas = list(deltas)
+    if not deltas:
+        return
+    execute_values(cursor, """
+        INSERT INTO user_valuations AS v
+            (user_id, invested_value, cost_basis, position_count, updated_at)
+        VALUES %s
+        ON CONFLICT (user_id) DO UPDATE SET
+            invested_value = v.invested_value + EXCLUDED.invested_value,
+            cost_basis = v.cost_basis + EXCLUDED.cost_basis,
+            position_count = v.position_count + EXCLUDED.position_count,
+            updated_at = NOW()
+    """, deltas, template="(%s, %s::numeric, %s::numeric, %s, NOW())", page_size=1000)
+
+
+def apply_trade(cursor, user_id, value_delta, cost_delta, position_delta):
+    """Apply a single trade's delta to a user's valuation summary"""
+    apply_trade_deltas(cursor, [(user_id, value_delta, cost_delta, position_delta)])
+
+
+def apply_ticks(cursor, ticks):
+    """
+    Move artist quotes to a tick's popularity and revalue holders.
+
+    The quoted artists are locked first so no trade can price against a
+    quote that is being replaced, then a single statement computes
+    shares * (new - old popularity) per holder and moves the quotes.
+    Every ticked artist's quoted_at is stamped, changed or not, so it
+    always shows the latest tick.
+    Market index sums move by the same deltas. Must run inside the
+    caller's transaction.
+
+    Args:
+        cursor: Database cursor
+        ticks: Iterable of (spotify_id, popularity) tuples
+
+    Returns:
+        int: Number of artists whose quote changed
+    """
+    ticks = dict(ticks)
+    if not ticks:
+        return 0
+    spotify_ids = list(ticks.keys())
+    popularities = [ticks[spotify_id] for spotify_id in spotify_ids]
+
+    cursor.execute("""
+        SELECT id FROM artists
+        WHERE spotify_id = ANY(%s)
+        ORDER BY id
+        FOR UPDATE
+    """, (spotify_ids,))
+
+    apply_index_ticks(cursor, spotify_ids, popularities)
+
+    cursor.execute("""
+        WITH tick AS (
+            SELECT * FROM unnest(%s::varchar[], %s::integer[]) AS t(spotify_id, popularity)
+        ),
+        moved AS (
+            SELECT a.id AS artist_id, tick.popularity - a.current_popularity AS delta
+            FROM artists a
+            JOIN tick ON tick.spotify_id = a.spotify_id
+            WHERE a.current_popularity IS DISTINCT FROM tick.popularity
+        ),
+        user_deltas AS (
+            SELECT b.user_id, SUM(b.shares * moved.delta) AS delta
+            FROM bets b
+            JOIN moved ON moved.artist_id = b.artist_id
+            WHERE moved.delta IS NOT NULL
+            GROUP BY b.user_id
+        ),
+        revalued AS (
+            UPDATE user_valuations v
+            SET invested_value = v.invested_value + user_deltas.delta,
+                updated_at = NOW()
+            FROM user_deltas
+            WHERE v.user_id = user_deltas.user_id
+            RETURNING v.user_id
+        ),
+        quoted AS (
+            UPDATE artists a
+            SET current_popularity = tick.popularity, quoted_at = NOW()
+            FROM tick
+            WHERE a.spotify_id = tick.spotify_id
+            RETURNING a.id
+        )
+        SELECT COUNT(*) FROM moved
+    """, (spotify_ids, popularities))
+    return cursor.fetchone()[0]
+
+
+def _copy_out(cursor, query):
+    """Stream a query result out of Postgres as CSV"""
+    buf = io.StringIO()
+    cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", buf)
+    buf.seek(0)
+    return buf
+
+
+def _load_columns(cursor, query, ncols):
+    """Load a numeric query result into a 2-D float array"""
+    buf = _copy_out(cursor, query)
+    if not buf.getvalue():
+        return np.empty((0, ncols))
+    return np.loadtxt(buf, delimiter=',', ndmin=2)
+
+
+def load_positions(cursor):
+    """
+    Load every open position as parallel arrays.
+
+    Returns:
+        dict: user_ids, artist_ids (int64), shares, avg_cost (float64)
+    """
+    data = _load_columns(cursor, "SELECT user_id, artist_id, shares, avg_popularity FROM bets", 4)
+    return {
+        'user_ids': data[:, 0].astype(np.int64),
+        'artist_ids': data[:, 1].astype(np.int64),
+        'shares': data[:, 2],
+        'avg_cost': data[:, 3],
+    }
+
+
+def load_prices(cursor):
+    """
+    Build a dense price vector indexed by artist id from the latest quotes.
+
+    Unquoted artists are priced at 0.
+    """
+    data = _load_columns(cursor, "SELECT id, COALESCE(current_popularity, 0) FROM artists", 2)
+    ids = data[:, 0].astype(np.int64)
+    prices = np.zeros(int(ids.max()) + 1 if len(ids) else 1)
+    prices[ids] = data[:, 1]
+    return prices
+
+
+def load_users(cursor):
+    """Load all user ids (sorted) and their cash balances"""
+    data = _load_columns(cursor, "SELECT id, COALESCE(balance, 0) FROM users ORDER BY id", 2)
+    return data[:, 0].astype(np.int64), data[:, 1]
+
+
+def compute_valuations(user_ids, positions, prices):
+    """
+    Value every user's holdings in one vectorized pass.
+
+    Args:
+        user_ids: Sorted int array of users to value
+        positions: dict from load_positions()
+        prices: Dense price vector from load_prices()
+
+    Returns:
+        dict: invested, cost, gain (float64) and positions (int64) arrays
+            aligned with user_ids
+    """
+    n = len(user_ids)
+    # Positions of users not in user_ids (e.g. created after they were
+    # loaded) are dropped rather than counted against a neighbour
+    user_index = np.searchsorted(user_ids, positions['user_ids'])
+    known = user_index < n
+    known[known] = user_ids[user_index[known]] == positions['user_ids'][known]
+    user_index = user_index[known]
+    shares = positions['shares'][known]
+
+    invested = np.bincount(user_index, weights=shares * prices[positions['artist_ids'][known]], minlength=n)
+    cost = np.bincount(user_index, weights=shares * positions['avg_cost'][known], minlength=n)
+    counts = np.bincount(user_index, minlength=n)
+
+    return {
+        'invested': invested,
+        'cost': cost,
+        'gain': invested - cost,
+        'positions': counts,
+    }
+
+
+def write_valuations(cursor, user_ids, valuations):
+    """Write computed summaries back with a single COPY and upsert"""
+    buf = io.StringIO()
+    np.savetxt(buf, np.column_stack([
+        user_ids, valuations['invested'], valuations['cost'], valuations['positions']
+    ]), fmt=['%d', '%.2f', '%.2f', '%d'], delimiter='\t')
+    buf.seek(0)
+
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS valuation_staging (
+            user_id INTEGER,
+            invested_value NUMERIC(14, 2),
+            cost_basis NUMERIC(14, 2),
+            position_count INTEGER
+        )
+    """)
+    cursor.execute("TRUNCATE valuation_staging")
+    cursor.copy_expert("COPY valuation_staging FROM STDIN", buf)
+    cursor.execute("""
+        INSERT INTO user_valuations (user_id, invested_value, cost_basis, position_count, updated_at)
+        SELECT user_id, invested_value, cost_basis, position_count, NOW()
+        FROM valuation_staging
+        ON CONFLICT (user_id) DO UPDATE SET
+            invested_value = EXCLUDED.invested_value,
+            cost_basis = EXCLUDED.cost_basis,
+            position_count = EXCLUDED.position_count,
+            updated_at = NOW()
+    """)
+    return cursor.rowcount
+
+
+def rebuild_valuations(cursor):
+    """
+    Recompute every user's valuation summary from holdings.
+
+    Used to seed the table and to repair drift; normal operation only
+    applies deltas. user_valuations is locked against writers before
+    anything is loaded, so trades and ticks either commit before the
+    loads see them or apply their deltas on top of the rebuilt rows
+    afterwards. Must be the first statement of the caller's transaction.
+    """
+    cursor.execute("LOCK TABLE user_valuations IN SHARE ROW EXCLUSIVE MODE")
+    user_ids, _ = load_users(cursor)
+    valuations = compute_valuations(user_ids, load_positions(cursor), load_prices(cursor))
+    return write_valuations(cursor, user_ids, valuations)
+
+
+def backfill_current_popularity(cursor):
+    """Quote artists that have history but no current popularity yet"""
+    cursor.execute("""
+        UPDATE artists a
+        SET current_popularity = lp.popularity, quoted_at = lp.recorded_at
+        FROM artists unquoted
+        JOIN LATERAL (
+            SELECT popularity, recorded_at
+            FROM artist_history
+            WHERE spotify_id = unquoted.spotify_id
+            ORDER BY recorded_at DESC
+            LIMIT 1
+        ) lp ON true
+        WHERE unquoted.current_popularity IS NULL AND unquoted.id = a.id
+    """)
+    return cursor.rowcount
+
+
+def remove_artist_positions(cursor, artist_id):
+    """Take an artist's open positions out of holders' summaries before deletion"""
+    cursor.execute("""
+        UPDATE user_valuations v
+        SET invested_value = v.invested_value - d.value,
+            cost_basis = v.cost_basis - d.cost,
+            position_count = v.position_count - d.positions,
+            updated_at = NOW()
+        FROM (
+            SELECT b.user_id,
+                   SUM(b.shares * COALESCE(a.current_popularity, 0)) AS value,
+                   SUM(b.shares * b.avg_popularity) AS cost,
+                   COUNT(*) AS positions
+            FROM bets b
+            JOIN artists a ON a.id = b.artist_id
+            WHERE b.artist_id = %s
+            GROUP BY b.user_id
+        ) d
+        WHERE v.user_id = d.user_id
+    """, (artist_id,))